@@ -8,12 +8,13 @@ import os
 from pathlib import Path
 
 from routes import main_router
-from services.websocket_manager import WebSocketManager
-from services.payment_processor import PaymentProcessor
 from config import config
-from dependencies import get_db, _db, _external_api, _notifier
+from dependencies import (
+    get_db, _db, _external_api, _notifier, _herd_state, _cache, _db_maintenance,
+    _price_service, _goat_sats, _openhab_mirror, _balance,
+    _invoice_pool, _payment_dedup, _websocket_manager
+)
 from services.scheduler import SchedulerService
-from services.cache_manager import CacheManager
 
 # Initialize logging
 logger = logging.getLogger(__name__)
@@ -44,47 +45,64 @@ app.add_middleware(
 # Add routes
 app.include_router(main_router)
 
-# Initialize services
-payment_processor = PaymentProcessor(_external_api, _notifier, _db)
-
-# WebSocket manager instance with payment processor
-websocket_manager = WebSocketManager(
-    uri=config['HERD_WEBSOCKET'],
-    payment_processor=payment_processor,
-    logger=logging.getLogger(__name__)
-)
-
 # Initialize additional services
-scheduler = SchedulerService(_db, _external_api)
-cache_manager = CacheManager(_db)
+scheduler = SchedulerService(_db, _external_api, _herd_state, _goat_sats)
 
 @app.on_event("startup")
 async def startup_event():
-    # Connect to database
+    # Connect to database and load the herd into memory
     await _db.connect()
+    await _herd_state.load()
+    await _payment_dedup.load()
+
+    # Open and warm the LNbits and OpenHAB connection pools
+    await _external_api.start()
+
+    # Resolve herd payout addresses before the first distribution round
+    asyncio.create_task(_external_api.lnurl_cache.warm(
+        member["lud16"] for member in _herd_state.members()
+    ))
+
+    # Load GoatSats from OpenHAB and start flushing increments
+    await _goat_sats.start()
     
     # Start WebSocket connection
-    websocket_task = asyncio.create_task(websocket_manager.connect())
-    await websocket_manager.wait_for_connection(timeout=30)
+    asyncio.create_task(_websocket_manager.connect())
+    await _websocket_manager.wait_for_connection(timeout=30)
 
-    # Start cache cleanup task
-    asyncio.create_task(_db.schedule_cache_cleanup())
+    # Start database backups and WAL checkpointing
+    asyncio.create_task(_db_maintenance.run())
+
+    # Mirror FeederOverride, GoatSats and the BTC price from OpenHAB events
+    _openhab_mirror.start()
+
+    # Reconcile the websocket-fed balance with LNbits when frames stop
+    asyncio.create_task(_balance.run())
+
+    # Create invoices for common amounts ahead of time
+    asyncio.create_task(_invoice_pool.run())
+
+    # Keep the BTC price fresh in the background
+    asyncio.create_task(_price_service.run())
     
-    # Start scheduler and cache manager
+    # Start scheduler and the cache expiry sweeper
     asyncio.create_task(scheduler.schedule_daily_reset())
-    await cache_manager.start_cleanup_task()
+    await _cache.start_sweeper()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup resources on shutdown."""
     try:
+        # Stop reading and reconnecting, then let queued payments finish
+        # before the database goes away
+        await _websocket_manager.disconnect()
+        
         # Disconnect from database
         await _db.disconnect()
         
-        # Close WebSocket connection
-        await websocket_manager.disconnect()
-        
-        # Close external API client
+        # Flush pending GoatSats, then close the external API clients
+        await _openhab_mirror.stop()
+        await _goat_sats.close()
         await _external_api.close()
         
         logger.info("Cleanup completed successfully")
@@ -0,0 +1,71 @@
+"""Compare per-statement commits against DatabaseService batch APIs.
+
+Run from the project root so config can load .env:
+
+    python benchmarks/db_batch.py --rows 2000
+"""
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add project root to Python path
+project_root = str(Path(__file__).resolve().parent.parent)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from services.database import DatabaseService, UPSERT_CYBER_HERD_MEMBER, member_row
+
+def make_members(count: int, prefix: str):
+    return [
+        {
+            "pubkey": f"{prefix}{i:064x}"[-64:],
+            "display_name": f"Goat {i}",
+            "event_id": f"event-{prefix}-{i}",
+            "note": "note",
+            "kinds": "9734",
+            "nprofile": "nprofile1",
+            "lud16": f"goat{i}@example.com",
+            "payouts": 0.3,
+            "amount": 21,
+        }
+        for i in range(count)
+    ]
+
+async def per_statement(db: DatabaseService, members):
+    for member in members:
+        await db.execute(UPSERT_CYBER_HERD_MEMBER, member_row(member))
+
+async def transaction_block(db: DatabaseService, members):
+    async with db.transaction():
+        for member in members:
+            await db.execute(UPSERT_CYBER_HERD_MEMBER, member_row(member))
+
+async def execute_many(db: DatabaseService, members):
+    await db.add_cyber_herd_members(members)
+
+async def main(rows: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseService(f"sqlite+aiosqlite:///{tmp}/bench.db")
+        await db.connect()
+        try:
+            for name, runner in (
+                ("per-statement execute", per_statement),
+                ("transaction()", transaction_block),
+                ("execute_many()", execute_many),
+            ):
+                members = make_members(rows, name[:4])
+                start = time.perf_counter()
+                await runner(db, members)
+                elapsed = time.perf_counter() - start
+                print(f"{name:<24} {rows / elapsed:>12,.0f} rows/sec ({elapsed:.3f}s)")
+        finally:
+            await db.disconnect()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows))
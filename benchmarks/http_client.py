@@ -0,0 +1,94 @@
+"""Compare a client per request against the app-lifetime pooled client.
+
+Starts a local HTTP/1.1 stand-in for OpenHAB and calls
+ExternalAPIService.fetch_btc_price against it, uncoalesced, so every
+call is a real request. Run from the project root
+so config can load .env:
+
+    python benchmarks/http_client.py --requests 2000 --concurrency 20
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add project root to Python path
+project_root = str(Path(__file__).resolve().parent.parent)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from services.external_api import ExternalAPIService
+
+# Skip the @coalesced layer: its micro-TTL and in-flight sharing would
+# answer most calls without touching the client being measured
+fetch_btc_price = ExternalAPIService.fetch_btc_price.__wrapped__
+
+RESPONSE = (
+    b"HTTP/1.1 200 OK\r\n"
+    b"Content-Type: text/plain\r\n"
+    b"Content-Length: 8\r\n"
+    b"\r\n"
+    b"60000.00"
+)
+
+async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Answer every request on a keep-alive connection with a fixed price."""
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            if not head:
+                break
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    await reader.readexactly(int(line.split(b":", 1)[1]))
+            # Responses to HEAD (the startup warmup) carry no body
+            writer.write(RESPONSE[:-8] if head.startswith(b"HEAD") else RESPONSE)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        pass
+    finally:
+        writer.close()
+
+async def client_per_request(url: str):
+    # What the old get_external_api dependency did: close after every use
+    api = ExternalAPIService()
+    api.openhab_url = url
+    try:
+        await fetch_btc_price(api)
+    finally:
+        await api.close()
+
+async def run(name: str, call, requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await call()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    print(f"{name:<24} {requests / elapsed:>12,.0f} req/sec ({elapsed:.3f}s)")
+
+async def main(requests: int, concurrency: int):
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    url = f"http://127.0.0.1:{port}"
+    async with server:
+        await run("client per request", lambda: client_per_request(url), requests, concurrency)
+
+        api = ExternalAPIService()
+        api.openhab_url = url
+        await api.start()
+        try:
+            await run("app-lifetime pool", lambda: fetch_btc_price(api), requests, concurrency)
+        finally:
+            await api.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
@@ -114,6 +114,92 @@ config.update({
     'MAX_HERD_SIZE': MAX_HERD_SIZE,
     'PREDEFINED_WALLET_PERCENT_RESET': PREDEFINED_WALLET_PERCENT_RESET,
     'TRIGGER_AMOUNT_SATS': TRIGGER_AMOUNT_SATS,
+    'DB_ECHO': os.getenv('DB_ECHO', 'false').lower() == 'true',
+    'DB_POOL_SIZE': int(os.getenv('DB_POOL_SIZE', 5)),
+    'DB_MAX_OVERFLOW': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+    'DB_POOL_TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 30)),
+    'DB_BUSY_TIMEOUT_MS': int(os.getenv('DB_BUSY_TIMEOUT_MS', 5000)),
+    'DB_MMAP_SIZE': int(os.getenv('DB_MMAP_SIZE', 268435456)),
+    'DB_CACHE_SIZE_KB': int(os.getenv('DB_CACHE_SIZE_KB', 16384)),
+    'DB_STATEMENT_CACHE_SIZE': int(os.getenv('DB_STATEMENT_CACHE_SIZE', 256)),
+    'CACHE_L1_MAX_ENTRIES': int(os.getenv('CACHE_L1_MAX_ENTRIES', 1024)),
+    'CACHE_SWEEP_INTERVAL': float(os.getenv('CACHE_SWEEP_INTERVAL', 60)),
+    'CACHE_SWEEP_BATCH': int(os.getenv('CACHE_SWEEP_BATCH', 500)),
+    'TARGETS_CACHE_TTL': int(os.getenv('TARGETS_CACHE_TTL', 60)),
+    'TARGETS_CACHE_STALE_TTL': int(os.getenv('TARGETS_CACHE_STALE_TTL', 300)),
+    'DB_PROFILE': os.getenv('DB_PROFILE', 'true').lower() == 'true',
+    'DB_SLOW_QUERY_MS': float(os.getenv('DB_SLOW_QUERY_MS', 100)),
+    'DB_BACKUP_DIR': os.getenv('DB_BACKUP_DIR', './backups'),
+    'DB_BACKUP_INTERVAL': int(os.getenv('DB_BACKUP_INTERVAL', 86400)),
+    'DB_BACKUP_KEEP': int(os.getenv('DB_BACKUP_KEEP', 7)),
+    'DB_BACKUP_PAGES_PER_STEP': int(os.getenv('DB_BACKUP_PAGES_PER_STEP', 256)),
+    'DB_BACKUP_STEP_SLEEP': float(os.getenv('DB_BACKUP_STEP_SLEEP', 0.05)),
+    'DB_CHECKPOINT_INTERVAL': int(os.getenv('DB_CHECKPOINT_INTERVAL', 300)),
+    'DB_WAL_MAX_BYTES': int(os.getenv('DB_WAL_MAX_BYTES', 67108864)),
+    'DB_WRITE_ACTOR': os.getenv('DB_WRITE_ACTOR', 'false').lower() == 'true',
+    'DB_WRITE_BATCH_SIZE': int(os.getenv('DB_WRITE_BATCH_SIZE', 64)),
+    'DB_WRITE_BATCH_MS': float(os.getenv('DB_WRITE_BATCH_MS', 5)),
+    'DB_WRITE_QUEUE_SIZE': int(os.getenv('DB_WRITE_QUEUE_SIZE', 1000)),
+    'LNBITS_HTTP2': os.getenv('LNBITS_HTTP2', 'true').lower() == 'true',
+    'LNBITS_MAX_CONNECTIONS': int(os.getenv('LNBITS_MAX_CONNECTIONS', 20)),
+    'LNBITS_MAX_KEEPALIVE': int(os.getenv('LNBITS_MAX_KEEPALIVE', 10)),
+    'LNBITS_KEEPALIVE_EXPIRY': float(os.getenv('LNBITS_KEEPALIVE_EXPIRY', 60)),
+    'LNBITS_TIMEOUT': float(os.getenv('LNBITS_TIMEOUT', 30)),
+    'LNBITS_CONNECT_TIMEOUT': float(os.getenv('LNBITS_CONNECT_TIMEOUT', 5)),
+    'OPENHAB_HTTP2': os.getenv('OPENHAB_HTTP2', 'false').lower() == 'true',
+    'OPENHAB_MAX_CONNECTIONS': int(os.getenv('OPENHAB_MAX_CONNECTIONS', 10)),
+    'OPENHAB_MAX_KEEPALIVE': int(os.getenv('OPENHAB_MAX_KEEPALIVE', 5)),
+    'OPENHAB_KEEPALIVE_EXPIRY': float(os.getenv('OPENHAB_KEEPALIVE_EXPIRY', 30)),
+    'OPENHAB_TIMEOUT': float(os.getenv('OPENHAB_TIMEOUT', 10)),
+    'OPENHAB_CONNECT_TIMEOUT': float(os.getenv('OPENHAB_CONNECT_TIMEOUT', 3)),
+    'HTTP_WARMUP_TIMEOUT': float(os.getenv('HTTP_WARMUP_TIMEOUT', 5)),
+    'PAYMENT_DEDUP_MAX_ENTRIES': int(os.getenv('PAYMENT_DEDUP_MAX_ENTRIES', 10000)),
+    'PAYMENT_CATCHUP_PAGE_SIZE': int(os.getenv('PAYMENT_CATCHUP_PAGE_SIZE', 50)),
+    'PAYMENT_CATCHUP_MAX_PAGES': int(os.getenv('PAYMENT_CATCHUP_MAX_PAGES', 20)),
+    'WEBSOCKET_INGEST_WORKERS': int(os.getenv('WEBSOCKET_INGEST_WORKERS', 1)),
+    'WEBSOCKET_INGEST_QUEUE_SIZE': int(os.getenv('WEBSOCKET_INGEST_QUEUE_SIZE', 1000)),
+    'INVOICE_POOL_AMOUNTS': [
+        int(amount) for amount in os.getenv('INVOICE_POOL_AMOUNTS', str(TRIGGER_AMOUNT_SATS)).split(',')
+        if amount.strip()
+    ],
+    'INVOICE_POOL_SIZE': int(os.getenv('INVOICE_POOL_SIZE', 3)),
+    'INVOICE_POOL_EXPIRY': int(os.getenv('INVOICE_POOL_EXPIRY', 3600)),
+    'INVOICE_POOL_RETIRE_MARGIN': float(os.getenv('INVOICE_POOL_RETIRE_MARGIN', 600)),
+    'INVOICE_POOL_REFILL_INTERVAL': float(os.getenv('INVOICE_POOL_REFILL_INTERVAL', 60)),
+    'INVOICE_POOL_MEMO': os.getenv('INVOICE_POOL_MEMO', 'Lightning Goats Payment'),
+    'IDEMPOTENCY_TTL': float(os.getenv('IDEMPOTENCY_TTL', 86400)),
+    'IDEMPOTENCY_MAX_ENTRIES': int(os.getenv('IDEMPOTENCY_MAX_ENTRIES', 10000)),
+    'BALANCE_RECONCILE_INTERVAL': float(os.getenv('BALANCE_RECONCILE_INTERVAL', 300)),
+    'GOAT_SATS_FLUSH_INTERVAL': float(os.getenv('GOAT_SATS_FLUSH_INTERVAL', 5)),
+    'OPENHAB_POLL_INTERVAL': float(os.getenv('OPENHAB_POLL_INTERVAL', 10)),
+    'OPENHAB_STREAM_RETRY': float(os.getenv('OPENHAB_STREAM_RETRY', 60)),
+    'OPENHAB_EVENTS_READ_TIMEOUT': float(os.getenv('OPENHAB_EVENTS_READ_TIMEOUT', 300)),
+    'BTC_PRICE_REFRESH_INTERVAL': float(os.getenv('BTC_PRICE_REFRESH_INTERVAL', 30)),
+    'BTC_PRICE_MAX_AGE': float(os.getenv('BTC_PRICE_MAX_AGE', 600)),
+    'CONVERT_MAX_AMOUNTS': int(os.getenv('CONVERT_MAX_AMOUNTS', 100)),
+    'LNURL_CACHE_TTL': float(os.getenv('LNURL_CACHE_TTL', 3600)),
+    'LNURL_NEGATIVE_TTL': float(os.getenv('LNURL_NEGATIVE_TTL', 300)),
+    'LNURL_CACHE_MAX_ENTRIES': int(os.getenv('LNURL_CACHE_MAX_ENTRIES', 1000)),
+    'LNBITS_BREAKER_FAILURES': int(os.getenv('LNBITS_BREAKER_FAILURES', 5)),
+    'LNBITS_BREAKER_RESET': float(os.getenv('LNBITS_BREAKER_RESET', 30)),
+    'LNBITS_HEDGE_DELAY_MS': float(os.getenv('LNBITS_HEDGE_DELAY_MS', 0)),
+    'OPENHAB_BREAKER_FAILURES': int(os.getenv('OPENHAB_BREAKER_FAILURES', 3)),
+    'OPENHAB_BREAKER_RESET': float(os.getenv('OPENHAB_BREAKER_RESET', 15)),
+    'OPENHAB_HEDGE_DELAY_MS': float(os.getenv('OPENHAB_HEDGE_DELAY_MS', 0)),
+    'LNBITS_MAX_CONCURRENCY': int(os.getenv('LNBITS_MAX_CONCURRENCY', os.getenv('MAX_CONCURRENT_HTTP_REQUESTS', 20))),
+    'LNBITS_LATENCY_TARGET_MS': float(os.getenv('LNBITS_LATENCY_TARGET_MS', 2000)),
+    'OPENHAB_MAX_CONCURRENCY': int(os.getenv('OPENHAB_MAX_CONCURRENCY', os.getenv('MAX_CONCURRENT_HTTP_REQUESTS', 20))),
+    'OPENHAB_LATENCY_TARGET_MS': float(os.getenv('OPENHAB_LATENCY_TARGET_MS', 1000)),
+    'UPSTREAM_MAX_RETRIES': int(os.getenv('UPSTREAM_MAX_RETRIES', 2)),
+    'UPSTREAM_BACKOFF_BASE': float(os.getenv('UPSTREAM_BACKOFF_BASE', 0.2)),
+    'UPSTREAM_BACKOFF_MAX': float(os.getenv('UPSTREAM_BACKOFF_MAX', 2)),
+    'RETRY_BUDGET_RATIO': float(os.getenv('RETRY_BUDGET_RATIO', 0.1)),
+    'RETRY_BUDGET_MAX_TOKENS': float(os.getenv('RETRY_BUDGET_MAX_TOKENS', 10)),
+    'BALANCE_MICRO_TTL': float(os.getenv('BALANCE_MICRO_TTL', 1)),
+    'FEEDER_STATUS_MICRO_TTL': float(os.getenv('FEEDER_STATUS_MICRO_TTL', 1)),
+    'BTC_PRICE_MICRO_TTL': float(os.getenv('BTC_PRICE_MICRO_TTL', 2)),
+    'TARGETS_MICRO_TTL': float(os.getenv('TARGETS_MICRO_TTL', 1)),
+    'GOAT_SATS_MICRO_TTL': float(os.getenv('GOAT_SATS_MICRO_TTL', 1)),
 })
 
 if DEBUG:
@@ -19,3 +19,7 @@ def mock_external_api_service():
 @pytest.fixture
 def mock_notifier_service():
     return AsyncMock()
+
+@pytest.fixture
+def database_url(tmp_path):
+    return f"sqlite+aiosqlite:///{tmp_path / 'test.db'}"
@@ -1,31 +1,108 @@
 from typing import AsyncGenerator
 from fastapi import Depends
+from sqlalchemy.ext.asyncio import AsyncSession
 from services.database import DatabaseService
 from services.external_api import ExternalAPIService
 from services.cyberherd_manager import CyberHerdManager
 from services.notifier import NotifierService
 from services.payment_processor import PaymentProcessor
+from services.herd_state import HerdState
+from services.cache_manager import CacheManager
+from services.db_maintenance import DatabaseMaintenanceService
+from services.price_service import PriceService
+from services.goat_sats_counter import GoatSatsCounter
+from services.openhab_mirror import OpenHABMirror
+from services.balance_service import BalanceService
+from services.idempotency_store import IdempotencyStore
+from services.invoice_pool import InvoicePool
+from services.payment_dedup import PaymentDeduplicator
+from services.websocket_manager import WebSocketManager
+from config import config
 
 # Singleton instances
 _db = DatabaseService()
 _external_api = ExternalAPIService()
 _notifier = NotifierService()
-_payment_processor = PaymentProcessor(_external_api, _notifier, _db)
+_cache = CacheManager(_db)
+_herd_state = HerdState(_db, _cache)
+_db_maintenance = DatabaseMaintenanceService(_db)
+_openhab_mirror = OpenHABMirror(_external_api)
+_price_service = PriceService(_external_api, mirror=_openhab_mirror)
+_goat_sats = GoatSatsCounter(_external_api)
+_balance = BalanceService(_external_api)
+_idempotency = IdempotencyStore()
+_invoice_pool = InvoicePool(_external_api)
+_payment_dedup = PaymentDeduplicator(_db)
+_payment_processor = PaymentProcessor(
+    _external_api, _notifier, _db, _goat_sats, _openhab_mirror, _balance, _payment_dedup
+)
+# HERD_WEBSOCKET reader, ingest workers and browser client broadcasts
+_websocket_manager = WebSocketManager(
+    uri=config['HERD_WEBSOCKET'],
+    payment_processor=_payment_processor
+)
 
-async def get_db() -> AsyncGenerator[DatabaseService, None]:
+async def get_db() -> DatabaseService:
     """Database dependency."""
-    try:
-        await _db.connect()
-        yield _db
-    finally:
-        await _db.disconnect()
-
-async def get_external_api() -> AsyncGenerator[ExternalAPIService, None]:
-    """External API dependency."""
-    try:
-        yield _external_api
-    finally:
-        await _external_api.close()
+    # No-op once the startup hook has created the schema
+    await _db.connect()
+    return _db
+
+async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
+    """Request-scoped session from the shared engine."""
+    await _db.connect()
+    async with _db.session() as session:
+        yield session
+
+async def get_external_api() -> ExternalAPIService:
+    """External API dependency; its clients are owned by the app lifespan."""
+    return _external_api
+
+async def get_price_service() -> PriceService:
+    """Cached BTC price dependency."""
+    return _price_service
+
+async def get_openhab_mirror() -> OpenHABMirror:
+    """Mirrored OpenHAB item states dependency."""
+    return _openhab_mirror
+
+async def get_balance_service() -> BalanceService:
+    """Websocket-fed wallet balance dependency."""
+    return _balance
+
+async def get_idempotency_store() -> IdempotencyStore:
+    """Idempotency-Key response store dependency."""
+    return _idempotency
+
+async def get_invoice_pool() -> InvoicePool:
+    """Pre-created invoice pool dependency."""
+    return _invoice_pool
+
+async def get_payment_dedup() -> PaymentDeduplicator:
+    """Payment hash de-duplication dependency."""
+    return _payment_dedup
+
+async def get_websocket_manager() -> WebSocketManager:
+    """Shared HERD_WEBSOCKET manager dependency."""
+    return _websocket_manager
+
+async def get_goat_sats() -> GoatSatsCounter:
+    """Write-behind GoatSats counter dependency."""
+    return _goat_sats
+
+async def get_herd_state() -> HerdState:
+    """In-memory CyberHerd state dependency."""
+    await _herd_state.ensure_loaded()
+    return _herd_state
+
+async def get_cache() -> CacheManager:
+    """Two-tier cache dependency."""
+    await _db.connect()
+    return _cache
+
+async def get_db_maintenance() -> DatabaseMaintenanceService:
+    """Database backup/checkpoint service dependency."""
+    return _db_maintenance
 
 async def get_notifier() -> NotifierService:
     """Notifier service dependency."""
@@ -38,7 +115,8 @@ async def get_payment_processor() -> PaymentProcessor:
 async def get_cyberherd_manager(
     db: DatabaseService = Depends(get_db),
     api: ExternalAPIService = Depends(get_external_api),
-    notifier: NotifierService = Depends(get_notifier)
+    notifier: NotifierService = Depends(get_notifier),
+    herd_state: HerdState = Depends(get_herd_state)
 ) -> CyberHerdManager:
     """CyberHerd manager dependency."""
-    return CyberHerdManager(db, api, notifier)
+    return CyberHerdManager(db, api, notifier, herd_state)
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, validator
 from typing import List, Optional
+from config import config
 
 class CyberHerdData(BaseModel):
     """CyberHerd member data model."""
@@ -36,6 +37,17 @@ class CyberHerdTreats(BaseModel):
 class SetGoatSatsData(BaseModel):
     new_amount: int
 
+class ConvertRequest(BaseModel):
+    """Batch of USD amounts to convert at one price."""
+    amounts: List[float]
+
+    @validator('amounts')
+    def validate_amounts(cls, v):
+        """Validate batch size."""
+        if not 1 <= len(v) <= config['CONVERT_MAX_AMOUNTS']:
+            raise ValueError(f"Provide between 1 and {config['CONVERT_MAX_AMOUNTS']} amounts")
+        return v
+
 class PaymentRequest(BaseModel):
     balance: int
 
@@ -1,7 +1,7 @@
 """Routes package."""
 from fastapi import APIRouter, Depends
-from services.external_api import ExternalAPIService
-from dependencies import get_external_api
+from services.balance_service import BalanceService
+from dependencies import get_balance_service
 from config import config  # Add this import
 
 from routes.payments import router as payments_router
@@ -39,8 +39,7 @@ if config['DEBUG']:
 @main_router.get("/balance")
 async def get_balance_route(
     force_refresh: bool = False,
-    external_api: ExternalAPIService = Depends(get_external_api)
+    balance_service: BalanceService = Depends(get_balance_service)
 ):
     """Get current wallet balance."""
-    balance = await external_api.get_balance(force_refresh)
-    return {"balance": balance}
+    return await balance_service.snapshot(force_refresh)
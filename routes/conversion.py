@@ -1,20 +1,36 @@
 from fastapi import APIRouter, HTTPException, Depends
-from services.external_api import ExternalAPIService
-from dependencies import get_external_api
+from services.price_service import PriceService
+from dependencies import get_price_service
+from models import ConvertRequest
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+@router.post("")
+async def convert_batch(
+    request: ConvertRequest,
+    price_service: PriceService = Depends(get_price_service)
+):
+    """Convert a list of USD amounts to satoshis at one price."""
+    try:
+        quote = await price_service.quote()
+        sats = [PriceService.usd_to_sats(amount, quote["price"]) for amount in request.amounts]
+        return {"sats": sats, "btc_price": quote["price"], "price_age_seconds": quote["age_seconds"]}
+    except Exception as e:
+        logger.error(f"Error converting USD to sats: {e}")
+        raise HTTPException(status_code=500, detail="Failed to convert amounts")
+
 @router.get("/{amount}")
 async def convert(
     amount: float,
-    external_api: ExternalAPIService = Depends(get_external_api)
+    price_service: PriceService = Depends(get_price_service)
 ):
     """Convert USD amount to satoshis."""
     try:
-        sats = await external_api.convert_to_sats(amount)
-        return {"sats": sats}
+        quote = await price_service.quote()
+        sats = PriceService.usd_to_sats(amount, quote["price"])
+        return {"sats": sats, "price_age_seconds": quote["age_seconds"]}
     except Exception as e:
         logger.error(f"Error converting USD to sats: {e}")
         raise HTTPException(status_code=500, detail="Failed to convert amount")
@@ -2,28 +2,43 @@ from fastapi import APIRouter, HTTPException, Depends
 from typing import List, Dict
 import logging
 from models import CyberHerdData, CyberHerdTreats
-from services.database import DatabaseService
 from services.external_api import ExternalAPIService
 from services.notifier import NotifierService
 from services.cyberherd_manager import CyberHerdManager
-from config import config, MAX_HERD_SIZE
+from services.herd_state import HerdState, HERD_CACHE_TAG
+from services.cache_manager import CacheManager
+from config import config
 from dependencies import (
-    get_db,
     get_external_api,
     get_notifier,
+    get_herd_state,
+    get_cache,
     get_cyberherd_manager
 )
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+TARGETS_CACHE_KEY = "cyberherd:targets"
+
+async def get_cached_targets(cache: CacheManager, external_api: ExternalAPIService):
+    """LNbits split targets, loaded once per TTL and dropped when the herd changes."""
+    return await cache.get_or_load(
+        TARGETS_CACHE_KEY,
+        external_api.fetch_cyberherd_targets,
+        ttl=config['TARGETS_CACHE_TTL'],
+        tags=[HERD_CACHE_TAG],
+        stale_ttl=config['TARGETS_CACHE_STALE_TTL']
+    )
+
 @router.get("")
 async def get_cyber_herd(
-    external_api: ExternalAPIService = Depends(get_external_api)
+    external_api: ExternalAPIService = Depends(get_external_api),
+    cache: CacheManager = Depends(get_cache)
 ):
     """Get list of current CyberHerd members."""
     try:
-        members = await external_api.fetch_cyberherd_targets()
+        members = await get_cached_targets(cache, external_api)
         return {"members": members}
     except Exception as e:
         logger.error(f"Error getting CyberHerd members: {e}")
@@ -32,18 +47,14 @@ async def get_cyber_herd(
 @router.post("")
 async def update_cyber_herd(
     data: List[CyberHerdData],
-    db: DatabaseService = Depends(get_db),
+    herd_state: HerdState = Depends(get_herd_state),
     external_api: ExternalAPIService = Depends(get_external_api),
     notifier: NotifierService = Depends(get_notifier)
 ):
     """Update CyberHerd with new members."""
     try:
-        query = "SELECT COUNT(*) as count FROM cyber_herd"
-        result = await db.fetch_one(query)
-        current_herd_size = result['count']
-
-        if current_herd_size >= MAX_HERD_SIZE:
-            logger.info(f"Herd full: {current_herd_size} members")
+        if herd_state.is_full:
+            logger.info(f"Herd full: {herd_state.size} members")
             return {"status": "herd full"}
 
         # Process each member
@@ -55,14 +66,10 @@ async def update_cyber_herd(
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 @router.get("/spots_remaining")
-async def get_cyberherd_spots_remaining(db: DatabaseService = Depends(get_db)):
+async def get_cyberherd_spots_remaining(herd_state: HerdState = Depends(get_herd_state)):
     """Get remaining spots in CyberHerd."""
     try:
-        query = "SELECT COUNT(*) as count FROM cyber_herd"
-        result = await db.fetch_one(query)
-        current_spots_taken = result['count']
-        spots_remaining = MAX_HERD_SIZE - current_spots_taken
-        return {"spots_remaining": spots_remaining}
+        return {"spots_remaining": herd_state.spots_remaining}
     except Exception as e:
         logger.error(f"Error retrieving remaining spots: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
@@ -70,20 +77,16 @@ async def get_cyberherd_spots_remaining(db: DatabaseService = Depends(get_db)):
 @router.delete("/delete/{lud16}")
 async def delete_cyber_herd(
     lud16: str,
-    db: DatabaseService = Depends(get_db)
+    herd_state: HerdState = Depends(get_herd_state)
 ):
     """Delete a CyberHerd member by lud16."""
     try:
         logger.info(f"Attempting to delete record with lud16: {lud16}")
-        select_query = "SELECT * FROM cyber_herd WHERE lud16 = :lud16"
-        record = await db.fetch_one(select_query, {"lud16": lud16})
-        
-        if not record:
+        if not herd_state.get_by_lud16(lud16):
             logger.warning(f"No record found with lud16: {lud16}")
             raise HTTPException(status_code=404, detail="Record not found")
             
-        delete_query = "DELETE FROM cyber_herd WHERE lud16 = :lud16"
-        await db.execute(delete_query, {"lud16": lud16})
+        await herd_state.remove_by_lud16(lud16)
         
         logger.info(f"Record with lud16 {lud16} deleted successfully.")
         return {
@@ -99,15 +102,12 @@ async def delete_cyber_herd(
 @router.post("/messages/cyberherd_treats")
 async def handle_cyberherd_treats(
     data: CyberHerdTreats,
-    database: DatabaseService = Depends(get_db),
+    herd_state: HerdState = Depends(get_herd_state),
     notifier: NotifierService = Depends(get_notifier)
 ):
     """Send treats to CyberHerd members."""
     try:
-        member = await database.fetch_one(
-            "SELECT * FROM cyber_herd WHERE pubkey = :pubkey",
-            {"pubkey": data.pubkey}
-        )
+        member = herd_state.get(data.pubkey)
         
         if member:
             await notifier.send_cyberherd_notification(
@@ -133,10 +133,11 @@ async def reset_cyber_herd(manager: CyberHerdManager = Depends(get_cyberherd_man
             await manager.distribute_rewards(balance)
 
         # Reset the CyberHerd table
-        await manager.database.execute("DELETE FROM cyber_herd")
+        await manager.herd_state.clear()
         
         # Reset the LNbits targets
         await manager.external_api.reset_cyberherd_targets()
+        await manager.herd_state.invalidate_cache()
 
         return {
             "status": "success",
@@ -185,10 +186,11 @@ async def zap_lud16_endpoint(
 
 @router.get("/list")
 async def list_cyberherd_members(
-    external_api: ExternalAPIService = Depends(get_external_api)
+    external_api: ExternalAPIService = Depends(get_external_api),
+    cache: CacheManager = Depends(get_cache)
 ):
     """Get list of current CyberHerd members."""
-    members = await external_api.fetch_cyberherd_targets()
+    members = await get_cached_targets(cache, external_api)
     return {"members": members}
 
 @router.get("/spots")
@@ -3,7 +3,21 @@ from pydantic import BaseModel
 import logging
 from config import config, TRIGGER_AMOUNT_SATS
 from services.payment_processor import PaymentProcessor
-from dependencies import get_payment_processor
+from services.cache_manager import CacheManager
+from services.database import DatabaseService
+from services.db_maintenance import DatabaseMaintenanceService
+from services.external_api import ExternalAPIService
+from services.openhab_mirror import OpenHABMirror
+from services.balance_service import BalanceService
+from services.idempotency_store import IdempotencyStore
+from services.invoice_pool import InvoicePool
+from services.payment_dedup import PaymentDeduplicator
+from services.websocket_manager import WebSocketManager
+from dependencies import (
+    get_payment_processor, get_cache, get_db, get_db_maintenance, get_external_api,
+    get_openhab_mirror, get_balance_service, get_idempotency_store,
+    get_invoice_pool, get_payment_dedup, get_websocket_manager
+)
 from typing import Optional
 
 logger = logging.getLogger(__name__)
@@ -63,3 +77,127 @@ async def get_feeder_status():
 async def get_cyberherd():
     """Get CyberHerd list for testing."""
     return {"members": []}
+
+@router.get("/cache/stats")
+async def get_cache_stats(cache: CacheManager = Depends(get_cache)):
+    """Get two-tier cache hit/miss/eviction counters."""
+    return cache.stats
+
+@router.get("/upstream/coalescing")
+async def get_upstream_coalescing(
+    external_api: ExternalAPIService = Depends(get_external_api)
+):
+    """Get per-method counts of coalesced upstream reads."""
+    return external_api.coalescing_stats
+
+@router.get("/upstream/resilience")
+async def get_upstream_resilience(
+    external_api: ExternalAPIService = Depends(get_external_api)
+):
+    """Get circuit breaker state and retry/hedge counts per upstream."""
+    return external_api.resilience_stats
+
+@router.get("/upstream/lnurl")
+async def get_lnurl_cache_stats(
+    external_api: ExternalAPIService = Depends(get_external_api)
+):
+    """Get LNURL-pay parameter cache counters."""
+    return external_api.lnurl_cache.stats
+
+@router.get("/upstream/openhab_mirror")
+async def get_openhab_mirror_stats(
+    openhab_mirror: OpenHABMirror = Depends(get_openhab_mirror)
+):
+    """Get OpenHAB event stream mode, counters and mirrored states."""
+    return openhab_mirror.stats
+
+@router.get("/upstream/balance")
+async def get_balance_stats(
+    balance_service: BalanceService = Depends(get_balance_service)
+):
+    """Get websocket balance updates, LNbits reconciles and drift."""
+    return balance_service.stats
+
+@router.get("/idempotency")
+async def get_idempotency_stats(
+    idempotency: IdempotencyStore = Depends(get_idempotency_store)
+):
+    """Get Idempotency-Key executions, replays and conflicts."""
+    return idempotency.stats
+
+@router.get("/upstream/invoice_pool")
+async def get_invoice_pool_stats(
+    invoice_pool: InvoicePool = Depends(get_invoice_pool)
+):
+    """Get invoice pool hits, misses, ready counts and refill latency."""
+    return invoice_pool.stats
+
+@router.get("/payments/dedup")
+async def get_payment_dedup_stats(
+    payment_dedup: PaymentDeduplicator = Depends(get_payment_dedup)
+):
+    """Get accepted and suppressed payment deliveries."""
+    return payment_dedup.stats
+
+@router.get("/payments/processor")
+async def get_payment_processor_stats(
+    processor: PaymentProcessor = Depends(get_payment_processor)
+):
+    """Get the feeding state, balance and feeding counters."""
+    return processor.stats
+
+@router.get("/websocket/ingest")
+async def get_websocket_ingest_stats(
+    websocket_manager: WebSocketManager = Depends(get_websocket_manager)
+):
+    """Get websocket ingest queue depth, lag and dropped frames."""
+    return websocket_manager.stats
+
+@router.get("/db/queries")
+async def get_query_profile(
+    limit: Optional[int] = None,
+    db: DatabaseService = Depends(get_db)
+):
+    """Get per-query latency histograms and recent slow queries."""
+    if db.profiler is None:
+        raise HTTPException(status_code=404, detail="Query profiling is disabled (DB_PROFILE=false)")
+    return {**db.profiler.summary(limit), "writer": db.write_stats}
+
+@router.delete("/db/queries")
+async def reset_query_profile(db: DatabaseService = Depends(get_db)):
+    """Reset query profiling counters."""
+    if db.profiler is not None:
+        db.profiler.reset()
+    return {"status": "success"}
+
+@router.get("/db/maintenance")
+async def get_db_maintenance_stats(
+    maintenance: DatabaseMaintenanceService = Depends(get_db_maintenance)
+):
+    """Get backup and WAL checkpoint statistics."""
+    return maintenance.stats
+
+@router.post("/db/backup")
+async def run_db_backup(
+    maintenance: DatabaseMaintenanceService = Depends(get_db_maintenance)
+):
+    """Write an online backup of the database now."""
+    try:
+        return await maintenance.backup()
+    except Exception as e:
+        logger.error(f"Error running database backup: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/db/checkpoint")
+async def run_db_checkpoint(
+    mode: str = "PASSIVE",
+    maintenance: DatabaseMaintenanceService = Depends(get_db_maintenance)
+):
+    """Run a WAL checkpoint now."""
+    try:
+        return await maintenance.checkpoint(mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error running WAL checkpoint: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends
 from services.external_api import ExternalAPIService
-from dependencies import get_external_api
+from services.openhab_mirror import OpenHABMirror
+from dependencies import get_external_api, get_openhab_mirror
 import logging
 
 logger = logging.getLogger(__name__)
@@ -8,11 +9,11 @@ router = APIRouter()
 
 @router.get("/status")
 async def feeder_status(
-    external_api: ExternalAPIService = Depends(get_external_api)
+    openhab_mirror: OpenHABMirror = Depends(get_openhab_mirror)
 ):
     """Get feeder override status."""
     try:
-        status = await external_api.get_feeder_status()
+        status = await openhab_mirror.feeder_override()
         return {"feeder_override_enabled": status}
     except Exception as e:
         logger.error(f"Error getting feeder status: {e}")
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends
 from services.external_api import ExternalAPIService
-from dependencies import get_external_api
+from services.goat_sats_counter import GoatSatsCounter
+from dependencies import get_external_api, get_goat_sats
 from models import SetGoatSatsData
 import logging
 
@@ -9,11 +10,11 @@ router = APIRouter()
 
 @router.get("/sum_today")
 async def get_goat_sats_sum_today(
-    external_api: ExternalAPIService = Depends(get_external_api)
+    goat_sats: GoatSatsCounter = Depends(get_goat_sats)
 ):
     """Get total goat sats for today."""
     try:
-        result = await external_api.get_goat_sats_sum_today()
+        result = await goat_sats.get_sum_today()
         if result is None:
             raise HTTPException(status_code=500, detail="Failed to get goat sats sum")
         return result
@@ -36,11 +37,11 @@ async def get_goat_feedings(
 @router.put("/set")
 async def set_goat_sats(
     data: SetGoatSatsData,
-    external_api: ExternalAPIService = Depends(get_external_api)
+    goat_sats: GoatSatsCounter = Depends(get_goat_sats)
 ):
     """Set goat sats to a specific value."""
     try:
-        new_state = await external_api.update_goat_sats(data.new_amount)
+        new_state = await goat_sats.set(data.new_amount)
         return {"status": "success", "new_state": new_state}
     except Exception as e:
         logger.error(f"Error setting goat sats: {e}", exc_info=True)
@@ -1,6 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends
-from dependencies import get_external_api, get_cyberherd_manager
+from fastapi import APIRouter, HTTPException, Depends, Header, Response
+from typing import Optional
+from dependencies import (
+    get_external_api, get_cyberherd_manager, get_price_service, get_balance_service,
+    get_idempotency_store, get_invoice_pool
+)
 from services.external_api import ExternalAPIService
+from services.price_service import PriceService
+from services.balance_service import BalanceService
+from services.idempotency_store import IdempotencyStore
+from services.invoice_pool import InvoicePool
 from config import config, TRIGGER_AMOUNT_SATS
 from models import PaymentRequest, CyberHerdTreats
 import logging
@@ -16,19 +24,30 @@ class PaymentCreate(BaseModel):
 @router.post("")
 async def create_payment(
     payment: PaymentCreate,
-    external_api: ExternalAPIService = Depends(get_external_api)
+    response: Response,
+    idempotency_key: Optional[str] = Header(None),
+    invoice_pool: InvoicePool = Depends(get_invoice_pool),
+    idempotency: IdempotencyStore = Depends(get_idempotency_store)
 ):
-    """Create a new payment invoice."""
-    try:
-        payment_request = await external_api.create_invoice(
-            amount=payment.amount,
-            memo=payment.memo,
-            key=config['HERD_KEY']
-        )
-        return {"payment_request": payment_request}
-    except Exception as e:
-        logger.error(f"Error creating payment: {e}")
-        raise HTTPException(status_code=500, detail="Failed to create payment")
+    """Create a new payment invoice.
+
+    Common amounts are served from the invoice pool. Retries carrying the
+    same Idempotency-Key get the original invoice.
+    """
+    async def create():
+        try:
+            payment_request = await invoice_pool.get_invoice(payment.amount, payment.memo)
+            return {"payment_request": payment_request}
+        except Exception as e:
+            logger.error(f"Error creating payment: {e}")
+            raise HTTPException(status_code=500, detail="Failed to create payment")
+
+    result, replayed = await idempotency.run(
+        "POST /payment", idempotency_key, (payment.amount, payment.memo), create
+    )
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
 
 @router.get("/balance/trigger_amount")
 async def get_trigger_amount():
@@ -38,12 +57,13 @@ async def get_trigger_amount():
 @router.get("/convert/{amount}")
 async def convert_usd_to_sats(
     amount: float,
-    external_api: ExternalAPIService = Depends(get_external_api)
+    price_service: PriceService = Depends(get_price_service)
 ):
     """Convert USD amount to satoshis."""
     try:
-        sats = await external_api.convert_to_sats(amount)
-        return {"sats": sats}
+        quote = await price_service.quote()
+        sats = PriceService.usd_to_sats(amount, quote["price"])
+        return {"sats": sats, "price_age_seconds": quote["age_seconds"]}
     except Exception as e:
         logger.error(f"Error converting amount: {e}")
         raise HTTPException(status_code=500, detail="Conversion failed")
@@ -51,38 +71,50 @@ async def convert_usd_to_sats(
 @router.get("/balance")
 async def get_balance(
     force_refresh: bool = False,
-    external_api = Depends(get_external_api)  # Update to use dependency
+    balance_service: BalanceService = Depends(get_balance_service)
 ):
     """Get current wallet balance."""
     try:
-        balance = await external_api.get_balance(force_refresh)
-        return {"balance": balance}
+        return await balance_service.snapshot(force_refresh)
     except Exception as e:
         logger.error(f"Error getting balance: {e}")
         raise HTTPException(status_code=500, detail="Failed to get balance")
 
 @router.post("/reset")
 async def reset_wallet(
-    external_api = Depends(get_external_api)  # Update to use dependency
+    response: Response,
+    idempotency_key: Optional[str] = Header(None),
+    external_api = Depends(get_external_api),
+    idempotency: IdempotencyStore = Depends(get_idempotency_store)
 ):
-    """Reset wallet by sending remaining balance."""
-    try:
-        balance = await external_api.get_balance(force_refresh=True)
-        if balance > 0:
-            payment_request = await external_api.create_invoice(
-                amount=balance,
-                memo='Reset Herd Wallet',
-                key=config['HERD_KEY']
-            )
-            payment_status = await external_api.pay_invoice(
-                payment_request=payment_request,
-                key=config['HERD_KEY']
-            )
-            return {"success": True, "data": payment_status}
-        return {"success": True, "message": "No balance to reset"}
-    except Exception as e:
-        logger.error(f"Error resetting wallet: {e}")
-        raise HTTPException(status_code=500, detail="Failed to reset wallet")
+    """Reset wallet by sending remaining balance.
+
+    Retries carrying the same Idempotency-Key get the original result
+    instead of sweeping again.
+    """
+    async def reset():
+        try:
+            balance = await external_api.get_balance(force_refresh=True)
+            if balance > 0:
+                payment_request = await external_api.create_invoice(
+                    amount=balance,
+                    memo='Reset Herd Wallet',
+                    key=config['HERD_KEY']
+                )
+                payment_status = await external_api.pay_invoice(
+                    payment_request=payment_request,
+                    key=config['HERD_KEY']
+                )
+                return {"success": True, "data": payment_status}
+            return {"success": True, "message": "No balance to reset"}
+        except Exception as e:
+            logger.error(f"Error resetting wallet: {e}")
+            raise HTTPException(status_code=500, detail="Failed to reset wallet")
+
+    result, replayed = await idempotency.run("POST /payment/reset", idempotency_key, (), reset)
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
 
 @router.post("/hook")
 async def payment_hook(
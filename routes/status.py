@@ -1,9 +1,11 @@
 from fastapi import APIRouter, HTTPException, Depends
 from services.external_api import ExternalAPIService
-from services.database import DatabaseService
-from dependencies import get_external_api, get_db  # Add this import
+from services.herd_state import HerdState
+from services.goat_sats_counter import GoatSatsCounter
+from services.openhab_mirror import OpenHABMirror
+from dependencies import get_external_api, get_herd_state, get_goat_sats, get_openhab_mirror
 from models import SetGoatSatsData
-from config import MAX_HERD_SIZE, TRIGGER_AMOUNT_SATS  # Add TRIGGER_AMOUNT_SATS import
+from config import TRIGGER_AMOUNT_SATS
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,21 +13,24 @@ router = APIRouter()
 
 @router.get("/feeder")
 async def get_feeder_status(
-    external_api: ExternalAPIService = Depends(get_external_api)  # Fix dependency
+    openhab_mirror: OpenHABMirror = Depends(get_openhab_mirror)
 ):
     """Check if feeder override is enabled."""
     try:
-        status = await external_api.get_feeder_status()
+        status = await openhab_mirror.feeder_override()
         return {"feeder_override_enabled": status}
     except Exception as e:
         logger.error(f"Error checking feeder status: {e}")
         raise HTTPException(status_code=500, detail="Failed to check feeder status")
 
 @router.post("/feeder/trigger")
-async def trigger_feeder(external_api: ExternalAPIService = Depends()):
+async def trigger_feeder(
+    external_api: ExternalAPIService = Depends(get_external_api),
+    openhab_mirror: OpenHABMirror = Depends(get_openhab_mirror)
+):
     """Manually trigger the feeder."""
     try:
-        if await external_api.get_feeder_status():
+        if await openhab_mirror.feeder_override():
             raise HTTPException(status_code=400, detail="Feeder override is enabled")
         
         success = await external_api.trigger_feeder()
@@ -37,26 +42,26 @@ async def trigger_feeder(external_api: ExternalAPIService = Depends()):
         raise HTTPException(status_code=500, detail="Failed to trigger feeder")
 
 @router.get("/goat_sats/sum_today")
-async def get_goat_sats_sum(external_api: ExternalAPIService = Depends()):
+async def get_goat_sats_sum(goat_sats: GoatSatsCounter = Depends(get_goat_sats)):
     """Get total sats received today."""
     try:
-        return await external_api.get_goat_sats_sum_today()
+        return await goat_sats.get_sum_today()
     except Exception as e:
         logger.error(f"Error getting goat sats sum: {e}")
         raise HTTPException(status_code=500, detail="Failed to get goat sats sum")
 
 @router.put("/goat_sats/set")
-async def set_goat_sats(data: SetGoatSatsData, external_api: ExternalAPIService = Depends()):
+async def set_goat_sats(data: SetGoatSatsData, goat_sats: GoatSatsCounter = Depends(get_goat_sats)):
     """Set the goat sats counter."""
     try:
-        await external_api.update_goat_sats(data.new_amount)
+        await goat_sats.set(data.new_amount)
         return {"status": "success", "new_amount": data.new_amount}
     except Exception as e:
         logger.error(f"Error setting goat sats: {e}")
         raise HTTPException(status_code=500, detail="Failed to set goat sats")
 
 @router.get("/goat_sats/feedings")
-async def get_goat_feedings(external_api: ExternalAPIService = Depends()):
+async def get_goat_feedings(external_api: ExternalAPIService = Depends(get_external_api)):
     """Get the number of goat feedings today."""
     try:
         feedings = await external_api.get_goat_feedings()
@@ -67,15 +72,11 @@ async def get_goat_feedings(external_api: ExternalAPIService = Depends()):
 
 @router.get("/cyberherd/spots_remaining")
 async def get_cyberherd_spots(
-    database: DatabaseService = Depends(get_db)  # Fix dependency
+    herd_state: HerdState = Depends(get_herd_state)
 ):
     """Get remaining spots in the CyberHerd."""
     try:
-        result = await database.fetch_one(
-            "SELECT COUNT(*) as count FROM cyber_herd"
-        )
-        spots_remaining = MAX_HERD_SIZE - result['count']
-        return {"spots_remaining": spots_remaining}
+        return {"spots_remaining": herd_state.spots_remaining}
     except Exception as e:
         logger.error(f"Error getting spots remaining: {e}")
         raise HTTPException(status_code=500, detail="Failed to get spots remaining")
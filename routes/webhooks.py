@@ -3,6 +3,7 @@ import logging
 from typing import Dict
 from services.payment_processor import PaymentProcessor
 from dependencies import get_payment_processor
+from config import config
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -1,26 +1,15 @@
 from fastapi import APIRouter, WebSocket, Depends
-from services.websocket_manager import WebSocketManager
-from services.payment_processor import PaymentProcessor
 from services.messaging_service import MessagingService
 import logging
 import asyncio
 import random
 from config import config
-from dependencies import _external_api, _notifier, _db
+# The same manager that reads HERD_WEBSOCKET, so clients get its broadcasts
+from dependencies import _websocket_manager as websocket_manager
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-# Initialize services
-payment_processor = PaymentProcessor(_external_api, _notifier, _db)
-
-# Initialize WebSocket manager with payment processor
-websocket_manager = WebSocketManager(
-    uri=config['HERD_WEBSOCKET'],
-    payment_processor=payment_processor,
-    logger=logger
-)
-
 @router.websocket("/")
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for client connections."""
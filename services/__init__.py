@@ -4,11 +4,15 @@ from services.external_api import ExternalAPIService
 from services.websocket_manager import WebSocketManager
 from services.cyberherd_manager import CyberHerdManager
 from services.notifier import NotifierService
+from services.cache_manager import CacheManager
+from services.herd_state import HerdState
 
 __all__ = [
     'DatabaseService',
     'ExternalAPIService',
     'WebSocketManager',
     'CyberHerdManager',
-    'NotifierService'
+    'NotifierService',
+    'CacheManager',
+    'HerdState'
 ]
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+from services.external_api import ExternalAPIService
+from config import config
+
+logger = logging.getLogger(__name__)
+
+class BalanceService:
+    """Herd wallet balance served from memory.
+
+    Every HERD_WEBSOCKET frame carries wallet_balance, and that value is
+    the source of truth. LNbits /api/v1/wallet is only read when asked
+    for with force_refresh, before the first frame arrives, or by the
+    reconcile loop when no frame has arrived for reconcile_interval.
+    """
+
+    def __init__(self, external_api: ExternalAPIService, reconcile_interval: Optional[float] = None):
+        self.external_api = external_api
+        self.reconcile_interval = reconcile_interval or config['BALANCE_RECONCILE_INTERVAL']
+        self._balance_msat: Optional[int] = None
+        self._updated_at: Optional[float] = None  # time.monotonic()
+        self.source: Optional[str] = None
+        self._stats = {"websocket_updates": 0, "reconciles": 0, "reconcile_errors": 0, "drift_corrections": 0}
+
+    @property
+    def age(self) -> Optional[float]:
+        if self._updated_at is None:
+            return None
+        return time.monotonic() - self._updated_at
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "balance_msat": self._balance_msat, "source": self.source, "age_seconds": self.age}
+
+    def _set(self, balance_msat: int, source: str):
+        self._balance_msat = balance_msat
+        self._updated_at = time.monotonic()
+        self.source = source
+
+    def update_from_websocket(self, wallet_balance_sats: int):
+        """Record the balance carried by a HERD_WEBSOCKET frame."""
+        self._set(int(wallet_balance_sats) * 1000, "websocket")
+        self._stats["websocket_updates"] += 1
+
+    async def reconcile(self) -> int:
+        """Read the balance from LNbits and adopt it."""
+        try:
+            balance_msat = await self.external_api.get_balance(force_refresh=True)
+        except Exception:
+            self._stats["reconcile_errors"] += 1
+            raise
+        # The websocket reports whole sats, so only a full sat counts as drift
+        if self._balance_msat is not None and abs(balance_msat - self._balance_msat) >= 1000:
+            logger.warning(f"Balance drifted from {self._balance_msat} to {balance_msat} msat")
+            self._stats["drift_corrections"] += 1
+        self._set(balance_msat, "lnbits")
+        self._stats["reconciles"] += 1
+        return balance_msat
+
+    async def get_balance(self, force_refresh: bool = False) -> int:
+        """Balance in msat; LNbits is only asked if forced or nothing is known."""
+        if force_refresh or self._balance_msat is None:
+            return await self.reconcile()
+        return self._balance_msat
+
+    async def snapshot(self, force_refresh: bool = False) -> Dict[str, Any]:
+        """Balance with its age and source, for API responses."""
+        balance_msat = await self.get_balance(force_refresh)
+        return {
+            "balance": balance_msat,
+            "balance_sats": balance_msat // 1000,
+            "age_seconds": round(self.age, 3),
+            "source": self.source,
+        }
+
+    async def run(self):
+        """Reconcile whenever the websocket has been quiet for reconcile_interval."""
+        while True:
+            try:
+                age = self.age
+                if age is None or age >= self.reconcile_interval:
+                    await self.reconcile()
+            except Exception as e:
+                logger.error(f"Error reconciling wallet balance: {e}")
+            await asyncio.sleep(self.reconcile_interval)
@@ -2,55 +2,341 @@ import json
 import time
 import logging
 import asyncio
-from typing import Any, Optional
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
 from services.database import DatabaseService
+from utils.single_flight import SingleFlight
+from config import config
 
 logger = logging.getLogger(__name__)
 
+_MISSING = object()
+
+# Width of an expiry bucket; must match migration 4 in services/migrations.py
+CACHE_BUCKET_SECONDS = 60
+
+def expiry_bucket(expires_at: float) -> int:
+    return int(expires_at // CACHE_BUCKET_SECONDS)
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "stale_until")
+
+    def __init__(self, value: Any, expires_at: float, stale_until: float):
+        self.value = value
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+
 class CacheManager:
-    def __init__(self, database: DatabaseService):
+    """Two-tier cache: a bounded in-process LRU in front of the SQLite cache table.
+
+    L1 holds decoded values with the same per-entry expiry as their L2 row,
+    so hot keys are served without a database round trip or json.loads.
+    Values returned from L1 are shared objects and must not be mutated.
+
+    Expired L2 rows are deleted lazily when a read hits them. Every row also
+    carries the index of the time bucket it expires in, and a single sweeper
+    removes rows from buckets that have fully elapsed, a bounded batch per tick.
+    """
+
+    def __init__(self, database: DatabaseService, max_entries: Optional[int] = None):
         self.database = database
-        self._cleanup_task = None
+        self.max_entries = max_entries or config['CACHE_L1_MAX_ENTRIES']
+        self._l1: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+        self._tag_generations: Dict[str, int] = {}
+        self._loads = SingleFlight()
+        self._sweeper_task = None
+        self.sweep_interval = config['CACHE_SWEEP_INTERVAL']
+        self.sweep_batch = config['CACHE_SWEEP_BATCH']
+        self._stats = {
+            "l1_hits": 0,
+            "l2_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "stale_hits": 0,
+            "loads": 0,
+            "load_errors": 0,
+            "invalidations": 0,
+            "lazy_expired": 0,
+            "swept_rows": 0,
+            "sweep_ticks": 0,
+            "sweep_seconds_total": 0.0,
+            "last_sweep_seconds": 0.0,
+        }
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss/eviction counters plus current L1 size."""
+        return {
+            **self._stats,
+            "coalesced_loads": self._loads.shared,
+            "l1_size": len(self._l1),
+            "l1_max_entries": self.max_entries,
+        }
+
+    def _l1_lookup(self, key: str, now: float) -> Optional[_Entry]:
+        """Return the L1 entry if it is fresh or still inside its stale window."""
+        entry = self._l1.get(key)
+        if entry is None:
+            return None
+        if entry.stale_until <= now:
+            del self._l1[key]
+            self._stats["expirations"] += 1
+            return None
+        self._l1.move_to_end(key)
+        return entry
+
+    def _l1_get(self, key: str, now: float) -> Tuple[bool, Any]:
+        entry = self._l1_lookup(key, now)
+        if entry is None or entry.expires_at <= now:
+            return False, None
+        self._stats["l1_hits"] += 1
+        return True, entry.value
+
+    def _l1_set(self, key: str, value: Any, expires_at: float, stale_until: Optional[float] = None):
+        self._l1[key] = _Entry(value, expires_at, max(expires_at, stale_until or expires_at))
+        self._l1.move_to_end(key)
+        while len(self._l1) > self.max_entries:
+            self._l1.popitem(last=False)
+            self._stats["evictions"] += 1
 
     async def get(self, key: str, default: Any = None) -> Any:
         """Get a cached value."""
+        now = time.time()
+        found, value = self._l1_get(key, now)
+        if found:
+            return value
+
         query = "SELECT value, expires_at FROM cache WHERE key = :key"
         result = await self.database.fetch_one(query, {"key": key})
         
-        if result and result["expires_at"] > time.time():
-            return json.loads(result["value"])
+        if result and result["expires_at"] > now:
+            value = json.loads(result["value"])
+            self._l1_set(key, value, result["expires_at"])
+            self._stats["l2_hits"] += 1
+            return value
+        if result:
+            await self._expire_rows([key], now)
+        self._stats["misses"] += 1
         return default
 
-    async def set(self, key: str, value: Any, ttl: int = 300) -> None:
-        """Set a cache value with TTL."""
+    async def _expire_rows(self, keys: List[str], now: float):
+        """Delete rows a read found expired, unless they were refreshed meanwhile."""
+        try:
+            for key in keys:
+                result = await self.database.execute(
+                    "DELETE FROM cache WHERE key = :key AND expires_at <= :now",
+                    {"key": key, "now": now}
+                )
+                if result.rowcount:
+                    self._stats["lazy_expired"] += result.rowcount
+                    await self.database.execute(
+                        "DELETE FROM cache_tags WHERE key = :key", {"key": key}
+                    )
+        except Exception as e:
+            logger.warning(f"Error deleting expired cache rows: {e}")
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Get several cached values; missing or expired keys are omitted."""
+        now = time.time()
+        found: Dict[str, Any] = {}
+        pending = []
+        for key in dict.fromkeys(keys):
+            hit, value = self._l1_get(key, now)
+            if hit:
+                found[key] = value
+            else:
+                pending.append(key)
+
+        if pending:
+            params = {f"k{i}": key for i, key in enumerate(pending)}
+            placeholders = ", ".join(f":{name}" for name in params)
+            rows = await self.database.fetch_all(
+                f"SELECT key, value, expires_at FROM cache WHERE key IN ({placeholders})",
+                params
+            )
+            expired = []
+            for row in rows:
+                if row["expires_at"] > now:
+                    value = json.loads(row["value"])
+                    self._l1_set(row["key"], value, row["expires_at"])
+                    found[row["key"]] = value
+                    self._stats["l2_hits"] += 1
+                else:
+                    expired.append(row["key"])
+            self._stats["misses"] += len(pending) - sum(1 for key in pending if key in found)
+            if expired:
+                await self._expire_rows(expired, now)
+        return found
+
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: int = 300,
+        tags: Optional[Iterable[str]] = None,
+        stale_ttl: int = 0
+    ) -> None:
+        """Set a cache value with TTL.
+
+        tags group entries for invalidate_tag(); stale_ttl keeps the value
+        in L1 for that many seconds past expiry so get_or_load can serve it
+        while a refresh runs.
+        """
         expires_at = time.time() + ttl
+        tags = list(dict.fromkeys(tags or ()))
         query = """
-            INSERT INTO cache (key, value, expires_at)
-            VALUES (:key, :value, :expires_at)
+            INSERT INTO cache (key, value, expires_at, bucket)
+            VALUES (:key, :value, :expires_at, :bucket)
             ON CONFLICT(key) DO UPDATE SET
                 value = :value,
-                expires_at = :expires_at
+                expires_at = :expires_at,
+                bucket = :bucket
         """
-        await self.database.execute(query, {
+        values = {
             "key": key,
             "value": json.dumps(value),
-            "expires_at": expires_at
-        })
+            "expires_at": expires_at,
+            "bucket": expiry_bucket(expires_at)
+        }
+        if tags:
+            async with self.database.transaction():
+                await self.database.execute(query, values)
+                await self.database.execute_many(
+                    "INSERT OR IGNORE INTO cache_tags (tag, key) VALUES (:tag, :key)",
+                    [{"tag": tag, "key": key} for tag in tags]
+                )
+        else:
+            await self.database.execute(query, values)
+        self._l1_set(key, value, expires_at, expires_at + stale_ttl)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
 
-    async def cleanup(self) -> None:
-        """Remove expired cache entries."""
-        query = "DELETE FROM cache WHERE expires_at < :current_time"
-        await self.database.execute(query, {"current_time": time.time()})
-        
-    async def start_cleanup_task(self) -> None:
-        """Start periodic cache cleanup."""
-        async def cleanup_loop():
+    async def delete(self, key: str) -> None:
+        """Remove a key from both tiers."""
+        self._l1.pop(key, None)
+        async with self.database.transaction():
+            await self.database.execute("DELETE FROM cache WHERE key = :key", {"key": key})
+            await self.database.execute("DELETE FROM cache_tags WHERE key = :key", {"key": key})
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: int = 300,
+        tags: Optional[List[str]] = None,
+        stale_ttl: int = 0
+    ) -> Any:
+        """Return the cached value for key, loading and caching it on a miss.
+
+        Only one loader runs per key at a time; concurrent callers await the
+        same result. Within stale_ttl seconds after expiry the previous value
+        is returned immediately while a single background refresh runs.
+        """
+        now = time.time()
+        entry = self._l1_lookup(key, now)
+        if entry is not None:
+            if entry.expires_at > now:
+                self._stats["l1_hits"] += 1
+                return entry.value
+            self._stats["stale_hits"] += 1
+            self._loads.start(key, lambda: self._load(key, loader, ttl, tags, stale_ttl))
+            return entry.value
+
+        value = await self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        return await self._loads.do(key, lambda: self._load(key, loader, ttl, tags, stale_ttl))
+
+    async def _load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: int,
+        tags: Optional[List[str]],
+        stale_ttl: int
+    ) -> Any:
+        generations = {tag: self._tag_generations.get(tag, 0) for tag in tags or ()}
+        self._stats["loads"] += 1
+        try:
+            value = await loader()
+        except Exception:
+            self._stats["load_errors"] += 1
+            raise
+        # Don't cache a value computed before one of its tags was invalidated
+        if any(self._tag_generations.get(tag, 0) != gen for tag, gen in generations.items()):
+            return value
+        try:
+            await self.set(key, value, ttl=ttl, tags=tags, stale_ttl=stale_ttl)
+        except Exception as e:
+            logger.error(f"Error caching loaded value for {key}: {e}")
+        return value
+
+    async def invalidate_tag(self, tag: str) -> int:
+        """Drop every entry carrying tag from both tiers; returns L1 entries dropped."""
+        self._tag_generations[tag] = self._tag_generations.get(tag, 0) + 1
+        self._stats["invalidations"] += 1
+        keys = self._tags.pop(tag, set())
+        for key in keys:
+            self._l1.pop(key, None)
+        async with self.database.transaction():
+            await self.database.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache_tags WHERE tag = :tag)",
+                {"tag": tag}
+            )
+            await self.database.execute("DELETE FROM cache_tags WHERE tag = :tag", {"tag": tag})
+        return len(keys)
+
+    async def sweep_once(self) -> int:
+        """Expire L1 entries and one bounded batch of rows from elapsed buckets.
+
+        Only buckets that ended before now are swept, so every row in them
+        has expired and the delete needs no per-row expiry check. Returns
+        the number of L2 rows removed.
+        """
+        start = time.perf_counter()
+        now = time.time()
+        for key in [k for k, entry in self._l1.items() if entry.stale_until <= now]:
+            del self._l1[key]
+            self._stats["expirations"] += 1
+
+        bucket = expiry_bucket(now)
+        async with self.database.transaction():
+            result = await self.database.execute(
+                """
+                DELETE FROM cache WHERE rowid IN (
+                    SELECT rowid FROM cache WHERE bucket < :bucket LIMIT :limit
+                )
+                """,
+                {"bucket": bucket, "limit": self.sweep_batch}
+            )
+            swept = result.rowcount
+            if swept:
+                await self.database.execute(
+                    "DELETE FROM cache_tags"
+                    " WHERE NOT EXISTS (SELECT 1 FROM cache WHERE cache.key = cache_tags.key)"
+                )
+
+        elapsed = time.perf_counter() - start
+        self._stats["swept_rows"] += swept
+        self._stats["sweep_ticks"] += 1
+        self._stats["sweep_seconds_total"] += elapsed
+        self._stats["last_sweep_seconds"] = elapsed
+        return swept
+
+    async def start_sweeper(self) -> None:
+        """Start the single background expiry sweeper."""
+        async def sweep_loop():
             while True:
                 try:
-                    await self.cleanup()
-                    await asyncio.sleep(1800)  # Run every 30 minutes
+                    swept = await self.sweep_once()
+                    # A full batch means a backlog; come back sooner
+                    delay = 1 if swept >= self.sweep_batch else self.sweep_interval
+                    await asyncio.sleep(delay)
                 except Exception as e:
-                    logger.error(f"Error in cache cleanup: {e}")
+                    logger.error(f"Error in cache sweeper: {e}")
                     await asyncio.sleep(60)  # Wait a minute before retrying
-                    
-        self._cleanup_task = asyncio.create_task(cleanup_loop())
+
+        if self._sweeper_task is None or self._sweeper_task.done():
+            self._sweeper_task = asyncio.create_task(sweep_loop())
@@ -3,6 +3,8 @@ from typing import List, Dict, Optional, Tuple
 from services.database import DatabaseService
 from services.external_api import ExternalAPIService
 from services.notifier import NotifierService
+from services.herd_state import HerdState
+from utils.resilience import Priority, call_priority
 from config import config, MAX_HERD_SIZE
 
 logger = logging.getLogger(__name__)
@@ -12,11 +14,13 @@ class CyberHerdManager:
         self, 
         database: DatabaseService,
         external_api: ExternalAPIService,
-        notifier: NotifierService
+        notifier: NotifierService,
+        herd_state: HerdState
     ):
         self.database = database
         self.external_api = external_api
         self.notifier = notifier
+        self.herd_state = herd_state
 
     def calculate_payout(self, amount: float) -> float:
         """Calculate payout amount based on input amount."""
@@ -28,9 +32,16 @@ class CyberHerdManager:
         self,
         member_data: Dict,
         kinds_int: List[int],
-        current_herd_size: int
+        current_herd_size: int,
+        notify: bool = True,
+        staged: Optional[List] = None
     ) -> Tuple[bool, Optional[str]]:
-        """Process a new CyberHerd member."""
+        """Process a new CyberHerd member.
+
+        When the caller batches writes in a transaction it passes
+        notify=False and a staged list, then sends notifications and
+        applies the staged herd changes itself once the batch has committed.
+        """
         if current_herd_size >= MAX_HERD_SIZE:
             return False, "Herd is full"
 
@@ -40,12 +51,13 @@ class CyberHerdManager:
             member_data["payouts"] = 0.0
 
         try:
-            await self.database.add_cyber_herd_member(member_data)
-            await self.notifier.send_cyberherd_notification(
-                member_data,
-                difference=0,  # You might want to calculate this
-                spots_remaining=MAX_HERD_SIZE - current_herd_size - 1
-            )
+            await self.herd_state.add_member(member_data, staged=staged)
+            if notify:
+                await self.notifier.send_cyberherd_notification(
+                    member_data,
+                    difference=0,  # You might want to calculate this
+                    spots_remaining=MAX_HERD_SIZE - current_herd_size - 1
+                )
             return True, None
         except Exception as e:
             logger.error(f"Error processing new member: {e}")
@@ -55,9 +67,10 @@ class CyberHerdManager:
         self,
         member_data: Dict,
         kinds_int: List[int],
-        current_kinds: List[int]
+        current_kinds: List[int],
+        staged: Optional[List] = None
     ) -> Tuple[bool, Optional[str]]:
-        """Process an existing CyberHerd member."""
+        """Process an existing CyberHerd member; see process_new_member for staged."""
         try:
             payout_increment = 0.0
             if 9734 in kinds_int:
@@ -76,9 +89,10 @@ class CyberHerdManager:
                     "payouts": payout_increment,
                     "amount": member_data.get("amount", 0)
                 }
-                await self.database.update_cyber_herd_member(
+                await self.herd_state.update_member(
                     member_data["pubkey"],
-                    update_data
+                    update_data,
+                    staged=staged
                 )
 
             return True, None
@@ -89,22 +103,27 @@ class CyberHerdManager:
     async def distribute_rewards(self, total_amount: int):
         """Distribute rewards to CyberHerd members."""
         try:
-            members = await self.database.get_cyber_herd_members()
-            for member in members:
-                if member["lud16"] and member["payouts"] > 0:
-                    amount = int(member["payouts"] * total_amount)
-                    if amount > 0:
-                        await self.external_api.make_lnurl_payment(
-                            lud16=member["lud16"],
-                            msat_amount=amount * 1000,  # Convert to msats
-                            description="CyberHerd Reward",
-                            key=config['HERD_KEY']
-                        )
-                        await self.notifier.send_cyberherd_notification(
-                            member,
-                            difference=0,
-                            spots_remaining=MAX_HERD_SIZE - len(members)
-                        )
+            members = self.herd_state.members()
+            with call_priority(Priority.PAYMENT):
+                # Resolve every payout address up front, in parallel
+                await self.external_api.lnurl_cache.warm(
+                    member["lud16"] for member in members if member["payouts"] > 0
+                )
+                for member in members:
+                    if member["lud16"] and member["payouts"] > 0:
+                        amount = int(member["payouts"] * total_amount)
+                        if amount > 0:
+                            await self.external_api.make_lnurl_payment(
+                                lud16=member["lud16"],
+                                msat_amount=amount * 1000,  # Convert to msats
+                                description="CyberHerd Reward",
+                                key=config['HERD_KEY']
+                            )
+                            await self.notifier.send_cyberherd_notification(
+                                member,
+                                difference=0,
+                                spots_remaining=MAX_HERD_SIZE - len(members)
+                            )
         except Exception as e:
             logger.error(f"Error distributing rewards: {e}")
             raise
@@ -125,9 +144,10 @@ class CyberHerdManager:
     async def reset_cyber_herd(self):
         """Reset the CyberHerd and related data."""
         try:
-            await self.database.execute("DELETE FROM cyber_herd")
+            await self.herd_state.clear()
             logger.info("CyberHerd table cleared successfully.")
             await self.external_api.reset_cyberherd_targets()
+            await self.herd_state.invalidate_cache()
             return {
                 "success": True,
                 "message": "CyberHerd reset successfully"
@@ -165,21 +185,15 @@ class CyberHerdManager:
 
             logger.debug(f"Payment details - hash: {payment_hash}, desc: {description}, amount: {amount}")
 
-            # Fetch member by payment_hash
-            query = "SELECT * FROM cyber_herd WHERE event_id = :payment_hash"
-            logger.debug(f"Executing query: {query} with payment_hash: {payment_hash}")
-            
-            member = await self.database.fetch_one(
-                query,
-                {"payment_hash": payment_hash}
-            )
+            # Look up member by payment_hash
+            member = self.herd_state.get_by_event_id(payment_hash)
 
             if member:
                 logger.debug(f"Found member for payment_hash {payment_hash}: {member}")
                 
                 # Update notified field
                 logger.debug(f"Updating notified field for pubkey: {member['pubkey']}")
-                await self.database.update_notified_field(member["pubkey"], "success")
+                await self.herd_state.set_notified(member["pubkey"], "success")
 
                 # Send notification
                 logger.debug(f"Sending notification for amount: {amount}")
@@ -2,57 +2,194 @@ import logging
 import asyncio
 import json
 import time
-from typing import Dict, List, Optional, Any
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import text
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import AsyncIterator, Dict, List, Optional, Any
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import StaticPool
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql.elements import TextClause
 from config import config
+from services.migrations import apply_migrations
+from services.db_writer import DatabaseWriter
+from services.query_profiler import QueryProfiler, normalize_sql
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_DATABASE_URL = "sqlite+aiosqlite:///./lightning_goats.db"
 
+# Seconds before the same slow statement is explained again
+EXPLAIN_INTERVAL = 60
+EXPLAINABLE_PREFIXES = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+@lru_cache(maxsize=512)
+def _text(query: str) -> TextClause:
+    """Return a shared TextClause so repeated queries reuse the compiled form."""
+    return text(query)
+
+CYBER_HERD_COLUMNS = (
+    "pubkey", "display_name", "event_id", "note", "kinds",
+    "nprofile", "lud16", "notified", "payouts", "amount", "picture"
+)
+
+UPSERT_CYBER_HERD_MEMBER = f"""
+    INSERT INTO cyber_herd ({", ".join(CYBER_HERD_COLUMNS)})
+    VALUES ({", ".join(":" + column for column in CYBER_HERD_COLUMNS)})
+    ON CONFLICT(pubkey) DO UPDATE SET
+        display_name = excluded.display_name,
+        event_id = excluded.event_id,
+        note = excluded.note,
+        kinds = excluded.kinds,
+        nprofile = excluded.nprofile,
+        lud16 = excluded.lud16,
+        picture = excluded.picture
+"""
+
+def member_row(member_data: Dict) -> Dict:
+    """Map member data onto cyber_herd columns, storing kinds as CSV."""
+    values = {column: member_data.get(column) for column in CYBER_HERD_COLUMNS}
+    if isinstance(values["kinds"], (list, tuple)):
+        values["kinds"] = ",".join(str(k) for k in values["kinds"])
+    values["payouts"] = values["payouts"] or 0.0
+    values["amount"] = values["amount"] or 0
+    return values
+
+def _is_memory_database(database_url: str) -> bool:
+    return database_url.endswith('://') or ':memory:' in database_url or 'mode=memory' in database_url
+
 class DatabaseService:
-    def __init__(self, database_url: str = None):
+    def __init__(self, database_url: str = None, write_actor: Optional[bool] = None):
         self.database_url = database_url or config.get('DATABASE_URL', DEFAULT_DATABASE_URL)
         if not self.database_url.startswith('sqlite+aiosqlite://'):
             self.database_url = self.database_url.replace('sqlite://', 'sqlite+aiosqlite://')
-        
-        self.engine = create_async_engine(self.database_url, echo=True)
-        self.async_session = sessionmaker(
+
+        if write_actor is None:
+            write_actor = config['DB_WRITE_ACTOR']
+        if write_actor and _is_memory_database(self.database_url):
+            logger.warning("Write actor mode needs a file database; using direct writes")
+            write_actor = False
+
+        self.engine = self._create_engine()
+        self.async_session = async_sessionmaker(
             self.engine, class_=AsyncSession, expire_on_commit=False
         )
 
+        # In write actor mode every mutation goes through one writer task and
+        # reads use a separate pool of query-only connections.
+        self._writer: Optional[DatabaseWriter] = None
+        self.read_engine = self.engine
+        self.read_session = self.async_session
+        if write_actor:
+            self._writer = DatabaseWriter(
+                self.async_session,
+                batch_size=config['DB_WRITE_BATCH_SIZE'],
+                batch_interval=config['DB_WRITE_BATCH_MS'] / 1000,
+                queue_size=config['DB_WRITE_QUEUE_SIZE']
+            )
+            self.read_engine = self._create_engine(read_only=True)
+            self.read_session = async_sessionmaker(
+                self.read_engine, class_=AsyncSession, expire_on_commit=False
+            )
+
+        self.profiler: Optional[QueryProfiler] = (
+            QueryProfiler(slow_query_ms=config['DB_SLOW_QUERY_MS'])
+            if config['DB_PROFILE'] else None
+        )
+        self._last_explained: Dict[str, float] = {}
+        self._explain_tasks = set()
+
+        self._connected = False
+        self._connect_lock = asyncio.Lock()
+        # Session of the transaction() block the current task is running in
+        self._current_session: ContextVar[Optional[AsyncSession]] = ContextVar(
+            f"db_session_{id(self)}", default=None
+        )
+
+    def _create_engine(self, read_only: bool = False):
+        """Create the app-lifetime engine with a tuned pool and per-connection pragmas."""
+        engine_kwargs = {
+            "echo": config['DB_ECHO'],
+            "query_cache_size": config['DB_STATEMENT_CACHE_SIZE'],
+            "connect_args": {"cached_statements": config['DB_STATEMENT_CACHE_SIZE']},
+        }
+        if _is_memory_database(self.database_url):
+            # A single shared connection keeps an in-memory database alive
+            engine_kwargs["poolclass"] = StaticPool
+        else:
+            engine_kwargs.update({
+                "pool_size": config['DB_POOL_SIZE'],
+                "max_overflow": config['DB_MAX_OVERFLOW'],
+                "pool_timeout": config['DB_POOL_TIMEOUT'],
+            })
+
+        engine = create_async_engine(self.database_url, **engine_kwargs)
+
+        def on_connect(dbapi_connection, connection_record):
+            self._apply_pragmas(dbapi_connection, read_only)
+
+        event.listen(engine.sync_engine, "connect", on_connect)
+        return engine
+
+    @staticmethod
+    def _apply_pragmas(dbapi_connection, read_only: bool = False):
+        """Apply SQLite pragmas whenever the pool opens a new connection."""
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA busy_timeout={int(config['DB_BUSY_TIMEOUT_MS'])}")
+            cursor.execute(f"PRAGMA mmap_size={int(config['DB_MMAP_SIZE'])}")
+            # Negative cache_size is expressed in KiB rather than pages
+            cursor.execute(f"PRAGMA cache_size=-{int(config['DB_CACHE_SIZE_KB'])}")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+            if read_only:
+                cursor.execute("PRAGMA query_only=ON")
+        finally:
+            cursor.close()
+
+    @property
+    def connected(self) -> bool:
+        return self._connected
+
+    @property
+    def database_path(self) -> Optional[str]:
+        """Filesystem path of the database, or None for in-memory databases."""
+        if _is_memory_database(self.database_url):
+            return None
+        return make_url(self.database_url).database
+
+    @property
+    def write_actor(self) -> bool:
+        return self._writer is not None
+
+    @property
+    def write_stats(self) -> Dict[str, Any]:
+        """Group-commit counters, or an empty dict when writes are direct."""
+        return self._writer.stats if self._writer else {}
+
+    def session(self) -> AsyncSession:
+        """Return a new session bound to the shared engine."""
+        return self.async_session()
+
     async def connect(self):
-        """Initialize database connection and create tables."""
+        """Migrate the schema once for the lifetime of the engine."""
+        if self._connected:
+            return
+        async with self._connect_lock:
+            if self._connected:
+                return
+            await self._migrate()
+            if self._writer:
+                self._writer.start()
+            self._connected = True
+
+    async def _migrate(self):
+        """Initialize database connection and apply schema migrations."""
         try:
-            async with self.engine.begin() as conn:
-                # Create tables
-                await conn.execute(text("""
-                    CREATE TABLE IF NOT EXISTS cyber_herd (
-                        pubkey TEXT PRIMARY KEY,
-                        display_name TEXT,
-                        event_id TEXT,
-                        note TEXT,
-                        kinds TEXT,
-                        nprofile TEXT,
-                        lud16 TEXT,
-                        notified TEXT,
-                        payouts REAL,
-                        amount INTEGER,
-                        picture TEXT
-                    )
-                """))
-                
-                await conn.execute(text("""
-                    CREATE TABLE IF NOT EXISTS cache (
-                        key TEXT PRIMARY KEY,
-                        value TEXT NOT NULL,
-                        expires_at REAL NOT NULL
-                    )
-                """))
-            
-            logger.info("Successfully connected to database and created tables")
+            version = await apply_migrations(self.engine)
+            logger.info(f"Successfully connected to database (schema version {version})")
         except Exception as e:
             logger.error(f"Failed to connect to database: {e}")
             raise
@@ -60,12 +197,105 @@ class DatabaseService:
     async def disconnect(self):
         """Close database connection."""
         try:
+            if self._writer:
+                await self._writer.stop()
             await self.engine.dispose()
+            if self.read_engine is not self.engine:
+                await self.read_engine.dispose()
+            self._connected = False
             logger.info("Successfully disconnected from database")
         except Exception as e:
             logger.error(f"Error disconnecting from database: {e}")
             raise
 
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator["DatabaseService"]:
+        """Run every statement issued inside the block as one transaction.
+
+        fetch_one, fetch_all, execute and execute_many calls made by the
+        current task while the block is open join the transaction and are
+        committed together on exit, or rolled back if the block raises.
+        Nested blocks join the outermost transaction. In write actor mode the
+        block holds the writer's session exclusively until it exits.
+        """
+        if self._current_session.get() is not None:
+            yield self
+            return
+
+        if self._writer:
+            async with self._writer.lease() as session:
+                token = self._current_session.set(session)
+                try:
+                    yield self
+                finally:
+                    self._current_session.reset(token)
+            return
+
+        async with self.async_session() as session:
+            token = self._current_session.set(session)
+            try:
+                async with session.begin():
+                    yield self
+            finally:
+                self._current_session.reset(token)
+
+    @asynccontextmanager
+    async def _session_scope(self, commit: bool) -> AsyncIterator[AsyncSession]:
+        """Yield the active transaction's session or a short-lived one."""
+        session = self._current_session.get()
+        if session is not None:
+            yield session
+            return
+
+        session_factory = self.async_session if commit else self.read_session
+        async with session_factory() as session:
+            yield session
+            if commit:
+                await session.commit()
+
+    @asynccontextmanager
+    async def _profiled(self, query: str, values: Any) -> AsyncIterator[None]:
+        """Time a statement and hand slow ones to the query profiler."""
+        if self.profiler is None:
+            yield
+            return
+        start = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if self.profiler.record(query, elapsed_ms, error) and not error:
+                self._schedule_explain(query, values, elapsed_ms)
+
+    def _schedule_explain(self, query: str, values: Any, elapsed_ms: float):
+        """Explain a slow statement in the background, at most once per interval."""
+        if not query.lstrip().upper().startswith(EXPLAINABLE_PREFIXES):
+            self.profiler.record_slow_query(query, elapsed_ms, [])
+            return
+        key = normalize_sql(query)
+        now = time.monotonic()
+        if now - self._last_explained.get(key, float("-inf")) < EXPLAIN_INTERVAL:
+            return
+        self._last_explained[key] = now
+        if isinstance(values, list):
+            values = values[0] if values else {}
+        task = asyncio.create_task(self._explain_slow_query(query, values or {}, elapsed_ms))
+        self._explain_tasks.add(task)
+        task.add_done_callback(self._explain_tasks.discard)
+
+    async def _explain_slow_query(self, query: str, values: Dict, elapsed_ms: float):
+        try:
+            async with self.read_session() as session:
+                result = await session.execute(text(f"EXPLAIN QUERY PLAN {query}"), values)
+                plan = [row._mapping["detail"] for row in result]
+        except Exception as e:
+            plan = [f"EXPLAIN QUERY PLAN failed: {e}"]
+        self.profiler.record_slow_query(query, elapsed_ms, plan)
+
     async def fetch_one(self, query: str, values: Optional[Dict] = None) -> Optional[Dict]:
         """Execute a query and return one result."""
         try:
@@ -73,8 +303,8 @@ class DatabaseService:
                 logger.debug(f"Executing fetch_one query: {query}")
                 logger.debug(f"With values: {values}")
                 
-            async with self.async_session() as session:
-                result = await session.execute(text(query), values or {})
+            async with self._session_scope(commit=False) as session, self._profiled(query, values):
+                result = await session.execute(_text(query), values or {})
                 row = result.first()
                 if config['DEBUG']:
                     logger.debug(f"Query result: {row._mapping if row else None}")
@@ -86,8 +316,8 @@ class DatabaseService:
     async def fetch_all(self, query: str, values: Optional[Dict] = None) -> List[Dict]:
         """Execute a query and return all results."""
         try:
-            async with self.async_session() as session:
-                result = await session.execute(text(query), values or {})
+            async with self._session_scope(commit=False) as session, self._profiled(query, values):
+                result = await session.execute(_text(query), values or {})
                 return [dict(row._mapping) for row in result]
         except Exception as e:
             logger.error(f"Error executing fetch_all query: {e}")
@@ -96,51 +326,98 @@ class DatabaseService:
     async def execute(self, query: str, values: Optional[Dict] = None) -> Any:
         """Execute a query."""
         try:
-            async with self.async_session() as session:
-                result = await session.execute(text(query), values or {})
-                await session.commit()
-                return result
+            async with self._profiled(query, values):
+                if self._writer and self._current_session.get() is None:
+                    return await self._writer.execute(_text(query), values or {})
+                async with self._session_scope(commit=True) as session:
+                    return await session.execute(_text(query), values or {})
         except Exception as e:
             logger.error(f"Error executing query: {e}")
             raise
 
-    async def cache_set(self, key: str, value: Any, ttl: int = 300):
-        """Set a cache value with TTL."""
-        expires_at = time.time() + ttl
+    async def execute_many(self, query: str, values_list: List[Dict]) -> int:
+        """Execute a statement once per parameter set and commit once.
+
+        Returns the total number of affected rows.
+        """
+        if not values_list:
+            return 0
+        try:
+            async with self._profiled(query, values_list):
+                if self._writer and self._current_session.get() is None:
+                    return await self._writer.execute_many(_text(query), values_list)
+                async with self._session_scope(commit=True) as session:
+                    result = await session.execute(_text(query), list(values_list))
+                    return result.rowcount
+        except Exception as e:
+            logger.error(f"Error executing batch query: {e}")
+            raise
+
+    async def add_cyber_herd_member(self, member_data: Dict):
+        """Insert a CyberHerd member, refreshing profile fields if it exists."""
+        await self.execute(UPSERT_CYBER_HERD_MEMBER, member_row(member_data))
+
+    async def add_cyber_herd_members(self, members: List[Dict]) -> int:
+        """Upsert several CyberHerd members in a single commit."""
+        return await self.execute_many(
+            UPSERT_CYBER_HERD_MEMBER,
+            [member_row(member) for member in members]
+        )
+
+    async def update_cyber_herd_member(self, pubkey: str, update_data: Dict):
+        """Add a payout increment to a member and record the latest zap amount."""
         query = """
-            INSERT INTO cache (key, value, expires_at)
-            VALUES (:key, :value, :expires_at)
-            ON CONFLICT(key) DO UPDATE SET
-                value = :value,
-                expires_at = :expires_at
+            UPDATE cyber_herd
+            SET payouts = COALESCE(payouts, 0) + :payouts,
+                amount = :amount
+            WHERE pubkey = :pubkey
         """
         await self.execute(query, {
-            "key": key,
-            "value": json.dumps(value),
-            "expires_at": expires_at
+            "pubkey": pubkey,
+            "payouts": update_data.get("payouts", 0.0),
+            "amount": update_data.get("amount", 0)
         })
 
-    async def cache_get(self, key: str) -> Optional[Any]:
-        """Get a cache value if not expired."""
-        query = "SELECT value, expires_at FROM cache WHERE key = :key"
-        result = await self.fetch_one(query, {"key": key})
-        if result and result["expires_at"] > time.time():
-            return json.loads(result["value"])
-        return None
-
-    async def cache_cleanup(self):
-        """Remove expired cache entries."""
-        query = "DELETE FROM cache WHERE expires_at < :current_time"
-        await self.execute(query, {"current_time": time.time()})
-
-    async def schedule_cache_cleanup(self):
-        """Schedule periodic cache cleanup."""
-        while True:
-            await asyncio.sleep(1800)  # Every 30 minutes
-            try:
-                await self.cache_cleanup()
-            except Exception as e:
-                logger.error(f"Error cleaning up cache: {e}")
+    async def get_cyber_herd_members(self) -> List[Dict]:
+        """Return all CyberHerd members."""
+        return await self.fetch_all("SELECT * FROM cyber_herd")
+
+    async def delete_cyber_herd_members_by_lud16(self, lud16: str) -> int:
+        """Delete CyberHerd members by lightning address."""
+        result = await self.execute(
+            "DELETE FROM cyber_herd WHERE lud16 = :lud16",
+            {"lud16": lud16}
+        )
+        return result.rowcount
+
+    async def clear_cyber_herd(self):
+        """Remove every CyberHerd member."""
+        await self.execute("DELETE FROM cyber_herd")
+
+    async def get_payment_checkpoint(self, wallet: str) -> Optional[Dict]:
+        """Return the last processed payment time and hash for a wallet."""
+        return await self.fetch_one(
+            "SELECT payment_time, payment_hash FROM payment_checkpoint WHERE wallet = :wallet",
+            {"wallet": wallet}
+        )
+
+    async def set_payment_checkpoint(self, wallet: str, payment_time: int, payment_hash: str):
+        """Move a wallet's checkpoint forward; older payments never move it back."""
+        query = """
+            INSERT INTO payment_checkpoint (wallet, payment_time, payment_hash, updated_at)
+            VALUES (:wallet, :payment_time, :payment_hash, :updated_at)
+            ON CONFLICT(wallet) DO UPDATE SET
+                payment_time = excluded.payment_time,
+                payment_hash = excluded.payment_hash,
+                updated_at = excluded.updated_at
+            WHERE excluded.payment_time >= payment_checkpoint.payment_time
+        """
+        await self.execute(query, {
+            "wallet": wallet,
+            "payment_time": payment_time,
+            "payment_hash": payment_hash,
+            "updated_at": time.time()
+        })
 
     async def update_notified_field(self, pubkey: str, status: str):
         """Update the 'notified' field for a CyberHerd member."""
@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+from services.database import DatabaseService
+from config import config
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_MODES = ("PASSIVE", "FULL", "RESTART", "TRUNCATE")
+
+class DatabaseMaintenanceService:
+    """Online backups and WAL checkpointing for the SQLite database.
+
+    Backups use the SQLite online backup API, copying a bounded number of
+    pages per step and sleeping between steps so writers are only blocked
+    for one step at a time. PASSIVE checkpoints run on an interval and a
+    TRUNCATE checkpoint runs whenever the WAL grows past a size threshold.
+    All SQLite calls run in a worker thread on their own connection.
+    """
+
+    def __init__(self, database: DatabaseService):
+        self.database = database
+        self.database_path = database.database_path
+        self.backup_dir = Path(config['DB_BACKUP_DIR'])
+        self.backup_interval = config['DB_BACKUP_INTERVAL']
+        self.backup_keep = config['DB_BACKUP_KEEP']
+        self.pages_per_step = config['DB_BACKUP_PAGES_PER_STEP']
+        self.step_sleep = config['DB_BACKUP_STEP_SLEEP']
+        self.checkpoint_interval = config['DB_CHECKPOINT_INTERVAL']
+        self.wal_max_bytes = config['DB_WAL_MAX_BYTES']
+        self.tick_seconds = 30
+        self._last_backup = 0.0
+        self._last_checkpoint = 0.0
+        self._stats: Dict[str, Any] = {
+            "backups": 0,
+            "backup_failures": 0,
+            "last_backup": None,
+            "checkpoints": 0,
+            "checkpoint_failures": 0,
+            "last_checkpoint": None,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.database_path is not None
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "wal_bytes": self.wal_size()}
+
+    def wal_size(self) -> int:
+        if not self.enabled:
+            return 0
+        try:
+            return os.path.getsize(f"{self.database_path}-wal")
+        except OSError:
+            return 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.database_path, timeout=config['DB_BUSY_TIMEOUT_MS'] / 1000)
+        conn.execute(f"PRAGMA busy_timeout={int(config['DB_BUSY_TIMEOUT_MS'])}")
+        return conn
+
+    def _backup_sync(self, destination: Path) -> Dict[str, Any]:
+        steps = 0
+        total_pages = 0
+
+        def progress(status, remaining, total):
+            nonlocal steps, total_pages
+            steps += 1
+            total_pages = total
+
+        partial = destination.with_suffix(destination.suffix + ".partial")
+        source = self._connect()
+        try:
+            target = sqlite3.connect(partial)
+            try:
+                source.backup(
+                    target,
+                    pages=self.pages_per_step,
+                    progress=progress,
+                    sleep=self.step_sleep
+                )
+            finally:
+                target.close()
+        except BaseException:
+            # Don't leave a half-written copy behind in the backup directory
+            partial.unlink(missing_ok=True)
+            raise
+        finally:
+            source.close()
+        os.replace(partial, destination)
+        return {"pages": total_pages, "steps": steps}
+
+    async def backup(self, destination: Optional[Path] = None) -> Dict[str, Any]:
+        """Write a consistent snapshot of the live database."""
+        if not self.enabled:
+            raise RuntimeError("Backups require a file-backed database")
+        if destination is None:
+            self.backup_dir.mkdir(parents=True, exist_ok=True)
+            stem = Path(self.database_path).stem
+            timestamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+            destination = self.backup_dir / f"{stem}-{timestamp}.db"
+
+        start = time.perf_counter()
+        try:
+            details = await asyncio.to_thread(self._backup_sync, Path(destination))
+        except Exception as e:
+            self._stats["backup_failures"] += 1
+            logger.error(f"Database backup failed: {e}")
+            raise
+        result = {
+            "path": str(destination),
+            "duration_seconds": round(time.perf_counter() - start, 3),
+            "completed_at": time.time(),
+            **details,
+        }
+        self._last_backup = time.monotonic()
+        self._stats["backups"] += 1
+        self._stats["last_backup"] = result
+        logger.info(
+            f"Database backup written to {destination} "
+            f"({details['pages']} pages in {result['duration_seconds']}s)"
+        )
+        self._prune_backups()
+        return result
+
+    def _prune_backups(self):
+        if self.backup_keep <= 0 or not self.backup_dir.exists():
+            return
+        stem = Path(self.database_path).stem
+        backups = sorted(self.backup_dir.glob(f"{stem}-*.db"))
+        for old in backups[:-self.backup_keep]:
+            try:
+                old.unlink()
+            except OSError as e:
+                logger.warning(f"Could not remove old backup {old}: {e}")
+
+    def _checkpoint_sync(self, mode: str):
+        conn = self._connect()
+        try:
+            return conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+        finally:
+            conn.close()
+
+    async def checkpoint(self, mode: str = "PASSIVE") -> Dict[str, Any]:
+        """Run a WAL checkpoint and report how much of the log it copied."""
+        mode = mode.upper()
+        if mode not in CHECKPOINT_MODES:
+            raise ValueError(f"Unknown checkpoint mode: {mode}")
+        if not self.enabled:
+            raise RuntimeError("Checkpoints require a file-backed database")
+
+        wal_before = self.wal_size()
+        start = time.perf_counter()
+        try:
+            busy, log_frames, checkpointed = await asyncio.to_thread(self._checkpoint_sync, mode)
+        except Exception as e:
+            self._stats["checkpoint_failures"] += 1
+            logger.error(f"WAL checkpoint ({mode}) failed: {e}")
+            raise
+        result = {
+            "mode": mode,
+            "busy": bool(busy),
+            "log_frames": log_frames,
+            "checkpointed_frames": checkpointed,
+            "wal_bytes_before": wal_before,
+            "wal_bytes_after": self.wal_size(),
+            "duration_seconds": round(time.perf_counter() - start, 4),
+            "completed_at": time.time(),
+        }
+        self._last_checkpoint = time.monotonic()
+        self._stats["checkpoints"] += 1
+        self._stats["last_checkpoint"] = result
+        if config['DEBUG'] or mode != "PASSIVE":
+            logger.info(
+                f"WAL checkpoint ({mode}): {checkpointed}/{log_frames} frames "
+                f"in {result['duration_seconds']}s"
+            )
+        return result
+
+    async def run_once(self):
+        """Run whichever maintenance tasks are due."""
+        now = time.monotonic()
+        if self.wal_max_bytes and self.wal_size() > self.wal_max_bytes:
+            await self.checkpoint("TRUNCATE")
+        elif self.checkpoint_interval and now - self._last_checkpoint >= self.checkpoint_interval:
+            await self.checkpoint("PASSIVE")
+
+        if self.backup_interval and now - self._last_backup >= self.backup_interval:
+            await self.backup()
+
+    async def run(self):
+        """Background maintenance loop."""
+        if not self.enabled:
+            logger.info("Database maintenance disabled for in-memory database")
+            return
+        # Do not back up during startup; wait one full interval first
+        self._last_backup = time.monotonic()
+        self._last_checkpoint = time.monotonic()
+        while True:
+            await asyncio.sleep(self.tick_seconds)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Error in database maintenance: {e}")
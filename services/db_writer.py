@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import TextClause
+
+logger = logging.getLogger(__name__)
+
+class _WriteRequest:
+    """A statement (or exclusive transaction lease) waiting for the writer."""
+
+    __slots__ = ("statement", "values", "many", "future", "released", "failed", "done")
+
+    def __init__(self, statement: Optional[TextClause], values: Any, many: bool = False):
+        loop = asyncio.get_running_loop()
+        self.statement = statement
+        self.values = values
+        self.many = many
+        self.future = loop.create_future()
+        # Only used by leases
+        self.released: Optional[asyncio.Event] = None
+        self.failed = False
+        self.done: Optional[asyncio.Future] = None
+
+    @property
+    def is_lease(self) -> bool:
+        return self.statement is None
+
+class DatabaseWriter:
+    """Single-writer actor that group-commits queued mutations.
+
+    Every write is queued and applied by one task, which commits a batch
+    once it holds batch_size statements or batch_interval seconds have
+    passed since the first one arrived. Each caller awaits a future that
+    resolves to its own statement's result after the batch commits.
+    A failing statement only fails its own future: SQLite undoes just that
+    statement and the rest of the batch still commits.
+
+    lease() hands the writer's session to a caller for a multi-statement
+    transaction; queued writes wait until the lease is released.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        batch_size: int = 64,
+        batch_interval: float = 0.005,
+        queue_size: int = 1000
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.queue_size = queue_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {
+            "batches": 0,
+            "statements": 0,
+            "failed_statements": 0,
+            "leases": 0,
+            "max_batch_size": 0,
+            "commit_seconds": 0.0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        batches = self._stats["batches"]
+        return {
+            **self._stats,
+            "avg_batch_size": self._stats["statements"] / batches if batches else 0.0,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+        }
+
+    def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Commit everything already queued, then stop the writer task."""
+        if not self.running:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def execute(self, statement: TextClause, values: Optional[Dict] = None) -> Any:
+        request = _WriteRequest(statement, values or {})
+        return await self._submit(request)
+
+    async def execute_many(self, statement: TextClause, values_list: List[Dict]) -> Any:
+        request = _WriteRequest(statement, list(values_list), many=True)
+        return await self._submit(request)
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[AsyncSession]:
+        """Borrow the writer's session exclusively for one transaction."""
+        request = _WriteRequest(None, None)
+        request.released = asyncio.Event()
+        request.done = asyncio.get_running_loop().create_future()
+        try:
+            session = await self._submit(request)
+        except BaseException:
+            # Cancelled while queued: make sure the writer does not wait on us
+            request.failed = True
+            request.released.set()
+            raise
+        try:
+            yield session
+        except BaseException:
+            request.failed = True
+            raise
+        finally:
+            request.released.set()
+        await request.done
+
+    async def _submit(self, request: _WriteRequest) -> Any:
+        self.start()
+        await self._queue.put(request)
+        return await request.future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = loop.time() + self.batch_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            try:
+                await self._process(batch)
+            except Exception as e:
+                logger.error(f"Database writer failed to process batch: {e}", exc_info=True)
+
+    async def _process(self, batch: List[_WriteRequest]):
+        """Commit statements in order, running any lease on its own."""
+        pending: List[_WriteRequest] = []
+        for request in batch:
+            if request.is_lease:
+                await self._commit(pending)
+                pending = []
+                await self._run_lease(request)
+            else:
+                pending.append(request)
+        await self._commit(pending)
+
+    async def _commit(self, requests: List[_WriteRequest]):
+        if not requests:
+            return
+        start = time.perf_counter()
+        results = []
+        try:
+            async with self.session_factory() as session:
+                for request in requests:
+                    try:
+                        result = await session.execute(request.statement, request.values)
+                        results.append((request, result, None))
+                    except Exception as e:
+                        self._stats["failed_statements"] += 1
+                        results.append((request, None, e))
+                await session.commit()
+        except Exception as e:
+            # The commit itself failed, so nothing in the batch was applied
+            for request in requests:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            raise
+
+        for request, result, error in results:
+            if request.future.done():
+                continue
+            if error is not None:
+                request.future.set_exception(error)
+            else:
+                request.future.set_result(result.rowcount if request.many else result)
+
+        self._stats["batches"] += 1
+        self._stats["statements"] += len(requests)
+        self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(requests))
+        self._stats["commit_seconds"] += time.perf_counter() - start
+
+    async def _run_lease(self, request: _WriteRequest):
+        self._stats["leases"] += 1
+        try:
+            async with self.session_factory() as session:
+                if request.future.done():
+                    # The caller gave up before the lease was granted
+                    request.done.cancel()
+                    return
+                request.future.set_result(session)
+                await request.released.wait()
+                if request.failed:
+                    await session.rollback()
+                else:
+                    await session.commit()
+            request.done.set_result(None)
+        except Exception as e:
+            if not request.future.done():
+                request.future.set_exception(e)
+            if not request.done.done():
+                request.done.set_exception(e)
@@ -1,37 +1,208 @@
 import httpx
+import asyncio
+import functools
 import logging
 import json
 import math
-from typing import Optional, Dict, Any, List
+import time
+from typing import Optional, Dict, Any, List, Awaitable, Callable, Iterable, Tuple
 from config import config  # Change from relative to absolute import
-from tenacity import retry, stop_after_attempt, wait_exponential
 from utils.nostr_signing import sign_zap_event, sign_event, build_zap_event
+from utils.single_flight import SingleFlight
+from services.lnurl_cache import LnurlCache
+from utils.resilience import (
+    AdaptiveLimiter, Priority, RetryBudget, UpstreamPolicy, effective_priority, gateway_status
+)
 from fastapi import HTTPException
 
 logger = logging.getLogger(__name__)
 
+UPSTREAMS = ("lnbits", "openhab")
+
+def _client_settings(upstream: str) -> Dict[str, Any]:
+    """Pool, timeout and protocol settings for one upstream from config."""
+    prefix = upstream.upper()
+    return {
+        "http2": config[f'{prefix}_HTTP2'],
+        "limits": httpx.Limits(
+            max_connections=config[f'{prefix}_MAX_CONNECTIONS'],
+            max_keepalive_connections=config[f'{prefix}_MAX_KEEPALIVE'],
+            keepalive_expiry=config[f'{prefix}_KEEPALIVE_EXPIRY'],
+        ),
+        "timeout": httpx.Timeout(
+            config[f'{prefix}_TIMEOUT'],
+            connect=config[f'{prefix}_CONNECT_TIMEOUT'],
+        ),
+    }
+
+def coalesced(ttl_key: str):
+    """Share one upstream read between concurrent callers of a method.
+
+    Callers that arrive while a call is in flight await its result instead
+    of issuing their own request. If config[ttl_key] is positive, the last
+    result is also served for that many seconds to absorb bursts;
+    force_refresh=True skips that micro-TTL but still joins a call already
+    in flight. Results are shared objects and must not be mutated.
+    """
+    def decorator(fn: Callable[..., Awaitable[Any]]):
+        @functools.wraps(fn)
+        async def wrapper(self, force_refresh: bool = False):
+            return await self._coalesce(
+                fn.__name__, config[ttl_key], lambda: fn(self), force_refresh
+            )
+        return wrapper
+    return decorator
+
+def resilient(
+    upstream: str,
+    idempotent: bool,
+    hedge: bool = False,
+    priority: Priority = Priority.DASHBOARD
+):
+    """Run a method under the upstream's breaker, retry budget, hedging and
+    concurrency limit.
+
+    Only idempotent calls are retried or hedged; a payment or feeder
+    trigger is attempted once and its error goes straight to the caller.
+    priority is the method's default queueing class; call_priority()
+    replaces it for everything a block of code calls.
+    """
+    def decorator(fn: Callable[..., Awaitable[Any]]):
+        @functools.wraps(fn)
+        async def wrapper(self, *args, **kwargs):
+            return await self._policies[upstream].call(
+                lambda: fn(self, *args, **kwargs), idempotent, hedge,
+                effective_priority(priority)
+            )
+        return wrapper
+    return decorator
+
+def _upstream_policy(upstream: str, budget: RetryBudget) -> UpstreamPolicy:
+    prefix = upstream.upper()
+    return UpstreamPolicy(
+        upstream,
+        budget,
+        failure_threshold=config[f'{prefix}_BREAKER_FAILURES'],
+        reset_timeout=config[f'{prefix}_BREAKER_RESET'],
+        max_retries=config['UPSTREAM_MAX_RETRIES'],
+        backoff_base=config['UPSTREAM_BACKOFF_BASE'],
+        backoff_max=config['UPSTREAM_BACKOFF_MAX'],
+        hedge_delay=config[f'{prefix}_HEDGE_DELAY_MS'] / 1000,
+        limiter=AdaptiveLimiter(
+            upstream,
+            max_limit=config[f'{prefix}_MAX_CONCURRENCY'],
+            latency_target=config[f'{prefix}_LATENCY_TARGET_MS'] / 1000,
+        ),
+    )
+
 class ExternalAPIService:
+    """Calls to LNbits and OpenHAB over one pooled client per upstream.
+
+    The clients live for the whole app: start() opens and warms them on
+    startup and close() is only called on shutdown. Closing them per
+    request would throw away every kept-alive connection and TLS session.
+    """
+
     def __init__(self):
         self.lnbits_url = config['LNBITS_URL']
         self.openhab_url = config['OPENHAB_URL']
         self.auth = (config['OH_AUTH_1'], '')
         self.balance = 0
-        self._client = None
+        self._clients: Dict[str, httpx.AsyncClient] = {}
         self._initialized = False
+        self._flights = SingleFlight()
+        self._recent: Dict[str, Tuple[float, Any]] = {}
+        self._coalesce_stats: Dict[str, Dict[str, int]] = {}
+        self.lnurl_cache = LnurlCache(self.scan_lnurl)
+        self.retry_budget = RetryBudget(config['RETRY_BUDGET_RATIO'], config['RETRY_BUDGET_MAX_TOKENS'])
+        self._policies = {upstream: _upstream_policy(upstream, self.retry_budget) for upstream in UPSTREAMS}
+
+    def _client(self, upstream: str) -> httpx.AsyncClient:
+        client = self._clients.get(upstream)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(**_client_settings(upstream))
+            self._clients[upstream] = client
+            self._initialized = True
+        return client
 
     @property
-    async def http_client(self) -> httpx.AsyncClient:
-        """Get or create the HTTP client."""
-        if not self._client or self._client.is_closed:
-            self._client = httpx.AsyncClient(http2=True)
-            self._initialized = True
-        return self._client
+    async def lnbits_client(self) -> httpx.AsyncClient:
+        """Get or create the LNbits client."""
+        return self._client("lnbits")
+
+    @property
+    async def openhab_client(self) -> httpx.AsyncClient:
+        """Get or create the OpenHAB client."""
+        return self._client("openhab")
+
+    @property
+    def coalescing_stats(self) -> Dict[str, Dict[str, int]]:
+        """Per-method counts of calls, upstream requests and shared results."""
+        return {name: dict(stats) for name, stats in self._coalesce_stats.items()}
+
+    @property
+    def resilience_stats(self) -> Dict[str, Any]:
+        """Breaker state and retry/hedge counts per upstream."""
+        return {
+            "retry_budget": self.retry_budget.stats,
+            **{upstream: policy.stats for upstream, policy in self._policies.items()},
+        }
+
+    async def _coalesce(
+        self,
+        name: str,
+        ttl: float,
+        fn: Callable[[], Awaitable[Any]],
+        force_refresh: bool = False
+    ) -> Any:
+        stats = self._coalesce_stats.setdefault(
+            name, {"calls": 0, "upstream_calls": 0, "coalesced": 0, "micro_ttl_hits": 0}
+        )
+        stats["calls"] += 1
+        if ttl > 0 and not force_refresh:
+            recent = self._recent.get(name)
+            if recent and recent[0] > time.monotonic():
+                stats["micro_ttl_hits"] += 1
+                return recent[1]
+
+        if self._flights.in_flight(name):
+            stats["coalesced"] += 1
+        else:
+            stats["upstream_calls"] += 1
+
+        async def call():
+            value = await fn()
+            if ttl > 0:
+                self._recent[name] = (time.monotonic() + ttl, value)
+            return value
+
+        return await self._flights.do(name, call)
+
+    def _forget(self, name: str):
+        """Drop a micro-TTL result after a write that changes it."""
+        self._recent.pop(name, None)
+
+    async def start(self):
+        """Create both clients and open a first connection to each upstream."""
+        await asyncio.gather(*(self._warm_up(upstream) for upstream in UPSTREAMS))
+
+    async def _warm_up(self, upstream: str):
+        client = self._client(upstream)
+        base_url = self.lnbits_url if upstream == "lnbits" else self.openhab_url
+        if not base_url:
+            return
+        try:
+            # Any response means the connection (and TLS session) is pooled
+            await client.head(base_url, timeout=config['HTTP_WARMUP_TIMEOUT'])
+            logger.info(f"Warmed up {upstream} connection pool")
+        except httpx.HTTPError as e:
+            logger.warning(f"Could not warm up {upstream} connection pool: {e}")
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-    async def create_invoice(self, amount: int, memo: str, key: str) -> str:
-        """Create a Lightning invoice."""
+    @resilient('lnbits', idempotent=False, priority=Priority.PAYMENT)
+    async def create_invoice(self, amount: int, memo: str, key: str, expiry: Optional[int] = None) -> str:
+        """Create a Lightning invoice, valid for expiry seconds if given."""
         try:
-            client = await self.http_client
+            client = await self.lnbits_client
             url = f"{self.lnbits_url}/api/v1/payments"
             headers = {
                 "X-API-KEY": key,
@@ -42,6 +213,8 @@ class ExternalAPIService:
                 "amount": amount,
                 "memo": memo,
             }
+            if expiry is not None:
+                data["expiry"] = expiry
             response = await client.post(url, json=data, headers=headers)
             response.raise_for_status()
             return response.json()['payment_request']
@@ -49,11 +222,11 @@ class ExternalAPIService:
             logger.error(f"Error creating invoice: {e}")
             raise
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+    @resilient('lnbits', idempotent=False, priority=Priority.PAYMENT)
     async def pay_invoice(self, payment_request: str, key: str) -> Dict:
         """Pay a Lightning invoice."""
         try:
-            client = await self.http_client
+            client = await self.lnbits_client
             url = f"{self.lnbits_url}/api/v1/payments"
             headers = {
                 "X-API-KEY": key,
@@ -65,16 +238,18 @@ class ExternalAPIService:
             }
             response = await client.post(url, json=data, headers=headers)
             response.raise_for_status()
+            self._forget('get_balance')
             return response.json()
         except Exception as e:
             logger.error(f"Error paying invoice: {e}")
             raise
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+    @coalesced('FEEDER_STATUS_MICRO_TTL')
+    @resilient('openhab', idempotent=True, hedge=True)
     async def get_feeder_status(self) -> bool:
         """Check if feeder override is enabled."""
         try:
-            client = await self.http_client
+            client = await self.openhab_client
             response = await client.get(
                 f'{self.openhab_url}/rest/items/FeederOverride/state',
                 auth=self.auth
@@ -85,7 +260,20 @@ class ExternalAPIService:
             logger.error(f"Error checking feeder status: {e}")
             raise
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+    @resilient('openhab', idempotent=True, hedge=True, priority=Priority.BACKGROUND)
+    async def get_openhab_items(self, names: Iterable[str]) -> Dict[str, str]:
+        """Read the state of several OpenHAB items in one request."""
+        client = await self.openhab_client
+        response = await client.get(
+            f'{self.openhab_url}/rest/items',
+            params={'fields': 'name,state'},
+            auth=self.auth
+        )
+        response.raise_for_status()
+        wanted = set(names)
+        return {item['name']: item['state'] for item in response.json() if item['name'] in wanted}
+
+    @resilient('openhab', idempotent=False, priority=Priority.PAYMENT)
     async def trigger_feeder(self) -> bool:
         """Trigger the feeder."""
         try:
@@ -93,7 +281,7 @@ class ExternalAPIService:
                 logger.debug("DEBUG mode - suppressing feeder trigger")
                 return True
 
-            client = await self.http_client
+            client = await self.openhab_client
             response = await client.post(
                 f'{self.openhab_url}/rest/rules/88bd9ec4de/runnow',
                 auth=self.auth
@@ -104,7 +292,19 @@ class ExternalAPIService:
             logger.error(f"Error triggering feeder: {e}")
             raise
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+    @resilient('lnbits', idempotent=True, hedge=True, priority=Priority.BACKGROUND)
+    async def scan_lnurl(self, lud16: str) -> Dict[str, Any]:
+        """Resolve a lightning address to its LNURL-pay parameters via LNbits."""
+        client = await self.lnbits_client
+        url = f"{self.lnbits_url}/api/v1/lnurlscan/{lud16}"
+        logger.info(f"Scanning LNURL: {url}")
+        response = await client.get(
+            url,
+            headers={"accept": "application/json", "X-API-KEY": config['HERD_KEY']}
+        )
+        response.raise_for_status()
+        return response.json()
+
     async def make_lnurl_payment(
         self,
         lud16: str,
@@ -114,19 +314,17 @@ class ExternalAPIService:
     ) -> Optional[dict]:
         """Make an LNURL payment."""
         try:
-            client = await self.http_client
             local_headers = {
                 "accept": "application/json",
                 "X-API-KEY": key or config['HERD_KEY'],
                 "Content-Type": "application/json"
             }
             
-            # Scan LNURL
-            lnurl_scan_url = f"{self.lnbits_url}/api/v1/lnurlscan/{lud16}"
-            logger.info(f"Scanning LNURL: {lnurl_scan_url}")
-            lnurl_resp = await client.get(lnurl_scan_url, headers=local_headers)
-            lnurl_resp.raise_for_status()
-            lnurl_data = lnurl_resp.json()
+            # LNURL-pay parameters, scanned at most once per cache TTL
+            lnurl_data = await self.lnurl_cache.get(lud16)
+            if lnurl_data is None:
+                logger.error(f"{lud16}: LNURL scan failed, skipping payment")
+                return None
 
             # Validate amount constraints
             if not (lnurl_data["minSendable"] <= msat_amount <= lnurl_data["maxSendable"]):
@@ -163,24 +361,33 @@ class ExternalAPIService:
                 )
                 payment_payload["nostr"] = json.dumps(signed_event)
 
-            # Make payment
-            payment_url = f"{self.lnbits_url}/api/v1/payments/lnurl"
-            pay_resp = await client.post(
-                payment_url,
-                headers=local_headers,
-                json=payment_payload
-            )
-            pay_resp.raise_for_status()
-            return pay_resp.json()
+            return await self._pay_lnurl(lud16, payment_payload, local_headers)
 
         except Exception as e:
             logger.error(f"Error making LNURL payment: {e}")
             return None
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+    # Only the payment POST is limited; the LNURL scan takes its own slot
+    @resilient('lnbits', idempotent=False, priority=Priority.PAYMENT)
+    async def _pay_lnurl(self, lud16: str, payment_payload: Dict, headers: Dict) -> Dict:
+        client = await self.lnbits_client
+        pay_resp = await client.post(
+            f"{self.lnbits_url}/api/v1/payments/lnurl",
+            headers=headers,
+            json=payment_payload
+        )
+        if pay_resp.is_error:
+            # The cached callback may be stale; rescan on the next payout
+            self.lnurl_cache.invalidate(lud16)
+        pay_resp.raise_for_status()
+        self._forget('get_balance')
+        return pay_resp.json()
+
+    @coalesced('BTC_PRICE_MICRO_TTL')
+    @resilient('openhab', idempotent=True, hedge=True)
     async def fetch_btc_price(self) -> float:
         """Fetch current BTC price from OpenHAB."""
-        client = await self.http_client
+        client = await self.openhab_client
         response = await client.get(
             f'{self.openhab_url}/rest/items/BTC_Price_Output/state',
             auth=self.auth
@@ -193,10 +400,11 @@ class ExternalAPIService:
         btc_price = await self.fetch_btc_price()
         return int(round((usd_amount / btc_price) * 100_000_000))
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+    @coalesced('TARGETS_MICRO_TTL')
+    @resilient('lnbits', idempotent=True, hedge=True)
     async def fetch_cyberherd_targets(self) -> List[Dict]:
         """Fetch current CyberHerd targets from LNbits."""
-        client = await self.http_client
+        client = await self.lnbits_client
         url = f'{self.lnbits_url}/splitpayments/api/v1/targets'
         headers = {
             'accept': 'application/json',
@@ -206,20 +414,37 @@ class ExternalAPIService:
         response.raise_for_status()
         return response.json()
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
     async def reset_cyberherd_targets(self) -> Dict:
-        """Reset CyberHerd targets to default."""
-        client = await self.http_client
+        """Reset CyberHerd targets to default.
+
+        The delete and the put are retried separately, so a failed put
+        does not repeat the delete and a failed delete stops the reset.
+        """
+        await self._delete_cyberherd_targets()
+        try:
+            return await self._put_default_cyberherd_targets()
+        finally:
+            self._forget('fetch_cyberherd_targets')
+
+    def _cyberherd_targets_request(self) -> Tuple[str, Dict[str, str]]:
+        url = f"{self.lnbits_url}/splitpayments/api/v1/targets"
         headers = {
             'accept': 'application/json',
             'X-API-KEY': config['CYBERHERD_KEY']
         }
-        url = f"{self.lnbits_url}/splitpayments/api/v1/targets"
+        return url, headers
 
-        # Delete existing targets
-        await client.delete(url, headers=headers)
+    @resilient('lnbits', idempotent=True, priority=Priority.BACKGROUND)
+    async def _delete_cyberherd_targets(self):
+        client = await self.lnbits_client
+        url, headers = self._cyberherd_targets_request()
+        response = await client.delete(url, headers=headers)
+        response.raise_for_status()
 
-        # Create default target
+    @resilient('lnbits', idempotent=True, priority=Priority.BACKGROUND)
+    async def _put_default_cyberherd_targets(self) -> Dict:
+        client = await self.lnbits_client
+        url, headers = self._cyberherd_targets_request()
         predefined_wallet = {
             'wallet': config['PREDEFINED_WALLET_ADDRESS'],
             'alias': config['PREDEFINED_WALLET_ALIAS'],
@@ -235,41 +460,11 @@ class ExternalAPIService:
         response.raise_for_status()
         return response.json()
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-    async def update_goat_sats(self, sats_received: int):
-        """Update goat sats counter in OpenHAB."""
-        try:
-            client = await self.http_client
-            current_state = await self.get_goat_sats_sum_today()
-            new_state = current_state["sum_goat_sats"] + sats_received
-
-            if config['DEBUG']:
-                logger.debug(f"DEBUG mode - suppressing OpenHAB update: GoatSats would be set to {new_state}")
-                return new_state
-
-            headers = {
-                "accept": "application/json",
-                "Content-Type": "text/plain"
-            }
-            put_url = f"{self.openhab_url}/rest/items/GoatSats/state"
-            response = await client.put(
-                put_url,
-                headers=headers,
-                auth=self.auth,
-                content=str(new_state)
-            )
-            response.raise_for_status()
-            logger.info(f"Updated GoatSats to {new_state}")
-            return new_state
-        except Exception as e:
-            logger.error(f"Error updating goat sats: {e}")
-            raise
-
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+    @resilient('openhab', idempotent=True, priority=Priority.BACKGROUND)
     async def set_goat_sats(self, new_state: int):
         """Set goat sats to specific value in OpenHAB."""
         try:
-            client = await self.http_client
+            client = await self.openhab_client
             if config['DEBUG']:
                 logger.debug(f"DEBUG mode - suppressing OpenHAB update: GoatSats would be set to {new_state}")
                 return new_state
@@ -286,17 +481,19 @@ class ExternalAPIService:
                 content=str(new_state)
             )
             response.raise_for_status()
+            self._forget('get_goat_sats_sum_today')
             logger.info(f"Set GoatSats to {new_state}")
             return new_state
         except Exception as e:
             logger.error(f"Error setting goat sats: {e}")
             raise
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+    @coalesced('GOAT_SATS_MICRO_TTL')
+    @resilient('openhab', idempotent=True, hedge=True)
     async def get_goat_sats_sum_today(self) -> Dict[str, int]:
         """Get total goat sats for today."""
         try:
-            client = await self.http_client
+            client = await self.openhab_client
             if config['DEBUG']:
                 logger.debug("Fetching goat sats sum from OpenHAB")
 
@@ -316,20 +513,28 @@ class ExternalAPIService:
                 logger.warning(f"Invalid GoatSats state value: {response.text}")
                 return {"sum_goat_sats": 0}
 
-        except httpx.TimeoutError:
+        except httpx.TimeoutException:
             logger.error("Timeout while connecting to OpenHAB")
             raise HTTPException(status_code=504, detail="Gateway Timeout")
         except httpx.RequestError as e:
             logger.error(f"Error connecting to OpenHAB: {e}")
             raise HTTPException(status_code=502, detail="Failed to connect to OpenHAB")
+        except httpx.HTTPStatusError as e:
+            logger.error(f"OpenHAB error getting goat sats sum: {e}")
+            raise HTTPException(
+                status_code=gateway_status(e.response.status_code),
+                detail="Failed to get goat sats sum"
+            )
         except Exception as e:
             logger.error(f"Unexpected error getting goat sats sum: {e}")
             raise HTTPException(status_code=500, detail="Internal Server Error")
 
-    async def get_balance(self, force_refresh: bool = False) -> int:
-        """Get current wallet balance."""
+    @coalesced('BALANCE_MICRO_TTL')
+    @resilient('lnbits', idempotent=True, hedge=True)
+    async def get_balance(self) -> int:
+        """Get current wallet balance; force_refresh skips the micro-TTL."""
         try:
-            client = await self.http_client
+            client = await self.lnbits_client
             response = await client.get(
                 f'{config["LNBITS_URL"]}/api/v1/wallet',
                 headers={'X-Api-Key': config['HERD_KEY']}
@@ -338,18 +543,38 @@ class ExternalAPIService:
             balance = response.json()['balance']
             self.balance = math.floor(balance / 1000)
             return balance
-        except httpx.HTTPError as e:
+        except httpx.TimeoutException:
+            logger.error("Timeout retrieving balance")
+            raise HTTPException(status_code=504, detail="Gateway Timeout")
+        except httpx.RequestError as e:
+            logger.error(f"Error connecting to LNbits: {e}")
+            raise HTTPException(status_code=502, detail="Failed to connect to LNbits")
+        except httpx.HTTPStatusError as e:
             logger.error(f"HTTP error retrieving balance: {e}")
             raise HTTPException(
-                status_code=e.response.status_code if e.response else 500,
+                status_code=gateway_status(e.response.status_code),
                 detail="Failed to retrieve balance"
             )
         except Exception as e:
             logger.error(f"Error retrieving balance: {e}")
             raise HTTPException(status_code=500, detail="Internal Server Error")
 
+    @resilient('lnbits', idempotent=True, priority=Priority.PAYMENT)
+    async def get_payments(self, key: str, limit: int, offset: int = 0) -> List[Dict[str, Any]]:
+        """One page of the wallet's payments, newest first."""
+        client = await self.lnbits_client
+        response = await client.get(
+            f"{self.lnbits_url}/api/v1/payments",
+            params={"limit": limit, "offset": offset, "sortby": "time", "direction": "desc"},
+            headers={"X-Api-Key": key}
+        )
+        response.raise_for_status()
+        return response.json()
+
     async def close(self):
-        """Close the HTTP client."""
-        if self._client and not self._client.is_closed:
-            await self._client.aclose()
-            self._initialized = False
+        """Close the HTTP clients; called once on app shutdown."""
+        clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            if not client.is_closed:
+                await client.aclose()
+        self._initialized = False
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+from services.external_api import ExternalAPIService
+from config import config
+
+logger = logging.getLogger(__name__)
+
+class GoatSatsCounter:
+    """Write-behind GoatSats counter.
+
+    The local value is authoritative: increment() applies a payment
+    immediately and never waits for OpenHAB. A flush loop PUTs the current
+    total every flush_interval seconds, so any number of increments costs
+    one request, and close() flushes whatever is left on shutdown.
+    reconcile() re-reads OpenHAB (at startup and after the daily reset)
+    and re-applies increments that have not been flushed yet.
+    """
+
+    def __init__(self, external_api: ExternalAPIService, flush_interval: Optional[float] = None):
+        self.external_api = external_api
+        self.flush_interval = flush_interval or config['GOAT_SATS_FLUSH_INTERVAL']
+        self._value: Optional[int] = None
+        self._pending = 0  # sats added locally since the last successful flush
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._stats = {"increments": 0, "flushes": 0, "flush_errors": 0, "reconciles": 0}
+
+    @property
+    def value(self) -> Optional[int]:
+        """Current total, or None until the first reconcile succeeds."""
+        return self._value
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "value": self._value, "pending": self._pending}
+
+    def increment(self, sats: int) -> Optional[int]:
+        """Add sats locally; the next flush sends the new total to OpenHAB."""
+        self._pending += sats
+        if self._value is not None:
+            self._value += sats
+        self._stats["increments"] += 1
+        return self._value
+
+    async def set(self, new_state: int) -> int:
+        """Overwrite the total and write it through to OpenHAB."""
+        async with self._flush_lock:
+            self._value = new_state
+            self._pending = 0
+            await self.external_api.set_goat_sats(new_state)
+        return new_state
+
+    async def reconcile(self) -> int:
+        """Adopt the OpenHAB value plus any increments not flushed yet."""
+        async with self._flush_lock:
+            state = await self.external_api.get_goat_sats_sum_today(force_refresh=True)
+            self._value = state["sum_goat_sats"] + self._pending
+            self._stats["reconciles"] += 1
+            logger.info(f"GoatSats reconciled to {self._value} ({self._pending} pending)")
+            return self._value
+
+    async def get_sum_today(self) -> Dict[str, int]:
+        """Today's total in the shape of ExternalAPIService.get_goat_sats_sum_today."""
+        if self._value is None:
+            await self.reconcile()
+        return {"sum_goat_sats": self._value}
+
+    async def flush(self) -> bool:
+        """PUT the current total if anything changed since the last flush."""
+        if not self._pending:
+            return False
+        if self._value is None:
+            await self.reconcile()
+        async with self._flush_lock:
+            sent, new_state = self._pending, self._value
+            if not sent:
+                return False
+            try:
+                await self.external_api.set_goat_sats(new_state)
+            except Exception:
+                self._stats["flush_errors"] += 1
+                raise
+            # Increments that arrived during the PUT stay pending
+            self._pending -= sent
+            self._stats["flushes"] += 1
+            return True
+
+    async def start(self):
+        """Reconcile with OpenHAB and start the flush loop."""
+        try:
+            await self.reconcile()
+        except Exception as e:
+            logger.error(f"Could not read GoatSats from OpenHAB: {e}")
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing GoatSats: {e}")
+
+    async def close(self):
+        """Stop the flush loop and write out pending increments."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Error flushing GoatSats on shutdown: {e}")
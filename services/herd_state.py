@@ -0,0 +1,232 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Set, Tuple
+from services.database import DatabaseService, member_row
+from services.cache_manager import CacheManager
+from config import MAX_HERD_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Cache tag carried by entries derived from herd membership
+HERD_CACHE_TAG = "herd"
+
+# Columns refreshed when an existing member is upserted again
+PROFILE_FIELDS = ("display_name", "event_id", "note", "kinds", "nprofile", "lud16", "picture")
+
+class HerdState:
+    """Authoritative in-memory view of the cyber_herd table.
+
+    The table is loaded once at startup and members are indexed by pubkey,
+    event_id and lud16 so size, spots remaining and lookups never touch the
+    database. Mutations are written through to SQLite before the in-memory
+    indexes change, so memory never reflects an unsuccessful write, and
+    then invalidate cache entries tagged "herd". One herd lock is held
+    from each write until memory reflects it, so a concurrent clear()
+    cannot slip in between. It is always taken before the database
+    writer lease, never while holding it.
+
+    A batch holds the lock with writing() for its whole admission
+    decision: writes made inside database.transaction() pass a staged
+    list to add_member/update_member, and apply(staged) runs once the
+    transaction has committed, still inside writing().
+    """
+
+    def __init__(
+        self,
+        database: DatabaseService,
+        cache: Optional[CacheManager] = None,
+        max_size: int = MAX_HERD_SIZE
+    ):
+        self.database = database
+        self.cache = cache
+        self.max_size = max_size
+        self._members: Dict[str, Dict] = {}
+        self._by_event_id: Dict[str, str] = {}
+        self._by_lud16: Dict[str, Set[str]] = {}
+        self._lock = asyncio.Lock()
+        self._loaded = False
+
+    async def load(self):
+        """(Re)load every member from the database."""
+        await self.database.connect()
+        async with self._lock:
+            rows = await self.database.get_cyber_herd_members()
+            self._members.clear()
+            self._by_event_id.clear()
+            self._by_lud16.clear()
+            for row in rows:
+                self._index(row)
+            self._loaded = True
+        logger.info(f"Loaded {len(self._members)} CyberHerd members into memory")
+
+    async def ensure_loaded(self):
+        """Load the herd on first use if startup has not done so."""
+        if not self._loaded:
+            await self.load()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    @property
+    def size(self) -> int:
+        return len(self._members)
+
+    @property
+    def spots_remaining(self) -> int:
+        return self.max_size - len(self._members)
+
+    @property
+    def is_full(self) -> bool:
+        return len(self._members) >= self.max_size
+
+    def get(self, pubkey: str) -> Optional[Dict]:
+        member = self._members.get(pubkey)
+        return dict(member) if member else None
+
+    def get_by_event_id(self, event_id: str) -> Optional[Dict]:
+        pubkey = self._by_event_id.get(event_id)
+        return self.get(pubkey) if pubkey else None
+
+    def get_by_lud16(self, lud16: str) -> List[Dict]:
+        return [dict(self._members[p]) for p in self._by_lud16.get(lud16, ())]
+
+    def members(self) -> List[Dict]:
+        return [dict(member) for member in self._members.values()]
+
+    async def invalidate_cache(self):
+        """Drop cached data derived from membership, e.g. LNbits split targets."""
+        if self.cache is None:
+            return
+        try:
+            await self.cache.invalidate_tag(HERD_CACHE_TAG)
+        except Exception as e:
+            logger.error(f"Error invalidating herd cache entries: {e}")
+
+    @asynccontextmanager
+    async def writing(self):
+        """Hold the herd lock across a batch's admission, transaction and apply()."""
+        async with self._lock:
+            yield
+
+    async def apply(self, staged: List[Tuple[str, Any]]):
+        """Apply changes staged during a transaction that has now committed.
+
+        Call inside the writing() block that staged them.
+        """
+        if not staged:
+            return
+        for change in staged:
+            self._apply_change(change)
+        await self.invalidate_cache()
+
+    async def add_member(self, member_data: Dict, staged: Optional[List] = None) -> Dict:
+        """Insert a member, or refresh the profile fields of an existing one."""
+        change = ("upsert", member_row(member_data))
+        if staged is not None:
+            await self.database.add_cyber_herd_member(member_data)
+            staged.append(change)
+            return dict(change[1])
+        async with self._lock:
+            await self.database.add_cyber_herd_member(member_data)
+            member = dict(self._apply_change(change))
+        await self.invalidate_cache()
+        return member
+
+    async def add_members(self, members: List[Dict]) -> int:
+        """Upsert several members with a single commit."""
+        if not members:
+            return 0
+        async with self._lock:
+            await self.database.add_cyber_herd_members(members)
+            for member in members:
+                self._apply_change(("upsert", member_row(member)))
+        await self.invalidate_cache()
+        return len(members)
+
+    async def update_member(
+        self,
+        pubkey: str,
+        update_data: Dict,
+        staged: Optional[List] = None
+    ) -> Optional[Dict]:
+        """Add a payout increment and record the latest zap amount."""
+        change = ("update", (pubkey, update_data))
+        if staged is not None:
+            await self.database.update_cyber_herd_member(pubkey, update_data)
+            staged.append(change)
+            return self.get(pubkey)
+        async with self._lock:
+            await self.database.update_cyber_herd_member(pubkey, update_data)
+            member = self._apply_change(change)
+            member = dict(member) if member else None
+        await self.invalidate_cache()
+        return member
+
+    async def set_notified(self, pubkey: str, status: str):
+        async with self._lock:
+            await self.database.update_notified_field(pubkey, status)
+            if pubkey in self._members:
+                self._members[pubkey]["notified"] = status
+
+    async def remove_by_lud16(self, lud16: str) -> int:
+        """Remove every member with the given lightning address."""
+        async with self._lock:
+            deleted = await self.database.delete_cyber_herd_members_by_lud16(lud16)
+            for pubkey in list(self._by_lud16.get(lud16, ())):
+                self._unindex(pubkey)
+        await self.invalidate_cache()
+        return deleted
+
+    async def clear(self):
+        """Remove every member."""
+        async with self._lock:
+            await self.database.clear_cyber_herd()
+            self._members.clear()
+            self._by_event_id.clear()
+            self._by_lud16.clear()
+        await self.invalidate_cache()
+
+    def _apply_change(self, change: Tuple[str, Any]) -> Optional[Dict]:
+        kind, payload = change
+        if kind == "upsert":
+            return self._upsert(payload)
+        pubkey, update_data = payload
+        member = self._members.get(pubkey)
+        if member is None:
+            return None
+        member["payouts"] = (member.get("payouts") or 0.0) + update_data.get("payouts", 0.0)
+        member["amount"] = update_data.get("amount", 0)
+        return member
+
+    def _upsert(self, row: Dict) -> Dict:
+        existing = self._members.get(row["pubkey"])
+        if existing is None:
+            self._index(row)
+            return row
+        self._unindex(row["pubkey"])
+        for field in PROFILE_FIELDS:
+            existing[field] = row[field]
+        self._index(existing)
+        return existing
+
+    def _index(self, row: Dict):
+        pubkey = row["pubkey"]
+        self._members[pubkey] = row
+        if row.get("event_id"):
+            self._by_event_id[row["event_id"]] = pubkey
+        if row.get("lud16"):
+            self._by_lud16.setdefault(row["lud16"], set()).add(pubkey)
+
+    def _unindex(self, pubkey: str):
+        member = self._members.pop(pubkey, None)
+        if member is None:
+            return
+        if self._by_event_id.get(member.get("event_id")) == pubkey:
+            del self._by_event_id[member["event_id"]]
+        pubkeys = self._by_lud16.get(member.get("lud16"))
+        if pubkeys is not None:
+            pubkeys.discard(pubkey)
+            if not pubkeys:
+                del self._by_lud16[member["lud16"]]
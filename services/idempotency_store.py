@@ -0,0 +1,87 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+from fastapi import HTTPException
+from utils.single_flight import SingleFlight
+from config import config
+
+logger = logging.getLogger(__name__)
+
+class _Response(NamedTuple):
+    fingerprint: Hashable  # request parameters the key was first used with
+    response: Any
+    expires_at: float  # time.monotonic()
+
+class IdempotencyStore:
+    """Responses of non-idempotent endpoints keyed by Idempotency-Key.
+
+    The first request with a key runs; its response is kept for ttl
+    seconds and replayed to retries with the same key. A duplicate that
+    arrives while the first is still running waits for it rather than
+    running again. Failed requests are not stored, so they may be retried.
+    Reusing a key with different parameters is rejected with 422.
+    """
+
+    def __init__(self, ttl: Optional[float] = None, max_entries: Optional[int] = None):
+        self.ttl = ttl or config['IDEMPOTENCY_TTL']
+        self.max_entries = max_entries or config['IDEMPOTENCY_MAX_ENTRIES']
+        self._entries: "OrderedDict[Tuple[str, str], _Response]" = OrderedDict()
+        self._running: Dict[Tuple[str, str], Hashable] = {}
+        self._flights = SingleFlight()
+        self._stats = {"executed": 0, "replayed": 0, "joined": 0, "conflicts": 0}
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {**self._stats, "entries": len(self._entries), "in_flight": len(self._running)}
+
+    def _check(self, fingerprint: Hashable, expected: Hashable):
+        if fingerprint != expected:
+            self._stats["conflicts"] += 1
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key was already used with different parameters"
+            )
+
+    async def run(
+        self,
+        scope: str,
+        key: Optional[str],
+        fingerprint: Hashable,
+        fn: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, bool]:
+        """Return (response, replayed) for the request scope/key.
+
+        Without a key fn simply runs. scope keeps keys of different
+        endpoints apart.
+        """
+        if not key:
+            return await fn(), False
+        entry_key = (scope, key)
+        entry = self._entries.get(entry_key)
+        if entry is not None:
+            if entry.expires_at > time.monotonic():
+                self._check(fingerprint, entry.fingerprint)
+                self._entries.move_to_end(entry_key)
+                self._stats["replayed"] += 1
+                return entry.response, True
+            del self._entries[entry_key]
+        if entry_key in self._running:
+            self._check(fingerprint, self._running[entry_key])
+            self._stats["joined"] += 1
+            return await self._flights.do(entry_key, fn), True
+        self._running[entry_key] = fingerprint
+        return await self._flights.do(entry_key, lambda: self._execute(entry_key, fingerprint, fn)), False
+
+    async def _execute(self, entry_key: Tuple[str, str], fingerprint: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        # Runs in its own task, so a client disconnect cannot lose the response
+        try:
+            response = await fn()
+            self._entries[entry_key] = _Response(fingerprint, response, time.monotonic() + self.ttl)
+            self._entries.move_to_end(entry_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._stats["executed"] += 1
+            return response
+        finally:
+            self._running.pop(entry_key, None)
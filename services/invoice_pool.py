@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, NamedTuple, Optional
+from services.external_api import ExternalAPIService
+from utils.resilience import Priority, call_priority
+from utils.single_flight import SingleFlight
+from config import config
+
+logger = logging.getLogger(__name__)
+
+class _Invoice(NamedTuple):
+    payment_request: str
+    expires_at: float  # time.monotonic()
+
+class InvoicePool:
+    """Herd wallet invoices created ahead of time for common amounts.
+
+    Keeps size unpaid invoices per amount and hands each out at most once,
+    oldest first. Invoices are created with an explicit expiry and retired
+    retire_margin seconds before it, so a kiosk never shows a QR code that
+    expires while someone is paying. Amounts or memos not in the pool, and
+    an empty pool, fall through to a direct create_invoice. Only that
+    direct call queues as a payment; top-ups run at background priority.
+    """
+
+    def __init__(
+        self,
+        external_api: ExternalAPIService,
+        amounts: Optional[Iterable[int]] = None,
+        size: Optional[int] = None,
+        expiry: Optional[int] = None,
+        retire_margin: Optional[float] = None,
+        refill_interval: Optional[float] = None,
+        memo: Optional[str] = None
+    ):
+        self.external_api = external_api
+        self.amounts = tuple(config['INVOICE_POOL_AMOUNTS'] if amounts is None else amounts)
+        self.size = config['INVOICE_POOL_SIZE'] if size is None else size
+        self.expiry = expiry or config['INVOICE_POOL_EXPIRY']
+        self.retire_margin = config['INVOICE_POOL_RETIRE_MARGIN'] if retire_margin is None else retire_margin
+        self.refill_interval = refill_interval or config['INVOICE_POOL_REFILL_INTERVAL']
+        self.memo = memo or config['INVOICE_POOL_MEMO']
+        self._ready: Dict[int, Deque[_Invoice]] = {amount: deque() for amount in self.amounts}
+        self._refills = SingleFlight()
+        self._stats = {
+            "hits": 0, "misses": 0, "retired": 0, "created": 0, "create_errors": 0,
+            "refill_seconds_total": 0.0, "last_refill_seconds": 0.0,
+        }
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "ready": {amount: len(ready) for amount, ready in self._ready.items()}}
+
+    def _retire(self, amount: int):
+        ready = self._ready[amount]
+        cutoff = time.monotonic() + self.retire_margin
+        while ready and ready[0].expires_at <= cutoff:
+            ready.popleft()
+            self._stats["retired"] += 1
+
+    def take(self, amount: int, memo: str) -> Optional[str]:
+        """Hand out a ready invoice, or None if the pool cannot serve this request."""
+        if amount not in self._ready or memo != self.memo:
+            return None
+        self._retire(amount)
+        ready = self._ready[amount]
+        if not ready:
+            self._stats["misses"] += 1
+            self._refill_soon(amount)
+            return None
+        self._stats["hits"] += 1
+        invoice = ready.popleft()
+        self._refill_soon(amount)
+        return invoice.payment_request
+
+    async def get_invoice(self, amount: int, memo: str) -> str:
+        """A pooled invoice if one is ready, otherwise a freshly created one."""
+        payment_request = self.take(amount, memo)
+        if payment_request is not None:
+            return payment_request
+        return await self.external_api.create_invoice(amount=amount, memo=memo, key=config['HERD_KEY'])
+
+    def _refill_soon(self, amount: int):
+        self._refills.start(amount, lambda: self.refill(amount))
+
+    async def refill(self, amount: int):
+        """Retire invoices near expiry and top amount back up to size."""
+        self._retire(amount)
+        ready = self._ready[amount]
+        while len(ready) < self.size:
+            start = time.monotonic()
+            try:
+                with call_priority(Priority.BACKGROUND):
+                    payment_request = await self.external_api.create_invoice(
+                        amount=amount,
+                        memo=self.memo,
+                        key=config['HERD_KEY'],
+                        expiry=self.expiry
+                    )
+            except Exception:
+                self._stats["create_errors"] += 1
+                raise
+            # Count the expiry from the request start; LNbits starts it on receipt
+            ready.append(_Invoice(payment_request, start + self.expiry))
+            elapsed = time.monotonic() - start
+            self._stats["created"] += 1
+            self._stats["refill_seconds_total"] += elapsed
+            self._stats["last_refill_seconds"] = elapsed
+
+    async def run(self):
+        """Keep every amount topped up until cancelled."""
+        while True:
+            for amount in self.amounts:
+                try:
+                    await self._refills.do(amount, lambda amount=amount: self.refill(amount))
+                except Exception as e:
+                    logger.error(f"Error refilling invoice pool for {amount} sats: {e}")
+            await asyncio.sleep(self.refill_interval)
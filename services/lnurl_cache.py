@@ -0,0 +1,109 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, NamedTuple, Optional
+from utils.resilience import CircuitOpenError, is_upstream_failure
+from utils.single_flight import SingleFlight
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# LNURL-pay fields a payout needs; the rest of the scan response is dropped
+LNURL_PAY_FIELDS = (
+    "callback", "minSendable", "maxSendable", "description_hash",
+    "commentAllowed", "allowsNostr", "nostrPubkey",
+)
+
+class _Scan(NamedTuple):
+    params: Optional[Dict[str, Any]]  # None for a cached failure
+    expires_at: float  # time.monotonic()
+
+class LnurlCache:
+    """LNURL-pay parameters per lud16, shared by payouts and verification.
+
+    Successful scans are kept for ttl seconds and definitive failures (a
+    4xx from lnurlscan or a response without a callback) for negative_ttl,
+    so a bad address is not rescanned on every payout. Upstream failures
+    (transport errors, 429/5xx, an open breaker) are raised uncached, so
+    an LNbits blip never blacklists an address. Concurrent lookups of one
+    address share a single scan.
+    """
+
+    def __init__(
+        self,
+        scan: Callable[[str], Awaitable[Dict[str, Any]]],
+        ttl: Optional[float] = None,
+        negative_ttl: Optional[float] = None,
+        max_entries: Optional[int] = None
+    ):
+        self._scan = scan
+        self.ttl = ttl or config['LNURL_CACHE_TTL']
+        self.negative_ttl = negative_ttl or config['LNURL_NEGATIVE_TTL']
+        self.max_entries = max_entries or config['LNURL_CACHE_MAX_ENTRIES']
+        self._entries: "OrderedDict[str, _Scan]" = OrderedDict()
+        self._scans = SingleFlight()
+        self._stats = {
+            "hits": 0, "negative_hits": 0, "misses": 0, "scan_errors": 0,
+            "upstream_errors": 0, "invalidations": 0,
+        }
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {**self._stats, "entries": len(self._entries), "coalesced_scans": self._scans.shared}
+
+    async def get(self, lud16: str) -> Optional[Dict[str, Any]]:
+        """Return LNURL-pay parameters for lud16, or None if it does not resolve.
+
+        Raises the upstream error if LNbits could not answer.
+        """
+        entry = self._entries.get(lud16)
+        if entry is not None and entry.expires_at > time.monotonic():
+            self._entries.move_to_end(lud16)
+            self._stats["hits" if entry.params is not None else "negative_hits"] += 1
+            return entry.params
+        self._stats["misses"] += 1
+        return await self._scans.do(lud16, lambda: self._load(lud16))
+
+    async def _load(self, lud16: str) -> Optional[Dict[str, Any]]:
+        try:
+            data = await self._scan(lud16)
+            params = {field: data[field] for field in LNURL_PAY_FIELDS if field in data}
+            if not params.get("callback"):
+                raise ValueError("scan response has no callback")
+            ttl = self.ttl
+        except Exception as e:
+            if isinstance(e, CircuitOpenError) or is_upstream_failure(e):
+                self._stats["upstream_errors"] += 1
+                raise
+            logger.warning(f"LNURL scan failed for {lud16}: {e}")
+            self._stats["scan_errors"] += 1
+            params, ttl = None, self.negative_ttl
+        self._entries[lud16] = _Scan(params, time.monotonic() + ttl)
+        self._entries.move_to_end(lud16)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return params
+
+    def invalidate(self, lud16: str):
+        """Forget lud16, e.g. after its callback rejected a payment."""
+        if self._entries.pop(lud16, None) is not None:
+            self._stats["invalidations"] += 1
+
+    async def warm(self, lud16s: Iterable[str], concurrency: int = 5) -> int:
+        """Scan addresses ahead of a payout round; returns how many resolve.
+
+        Addresses LNbits could not scan are left for the payout to retry.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(lud16: str):
+            async with semaphore:
+                return await self.get(lud16)
+
+        addresses = list(dict.fromkeys(lud16 for lud16 in lud16s if lud16 and '@' in lud16))
+        results = await asyncio.gather(*(one(lud16) for lud16 in addresses), return_exceptions=True)
+        failed = sum(1 for result in results if isinstance(result, Exception))
+        if failed:
+            logger.warning(f"LNbits could not scan {failed} of {len(addresses)} addresses while warming")
+        return sum(1 for params in results if isinstance(params, dict))
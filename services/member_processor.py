@@ -3,6 +3,7 @@ from typing import List, Dict, Tuple
 from services.database import DatabaseService
 from services.notifier import NotifierService
 from services.cyberherd_manager import CyberHerdManager
+from services.herd_state import HerdState
 from config import MAX_HERD_SIZE
 
 logger = logging.getLogger(__name__)
@@ -12,73 +13,98 @@ class MemberProcessor:
         self,
         database: DatabaseService,
         notifier: NotifierService,
-        cyberherd_manager: CyberHerdManager
+        cyberherd_manager: CyberHerdManager,
+        herd_state: HerdState
     ):
         self.database = database
         self.notifier = notifier
         self.cyberherd_manager = cyberherd_manager
+        self.herd_state = herd_state
 
     async def process_members(
         self,
         members_data: List[Dict]
     ) -> Tuple[List[Dict], List[Dict]]:
-        """Process new and existing CyberHerd members."""
+        """Process new and existing CyberHerd members.
+
+        Admission is decided against the in-memory herd state while the
+        herd lock is held, so concurrent batches cannot both fill the last
+        spots. The writes run in one transaction so a batch costs a single
+        commit. Herd state changes are staged and applied, and new-member
+        notifications sent, only after it commits, so a rolled-back batch
+        leaves memory untouched.
+        """
         members_to_notify = []
         targets_to_update = []
+        staged: List = []
 
-        query = "SELECT COUNT(*) as count FROM cyber_herd"
-        result = await self.database.fetch_one(query)
-        current_herd_size = result['count']
+        async with self.herd_state.writing():
+            current_herd_size = self.herd_state.size
+            if current_herd_size >= MAX_HERD_SIZE:
+                logger.info(f"Herd full: {current_herd_size} members")
+                return [], []
 
-        if current_herd_size >= MAX_HERD_SIZE:
-            logger.info(f"Herd full: {current_herd_size} members")
-            return [], []
+            async with self.database.transaction():
+                for member in members_data:
+                    try:
+                        existing = self.herd_state.get(member['pubkey'])
 
-        for member in members_data:
-            try:
-                pubkey = member['pubkey']
-                check_query = """
-                    SELECT COUNT(*) as count, kinds, notified 
-                    FROM cyber_herd 
-                    WHERE pubkey = :pubkey
-                """
-                existing = await self.database.fetch_one(
-                    check_query, 
-                    {"pubkey": pubkey}
-                )
+                        if existing is None and current_herd_size < MAX_HERD_SIZE:
+                            await self._process_new_member(
+                                member,
+                                current_herd_size,
+                                members_to_notify,
+                                targets_to_update,
+                                staged
+                            )
+                            current_herd_size += 1
+                        elif existing is not None:
+                            await self._process_existing_member(
+                                member,
+                                existing,
+                                members_to_notify,
+                                targets_to_update,
+                                staged
+                            )
 
-                if existing['count'] == 0 and current_herd_size < MAX_HERD_SIZE:
-                    await self._process_new_member(
-                        member,
-                        members_to_notify,
-                        targets_to_update
-                    )
-                    current_herd_size += 1
-                elif existing['count'] > 0:
-                    await self._process_existing_member(
-                        member,
-                        existing,
-                        members_to_notify,
-                        targets_to_update
-                    )
+                    except Exception as e:
+                        logger.error(f"Error processing member {member.get('pubkey')}: {e}")
+                        continue
 
-            except Exception as e:
-                logger.error(f"Error processing member {member.get('pubkey')}: {e}")
-                continue
+            await self.herd_state.apply(staged)
 
+        await self._notify_new_members(members_to_notify, current_herd_size)
         return members_to_notify, targets_to_update
 
+    async def _notify_new_members(self, members_to_notify: List[Dict], herd_size: int):
+        """Send new-member notifications once the batch is committed."""
+        for entry in members_to_notify:
+            if entry['type'] != 'new_member':
+                continue
+            try:
+                await self.notifier.send_cyberherd_notification(
+                    entry['data'],
+                    difference=0,
+                    spots_remaining=MAX_HERD_SIZE - herd_size
+                )
+            except Exception as e:
+                logger.error(f"Error notifying new member {entry['pubkey']}: {e}")
+
     async def _process_new_member(
         self,
         member: Dict,
+        current_herd_size: int,
         members_to_notify: List,
-        targets_to_update: List
+        targets_to_update: List,
+        staged: List
     ):
         """Process a new CyberHerd member."""
         success, msg = await self.cyberherd_manager.process_new_member(
             member_data=member,
             kinds_int=self._parse_kinds(member.get('kinds', [])),
-            current_herd_size=0  # This will be calculated in process_new_member
+            current_herd_size=current_herd_size,
+            notify=False,
+            staged=staged
         )
         
         if success:
@@ -100,13 +126,15 @@ class MemberProcessor:
         member: Dict,
         existing: Dict,
         members_to_notify: List,
-        targets_to_update: List
+        targets_to_update: List,
+        staged: List
     ):
         """Process an existing CyberHerd member."""
         success, msg = await self.cyberherd_manager.process_existing_member(
             member_data=member,
             kinds_int=self._parse_kinds(member.get('kinds', [])),
-            current_kinds=self._parse_kinds(existing.get('kinds', []))
+            current_kinds=self._parse_kinds(existing.get('kinds', [])),
+            staged=staged
         )
         
         if success and existing['notified'] is None:
@@ -0,0 +1,124 @@
+import logging
+import time
+from typing import List, NamedTuple, Tuple
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    statements: Tuple[str, ...]
+
+# Append new steps to the end; never edit a migration that has shipped.
+MIGRATIONS: List[Migration] = [
+    Migration(1, "create cyber_herd and cache tables", (
+        """
+        CREATE TABLE IF NOT EXISTS cyber_herd (
+            pubkey TEXT PRIMARY KEY,
+            display_name TEXT,
+            event_id TEXT,
+            note TEXT,
+            kinds TEXT,
+            nprofile TEXT,
+            lud16 TEXT,
+            notified TEXT,
+            payouts REAL,
+            amount INTEGER,
+            picture TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS cache (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+        """,
+    )),
+    Migration(2, "index herd and cache hot paths", (
+        "CREATE INDEX IF NOT EXISTS idx_cyber_herd_event_id ON cyber_herd (event_id)",
+        "CREATE INDEX IF NOT EXISTS idx_cyber_herd_lud16 ON cyber_herd (lud16)",
+        "CREATE INDEX IF NOT EXISTS idx_cache_expires_at ON cache (expires_at)",
+    )),
+    Migration(3, "add cache tags for group invalidation", (
+        """
+        CREATE TABLE IF NOT EXISTS cache_tags (
+            tag TEXT NOT NULL,
+            key TEXT NOT NULL,
+            PRIMARY KEY (tag, key)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_cache_tags_key ON cache_tags (key)",
+    )),
+    Migration(4, "group cache expiry into time buckets", (
+        "ALTER TABLE cache ADD COLUMN bucket INTEGER NOT NULL DEFAULT 0",
+        # Bucket width must match CACHE_BUCKET_SECONDS in services/cache_manager.py
+        "UPDATE cache SET bucket = CAST(expires_at / 60 AS INTEGER)",
+        "CREATE INDEX IF NOT EXISTS idx_cache_bucket ON cache (bucket)",
+        "DROP INDEX IF EXISTS idx_cache_expires_at",
+    )),
+    Migration(5, "add payment checkpoints for websocket catch-up", (
+        """
+        CREATE TABLE IF NOT EXISTS payment_checkpoint (
+            wallet TEXT PRIMARY KEY,
+            payment_time INTEGER NOT NULL,
+            payment_hash TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        )
+        """,
+    )),
+    Migration(6, "add seen payment hashes for de-duplication", (
+        """
+        CREATE TABLE IF NOT EXISTS seen_payments (
+            payment_hash TEXT PRIMARY KEY,
+            day TEXT NOT NULL,
+            seen_at REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_seen_payments_day ON seen_payments (day)",
+    )),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+async def get_schema_version(engine: AsyncEngine) -> int:
+    """Return the highest applied migration version, or 0 for a fresh database."""
+    async with engine.begin() as conn:
+        await conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at REAL NOT NULL
+            )
+        """))
+        result = await conn.execute(text("SELECT MAX(version) FROM schema_version"))
+        return result.scalar() or 0
+
+async def apply_migrations(engine: AsyncEngine) -> int:
+    """Apply pending migrations in order, each in its own transaction.
+
+    Returns the schema version after migrating.
+    """
+    current = await get_schema_version(engine)
+    for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+        if migration.version <= current:
+            continue
+        async with engine.begin() as conn:
+            for statement in migration.statements:
+                await conn.execute(text(statement))
+            await conn.execute(
+                text("""
+                    INSERT INTO schema_version (version, description, applied_at)
+                    VALUES (:version, :description, :applied_at)
+                """),
+                {
+                    "version": migration.version,
+                    "description": migration.description,
+                    "applied_at": time.time()
+                }
+            )
+        logger.info(f"Applied schema migration {migration.version}: {migration.description}")
+        current = migration.version
+    return current
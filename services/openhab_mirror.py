@@ -0,0 +1,184 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import httpx
+from services.external_api import ExternalAPIService
+from config import config
+
+logger = logging.getLogger(__name__)
+
+MIRRORED_ITEMS = ("FeederOverride", "GoatSats", "BTC_Price_Output")
+
+# Item events that carry a new state in their payload
+STATE_EVENT_TYPES = ("ItemStateEvent", "ItemStateChangedEvent", "ItemStateUpdatedEvent")
+
+# OpenHAB states that mean "no value"
+UNSET_STATES = ("NULL", "UNDEF")
+
+def parse_item_event(data: str) -> Optional[Tuple[str, str]]:
+    """Return (item, state) for an SSE data line holding an item state event."""
+    try:
+        event = json.loads(data)
+        if event.get("type") not in STATE_EVENT_TYPES:
+            return None
+        # topic is openhab/items/<item>/<statechanged|state|stateupdated>
+        item = event["topic"].split("/")[2]
+        return item, json.loads(event["payload"])["value"]
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+
+class OpenHABMirror:
+    """In-memory copy of a few OpenHAB items, kept current by /rest/events.
+
+    run() subscribes to the server-sent event stream, then resyncs every
+    item with one bulk /rest/items read so nothing changed while it was
+    connecting is missed. If the stream cannot be opened the mirror polls
+    that bulk read every poll_interval and retries the stream after
+    stream_retry seconds. get() only answers while the mirror is live or
+    the last poll is recent; otherwise callers fall back to a direct read.
+    """
+
+    def __init__(
+        self,
+        external_api: ExternalAPIService,
+        items: Iterable[str] = MIRRORED_ITEMS,
+        poll_interval: Optional[float] = None,
+        stream_retry: Optional[float] = None,
+        read_timeout: Optional[float] = None
+    ):
+        self.external_api = external_api
+        self.items = tuple(items)
+        self.poll_interval = poll_interval or config['OPENHAB_POLL_INTERVAL']
+        self.stream_retry = stream_retry or config['OPENHAB_STREAM_RETRY']
+        self.read_timeout = read_timeout or config['OPENHAB_EVENTS_READ_TIMEOUT']
+        self.reconnect_delay = 1.0
+        self.mode = "stopped"
+        self._states: Dict[str, str] = {}
+        self._synced_at: Optional[float] = None  # time.monotonic() of the last bulk read
+        self._listeners: Dict[str, List[Callable[[str], Any]]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"events": 0, "resyncs": 0, "polls": 0, "stream_connects": 0, "stream_errors": 0}
+
+    @property
+    def live(self) -> bool:
+        """True while the event stream is connected and resynced."""
+        return self.mode == "stream" and self._synced_at is not None
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "mode": self.mode, "live": self.live, "states": dict(self._states)}
+
+    def get(self, item: str) -> Optional[str]:
+        """Mirrored state of item, or None if unknown or not trustworthy."""
+        if not self.live:
+            if self._synced_at is None or time.monotonic() - self._synced_at > 2 * self.poll_interval:
+                return None
+        state = self._states.get(item)
+        return None if state in UNSET_STATES else state
+
+    def subscribe(self, item: str, callback: Callable[[str], Any]):
+        """Call callback(state) whenever item gets a new state."""
+        self._listeners.setdefault(item, []).append(callback)
+
+    def _apply(self, item: str, state: str):
+        if item not in self.items:
+            return
+        self._states[item] = state
+        if state in UNSET_STATES:
+            return
+        for callback in self._listeners.get(item, ()):
+            try:
+                callback(state)
+            except Exception as e:
+                logger.error(f"Error in OpenHAB listener for {item}: {e}")
+
+    async def feeder_override(self) -> bool:
+        """FeederOverride from the mirror, or from OpenHAB if it is not live."""
+        state = self.get("FeederOverride")
+        if state is None:
+            return await self.external_api.get_feeder_status()
+        return state == "ON"
+
+    async def resync(self):
+        """Refresh every mirrored item with one bulk read."""
+        states = await self.external_api.get_openhab_items(self.items)
+        for item, state in states.items():
+            self._apply(item, state)
+        self._synced_at = time.monotonic()
+        self._stats["resyncs"] += 1
+
+    async def _stream(self):
+        """Consume /rest/events until the stream ends or fails."""
+        client = await self.external_api.openhab_client
+        topics = ",".join(f"openhab/items/{item}/*" for item in self.items)
+        timeout = httpx.Timeout(config['OPENHAB_CONNECT_TIMEOUT'], read=self.read_timeout)
+        async with client.stream(
+            "GET",
+            f"{self.external_api.openhab_url}/rest/events",
+            params={"topics": topics},
+            headers={"accept": "text/event-stream"},
+            auth=self.external_api.auth,
+            timeout=timeout
+        ) as response:
+            response.raise_for_status()
+            self._stats["stream_connects"] += 1
+            # Subscribed first, so changes during the bulk read still arrive
+            await self.resync()
+            self.mode = "stream"
+            logger.info("OpenHAB event stream connected")
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                event = parse_item_event(line[5:].strip())
+                if event:
+                    self._stats["events"] += 1
+                    self._apply(*event)
+
+    async def _poll_until_retry(self):
+        """Fallback: bulk-read the items on an interval until the stream retry."""
+        self.mode = "polling"
+        deadline = time.monotonic() + self.stream_retry
+        while time.monotonic() < deadline:
+            try:
+                await self.resync()
+                self._stats["polls"] += 1
+            except Exception as e:
+                logger.error(f"Error polling OpenHAB items: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def run(self):
+        """Mirror the items until cancelled."""
+        while True:
+            try:
+                await self._stream()
+                logger.info("OpenHAB event stream closed, reconnecting")
+                self.mode = "reconnecting"
+            except asyncio.CancelledError:
+                self.mode = "stopped"
+                raise
+            except httpx.ReadTimeout:
+                # Nothing changed for read_timeout; reconnect and resync
+                self.mode = "reconnecting"
+            except Exception as e:
+                self._stats["stream_errors"] += 1
+                logger.warning(f"OpenHAB event stream unavailable ({e}), polling instead")
+                await self._poll_until_retry()
+                continue
+            await asyncio.sleep(self.reconnect_delay)
+
+    def start(self):
+        """Start run() as a background task."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.mode = "stopped"
@@ -0,0 +1,97 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from services.database import DatabaseService
+from config import config
+
+logger = logging.getLogger(__name__)
+
+def _today() -> str:
+    return time.strftime('%Y-%m-%d')
+
+class PaymentDeduplicator:
+    """Drops repeat deliveries of a payment, keyed by payment_hash.
+
+    A payment can arrive over the websocket, the payment webhook and a
+    reconnect catch-up. Recently seen hashes live in a bounded LRU, so a
+    repeat is rejected without I/O; the seen_payments table keeps today's
+    hashes across restarts and for anything the LRU has evicted. Rows
+    from earlier days are pruned when the day rolls over. A payment that
+    fails to process is forgotten again so a redelivery can retry it.
+    """
+
+    def __init__(self, database: DatabaseService, max_entries: Optional[int] = None):
+        self.database = database
+        self.max_entries = max_entries or config['PAYMENT_DEDUP_MAX_ENTRIES']
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+        self._day = _today()
+        self._stats = {"accepted": 0, "suppressed": 0, "persisted_hits": 0, "store_errors": 0, "released": 0}
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "entries": len(self._seen), "day": self._day}
+
+    def _remember(self, payment_hash: str):
+        self._seen[payment_hash] = None
+        self._seen.move_to_end(payment_hash)
+        while len(self._seen) > self.max_entries:
+            self._seen.popitem(last=False)
+
+    async def load(self):
+        """Prune earlier days and warm the LRU with today's hashes."""
+        await self.prune()
+        rows = await self.database.fetch_all(
+            "SELECT payment_hash FROM seen_payments WHERE day = :day ORDER BY seen_at DESC LIMIT :limit",
+            {"day": self._day, "limit": self.max_entries}
+        )
+        for row in reversed(rows):
+            self._remember(row["payment_hash"])
+        logger.info(f"Loaded {len(rows)} payment hashes seen today")
+
+    async def prune(self):
+        """Delete hashes recorded before today."""
+        self._day = _today()
+        await self.database.execute("DELETE FROM seen_payments WHERE day < :day", {"day": self._day})
+
+    async def first_seen(self, payment_hash: str) -> bool:
+        """Record payment_hash; False if it has been delivered before."""
+        if payment_hash in self._seen:
+            self._seen.move_to_end(payment_hash)
+            self._stats["suppressed"] += 1
+            return False
+        # Remembered before any await, so a concurrent duplicate is caught above
+        self._remember(payment_hash)
+        try:
+            if _today() != self._day:
+                await self.prune()
+            result = await self.database.execute(
+                """
+                INSERT OR IGNORE INTO seen_payments (payment_hash, day, seen_at)
+                VALUES (:payment_hash, :day, :seen_at)
+                """,
+                {"payment_hash": payment_hash, "day": self._day, "seen_at": time.time()}
+            )
+            if result.rowcount == 0:
+                self._stats["persisted_hits"] += 1
+                self._stats["suppressed"] += 1
+                return False
+        except Exception as e:
+            # Counting a payment twice beats losing it
+            self._stats["store_errors"] += 1
+            logger.error(f"Error recording payment hash: {e}")
+        self._stats["accepted"] += 1
+        return True
+
+    async def forget(self, payment_hash: str):
+        """Undo first_seen for a payment that could not be processed."""
+        self._seen.pop(payment_hash, None)
+        self._stats["released"] += 1
+        try:
+            await self.database.execute(
+                "DELETE FROM seen_payments WHERE payment_hash = :payment_hash",
+                {"payment_hash": payment_hash}
+            )
+        except Exception as e:
+            self._stats["store_errors"] += 1
+            logger.error(f"Error forgetting payment hash: {e}")
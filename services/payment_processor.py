@@ -1,29 +1,74 @@
+import asyncio
 import logging
 import json
 import math
-from typing import Dict, Optional
+from typing import Any, Dict, List, Optional
 from config import config, TRIGGER_AMOUNT_SATS
 from services.external_api import ExternalAPIService
 from services.notifier import NotifierService
 from services.database import DatabaseService
 from services.messaging_service import MessagingService
+from services.goat_sats_counter import GoatSatsCounter
+from services.openhab_mirror import OpenHABMirror
+from services.balance_service import BalanceService
+from services.payment_dedup import PaymentDeduplicator
+from utils.resilience import Priority, call_priority
+from utils.parsers import parse_payment_time
 from asyncio import Lock
 
 logger = logging.getLogger(__name__)
 
+# payment_checkpoint row for the herd wallet
+CHECKPOINT_WALLET = "herd"
+
+def is_settled_incoming(payment: Dict) -> bool:
+    """True for a received payment that LNbits has settled."""
+    if payment.get('amount', 0) < 1000 or payment.get('pending'):
+        return False
+    return payment.get('status', 'success') == 'success'
+
 class PaymentProcessor:
+    """Applies herd wallet payments and feeds the goats at the threshold.
+
+    Feeding is a small state machine: accumulating -> triggering (feeder
+    call and notification) -> resetting (sweep the wallet) -> accumulating.
+    The lock only guards the balance and state transitions; every OpenHAB,
+    LNbits and Nostr call runs outside it, and a feeding runs as its own
+    task, so payments arriving meanwhile are still counted and announced
+    without starting a second feeding.
+    """
+
+    ACCUMULATING = "accumulating"
+    TRIGGERING = "triggering"
+    RESETTING = "resetting"
+
     def __init__(
         self,
         external_api: ExternalAPIService,
         notifier: NotifierService,
-        database: DatabaseService
+        database: DatabaseService,
+        goat_sats: GoatSatsCounter,
+        openhab_mirror: OpenHABMirror,
+        balance_service: BalanceService,
+        dedup: PaymentDeduplicator
     ):
         self.external_api = external_api
         self.notifier = notifier
         self.database = database
+        self.goat_sats = goat_sats
+        self.openhab_mirror = openhab_mirror
+        self.balance_service = balance_service
+        self.dedup = dedup
         self.balance = 0
+        self.state = self.ACCUMULATING
         self.lock = Lock()
         self.messaging = MessagingService()
+        self._feeding: Optional[asyncio.Task] = None
+        self._stats = {"feedings": 0, "feeding_errors": 0, "payments_while_feeding": 0, "overridden": 0}
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "state": self.state, "balance": self.balance}
 
     async def process_payment(self, payment_data: Dict):
         """Process incoming payment data from websocket."""
@@ -32,8 +77,17 @@ class PaymentProcessor:
             payment_amount_msats = payment.get('amount', 0)
             sats_received = payment_amount_msats // 1000
             
-            async with self.lock:
-                self.balance = payment_data.get('wallet_balance', 0)
+            # Catch-up frames only carry the balance on the last payment
+            if 'wallet_balance' in payment_data:
+                async with self.lock:
+                    self.balance = payment_data['wallet_balance']
+                self.balance_service.update_from_websocket(self.balance)
+            
+            # The websocket, the webhook and catch-up can all deliver one payment
+            payment_hash = payment.get('payment_hash')
+            if sats_received > 0 and payment_hash and not await self.dedup.first_seen(payment_hash):
+                logger.info(f"Ignoring repeat delivery of payment {payment_hash}")
+                return
             
             # Only log actual payments, not zero amounts
             if sats_received > 0:
@@ -44,48 +98,140 @@ class PaymentProcessor:
                 logger.info(f"Remaining: {max(0, TRIGGER_AMOUNT_SATS - self.balance)} sats needed")
                 logger.info("=" * 40)
                 
-                await self._handle_received_payment(sats_received, payment)
+                try:
+                    # Upstream reads on the payment path jump the dashboard queue
+                    with call_priority(Priority.PAYMENT):
+                        await self._handle_received_payment(sats_received, payment)
+                except Exception:
+                    # Not counted: let a redelivery or catch-up retry it
+                    if payment_hash:
+                        await self.dedup.forget(payment_hash)
+                    raise
+                await self._save_checkpoint(payment)
 
         except Exception as e:
             logger.error(f"Error processing payment data: {e}", exc_info=True)
             raise
 
     async def _handle_received_payment(self, sats_received: int, payment: Dict):
-        """Handle payment processing and notifications."""
+        """Count a payment and start a feeding once the balance reaches the trigger."""
         try:
-            # Update goat sats counter
-            await self.external_api.update_goat_sats(sats_received)
-            
+            override = await self.openhab_mirror.feeder_override()
+            # Count locally; the counter flushes to OpenHAB in the background.
+            # Nothing below may raise once the payment is counted.
+            self.goat_sats.increment(sats_received)
+
             async with self.lock:
-                difference = TRIGGER_AMOUNT_SATS - self.balance
-                
-                if not await self.external_api.get_feeder_status():
-                    if self.balance >= TRIGGER_AMOUNT_SATS:
-                        logger.info("\n🔔 FEEDER TRIGGER ACTIVATED 🔔")
-                        logger.info(f"Current Balance: {self.balance} sats")
-                        logger.info("=" * 40)
-                        
-                        if config['DEBUG']:
-                            logger.info("DEBUG MODE: Feeder trigger simulated")
-                        else:
-                            await self._trigger_feeder_and_notify(sats_received)
-                    elif sats_received >= 10:
-                        message, _ = await self.messaging.make_messages(
-                            config['NOS_SEC'],
-                            sats_received,
-                            difference,
-                            "sats_received"
-                        )
-                        await self.notifier.broadcast(message)
+                balance = self.balance
+                if override:
+                    action = "override"
+                elif self.state != self.ACCUMULATING:
+                    action = "notify"
+                    self._stats["payments_while_feeding"] += 1
+                elif balance >= TRIGGER_AMOUNT_SATS:
+                    action = "feed"
+                    self.state = self.TRIGGERING
                 else:
-                    logger.info("\n⚠️ Feeder Override Active")
-                    logger.info("Skipping feeder trigger")
-                    logger.info("=" * 40)
+                    action = "notify"
+
+            if action == "override":
+                self._stats["overridden"] += 1
+                logger.info("\n⚠️ Feeder Override Active")
+                logger.info("Skipping feeder trigger")
+                logger.info("=" * 40)
+            elif action == "feed":
+                logger.info("\n🔔 FEEDER TRIGGER ACTIVATED 🔔")
+                logger.info(f"Current Balance: {balance} sats")
+                logger.info("=" * 40)
+                self._feeding = asyncio.create_task(self._feed(sats_received))
+            elif sats_received >= 10:
+                try:
+                    message, _ = await self.messaging.make_messages(
+                        config['NOS_SEC'],
+                        sats_received,
+                        max(0, TRIGGER_AMOUNT_SATS - balance),
+                        "sats_received"
+                    )
+                    await self.notifier.broadcast(message)
+                except Exception as e:
+                    logger.error(f"Error announcing payment: {e}")
 
         except Exception as e:
             logger.error(f"Error handling payment: {e}", exc_info=True)
             raise
 
+    async def _feed(self, sats_received: int):
+        """Run triggering and resetting, then go back to accumulating."""
+        try:
+            if config['DEBUG']:
+                logger.info("DEBUG MODE: Feeder trigger simulated")
+            else:
+                await self._trigger_feeder_and_notify(sats_received)
+            self._stats["feedings"] += 1
+        except Exception as e:
+            self._stats["feeding_errors"] += 1
+            logger.error(f"Error feeding the goats: {e}", exc_info=True)
+        finally:
+            async with self.lock:
+                self.state = self.ACCUMULATING
+
+    async def wait_for_feeding(self):
+        """Wait for a feeding in progress, if any, to finish."""
+        if self._feeding is not None:
+            await asyncio.shield(self._feeding)
+
+    async def _save_checkpoint(self, payment: Dict):
+        payment_time = parse_payment_time(payment)
+        if payment_time is None or not payment.get('payment_hash'):
+            return
+        try:
+            await self.database.set_payment_checkpoint(
+                CHECKPOINT_WALLET, payment_time, payment['payment_hash']
+            )
+        except Exception as e:
+            logger.error(f"Error saving payment checkpoint: {e}")
+
+    async def missed_payments(self) -> List[Dict]:
+        """Frames for payments settled after the checkpoint, oldest first.
+
+        Pages LNbits /api/v1/payments newest first until it reaches the
+        checkpoint. The last frame carries the current wallet balance so
+        the feeder threshold is checked against it. Without a checkpoint
+        there is nothing to catch up on.
+        """
+        checkpoint = await self.database.get_payment_checkpoint(CHECKPOINT_WALLET)
+        if checkpoint is None:
+            return []
+        page_size = config['PAYMENT_CATCHUP_PAGE_SIZE']
+        missed: List[Dict] = []
+        for page in range(config['PAYMENT_CATCHUP_MAX_PAGES']):
+            payments = await self.external_api.get_payments(
+                config['HERD_KEY'], limit=page_size, offset=page * page_size
+            )
+            reached = False
+            for payment in payments:
+                payment_time = parse_payment_time(payment)
+                if payment_time is None:
+                    continue
+                if payment_time < checkpoint['payment_time']:
+                    reached = True
+                    break
+                if payment.get('payment_hash') == checkpoint['payment_hash']:
+                    continue
+                if is_settled_incoming(payment):
+                    missed.append(payment)
+            if reached or len(payments) < page_size:
+                break
+        else:
+            logger.warning(f"Payment catch-up stopped after {config['PAYMENT_CATCHUP_MAX_PAGES']} pages")
+        if not missed:
+            return []
+        missed.reverse()
+        logger.info(f"Catching up on {len(missed)} payments missed while disconnected")
+        frames = [{'payment': payment} for payment in missed]
+        frames[-1]['wallet_balance'] = await self.balance_service.get_balance(force_refresh=True) // 1000
+        return frames
+
     def _extract_nostr_data(self, payment: Dict) -> Optional[Dict]:
         """Extract and validate Nostr data from payment."""
         try:
@@ -112,16 +258,19 @@ class PaymentProcessor:
             await self.notifier.broadcast(message)
             
             # Reset wallet
-            await self._reset_wallet()
+            async with self.lock:
+                self.state = self.RESETTING
+                amount = self.balance
+            await self._reset_wallet(amount)
             return True
             
         return False
 
-    async def _reset_wallet(self):
-        """Reset the wallet by creating and paying an invoice."""
+    async def _reset_wallet(self, amount: int):
+        """Reset the wallet by creating and paying an invoice for amount sats."""
         try:
             payment_request = await self.external_api.create_invoice(
-                amount=self.balance,
+                amount=amount,
                 memo='Reset Herd Wallet',
                 key=config['HERD_KEY']
             )
@@ -129,6 +278,6 @@ class PaymentProcessor:
                 payment_request=payment_request,
                 key=config['HERD_KEY']
             )
-            logger.info(f"Wallet reset successful. Amount: {self.balance}")
+            logger.info(f"Wallet reset successful. Amount: {amount}")
         except Exception as e:
             logger.error(f"Error resetting wallet: {e}")
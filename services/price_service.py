@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+from services.external_api import ExternalAPIService
+from services.openhab_mirror import OpenHABMirror
+from utils.single_flight import SingleFlight
+from config import config
+
+logger = logging.getLogger(__name__)
+
+SATS_PER_BTC = 100_000_000
+
+class PriceService:
+    """In-memory BTC price kept fresh by a background refresh loop.
+
+    Conversions read the last known price. Once it is older than
+    refresh_interval a refresh starts in the background and the stale price
+    is served meanwhile; only a price older than max_age (or no price at
+    all) makes the caller wait for OpenHAB. With an OpenHAB mirror the
+    price is pushed from the event stream and counts as current (age 0)
+    while the stream is live, so no refresh requests are made at all.
+    """
+
+    def __init__(
+        self,
+        external_api: ExternalAPIService,
+        refresh_interval: Optional[float] = None,
+        max_age: Optional[float] = None,
+        mirror: Optional[OpenHABMirror] = None
+    ):
+        self.external_api = external_api
+        self.mirror = mirror
+        self.refresh_interval = refresh_interval or config['BTC_PRICE_REFRESH_INTERVAL']
+        self.max_age = max_age or config['BTC_PRICE_MAX_AGE']
+        self._price: Optional[float] = None
+        self._fetched_at: Optional[float] = None  # time.monotonic()
+        self._updated_at: Optional[float] = None  # time.time(), for display
+        self._refreshes = SingleFlight()
+        self._stats = {
+            "refreshes": 0, "refresh_errors": 0, "stale_reads": 0, "blocking_reads": 0, "pushed": 0
+        }
+        if mirror is not None:
+            mirror.subscribe("BTC_Price_Output", self._on_mirrored_price)
+
+    @property
+    def age(self) -> Optional[float]:
+        """Seconds since the current price was fetched, or None if there is none."""
+        if self._fetched_at is None:
+            return None
+        if self._mirror_live():
+            return 0.0
+        return time.monotonic() - self._fetched_at
+
+    def _mirror_live(self) -> bool:
+        return self.mirror is not None and self.mirror.live
+
+    def _store(self, price: float):
+        self._price = price
+        self._fetched_at = time.monotonic()
+        self._updated_at = time.time()
+
+    def _on_mirrored_price(self, state: str):
+        try:
+            self._store(float(state))
+            self._stats["pushed"] += 1
+        except ValueError:
+            logger.warning(f"Invalid BTC_Price_Output state: {state}")
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "price": self._price, "age_seconds": self.age}
+
+    async def refresh(self) -> float:
+        """Fetch the price now; concurrent refreshes share one request."""
+        return await self._refreshes.do("price", self._fetch)
+
+    async def _fetch(self) -> float:
+        try:
+            price = await self.external_api.fetch_btc_price(force_refresh=True)
+        except Exception:
+            self._stats["refresh_errors"] += 1
+            raise
+        self._store(price)
+        self._stats["refreshes"] += 1
+        return price
+
+    async def get_price(self) -> float:
+        """Return the current price, refreshing in the background when stale."""
+        age = self.age
+        if age is None or age > self.max_age:
+            self._stats["blocking_reads"] += 1
+            try:
+                return await self.refresh()
+            except Exception:
+                if self._price is None:
+                    raise
+                logger.warning(f"BTC price refresh failed, serving price {age:.0f}s old")
+                return self._price
+        if age > self.refresh_interval:
+            self._stats["stale_reads"] += 1
+            self._refreshes.start("price", self._fetch)
+        return self._price
+
+    async def quote(self) -> Dict[str, Any]:
+        """Current price with its age, for API responses."""
+        price = await self.get_price()
+        return {
+            "price": price,
+            "age_seconds": round(self.age, 3),
+            "updated_at": self._updated_at,
+        }
+
+    @staticmethod
+    def usd_to_sats(usd_amount: float, price: float) -> int:
+        return int(round((usd_amount / price) * SATS_PER_BTC))
+
+    async def convert_to_sats(self, usd_amount: float) -> int:
+        """Convert USD amount to satoshis."""
+        return self.usd_to_sats(usd_amount, await self.get_price())
+
+    async def run(self):
+        """Refresh the price every refresh_interval until cancelled."""
+        while True:
+            try:
+                if not self._mirror_live():
+                    await self.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing BTC price: {e}")
+            await asyncio.sleep(self.refresh_interval)
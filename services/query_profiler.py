@@ -0,0 +1,123 @@
+import logging
+import re
+import time
+from bisect import bisect_left
+from collections import deque
+from functools import lru_cache
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+BUCKET_BOUNDS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_BIND_PARAM = re.compile(r"(?<!:):\w+")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+@lru_cache(maxsize=1024)
+def normalize_sql(query: str) -> str:
+    """Collapse whitespace and replace literals/bind parameters with '?'."""
+    normalized = _STRING_LITERAL.sub("?", query)
+    normalized = _BIND_PARAM.sub("?", normalized)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _IN_LIST.sub("(?, ...)", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+class _QueryStats:
+    __slots__ = ("count", "errors", "total_ms", "max_ms", "buckets", "last_seen")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.last_seen = 0.0
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Upper bound of the bucket holding the given percentile."""
+        if not self.count:
+            return None
+        threshold = fraction * self.count
+        running = 0
+        for index, bucket_count in enumerate(self.buckets):
+            running += bucket_count
+            if running >= threshold:
+                return BUCKET_BOUNDS_MS[index] if index < len(BUCKET_BOUNDS_MS) else self.max_ms
+        return self.max_ms
+
+class QueryProfiler:
+    """Per-statement latency histograms keyed by normalized SQL."""
+
+    def __init__(self, slow_query_ms: float = 100.0, slow_log_size: int = 50):
+        self.slow_query_ms = slow_query_ms
+        self._stats: Dict[str, _QueryStats] = {}
+        self._slow_queries: Deque[Dict[str, Any]] = deque(maxlen=slow_log_size)
+        self._started_at = time.time()
+
+    def record(self, query: str, elapsed_ms: float, error: bool = False) -> bool:
+        """Record one execution; returns True when it crossed the slow threshold."""
+        key = normalize_sql(query)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = _QueryStats()
+        stats.count += 1
+        stats.total_ms += elapsed_ms
+        stats.max_ms = max(stats.max_ms, elapsed_ms)
+        stats.buckets[bisect_left(BUCKET_BOUNDS_MS, elapsed_ms)] += 1
+        stats.last_seen = time.time()
+        if error:
+            stats.errors += 1
+        return elapsed_ms >= self.slow_query_ms
+
+    def record_slow_query(self, query: str, elapsed_ms: float, plan: List[str]):
+        """Log a slow query together with its query plan."""
+        normalized = normalize_sql(query)
+        self._slow_queries.append({
+            "query": normalized,
+            "elapsed_ms": round(elapsed_ms, 3),
+            "plan": plan,
+            "at": time.time(),
+        })
+        logger.warning(
+            f"Slow query ({elapsed_ms:.1f} ms >= {self.slow_query_ms} ms): {normalized}"
+            + "".join(f"\n    {line}" for line in plan)
+        )
+
+    def summary(self, limit: Optional[int] = None) -> Dict[str, Any]:
+        """JSON-serialisable summary, heaviest queries (by total time) first."""
+        queries = []
+        for query, stats in sorted(
+            self._stats.items(), key=lambda item: item[1].total_ms, reverse=True
+        ):
+            queries.append({
+                "query": query,
+                "count": stats.count,
+                "errors": stats.errors,
+                "total_ms": round(stats.total_ms, 3),
+                "mean_ms": round(stats.total_ms / stats.count, 3),
+                "max_ms": round(stats.max_ms, 3),
+                "p50_ms": stats.percentile(0.50),
+                "p95_ms": stats.percentile(0.95),
+                "p99_ms": stats.percentile(0.99),
+                "histogram": {
+                    (f"le_{bound}ms" if index < len(BUCKET_BOUNDS_MS) else "inf"): bucket_count
+                    for index, (bound, bucket_count) in enumerate(
+                        zip(BUCKET_BOUNDS_MS + (None,), stats.buckets)
+                    )
+                },
+            })
+        return {
+            "since": self._started_at,
+            "slow_query_ms": self.slow_query_ms,
+            "queries": queries[:limit] if limit else queries,
+            "slow_queries": list(self._slow_queries),
+        }
+
+    def reset(self):
+        self._stats.clear()
+        self._slow_queries.clear()
+        self._started_at = time.time()
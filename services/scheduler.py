@@ -3,14 +3,24 @@ import logging
 from datetime import datetime, timedelta
 from services.database import DatabaseService
 from services.external_api import ExternalAPIService
+from services.herd_state import HerdState
+from services.goat_sats_counter import GoatSatsCounter
 from config import config
 
 logger = logging.getLogger(__name__)
 
 class SchedulerService:
-    def __init__(self, database: DatabaseService, external_api: ExternalAPIService):
+    def __init__(
+        self,
+        database: DatabaseService,
+        external_api: ExternalAPIService,
+        herd_state: HerdState,
+        goat_sats: GoatSatsCounter
+    ):
         self.database = database
         self.external_api = external_api
+        self.herd_state = herd_state
+        self.goat_sats = goat_sats
         self.balance = 0
 
     async def schedule_daily_reset(self):
@@ -25,13 +35,17 @@ class SchedulerService:
 
             try:
                 # Reset cyber herd
-                await self.database.execute("DELETE FROM cyber_herd")
+                await self.herd_state.clear()
                 logger.info("CyberHerd table cleared successfully")
 
                 # Reset targets
                 await self.external_api.reset_cyberherd_targets()
+                await self.herd_state.invalidate_cache()
                 logger.info("CyberHerd targets reset successfully")
 
+                # Pick up the day's GoatSats reset from OpenHAB
+                await self.goat_sats.reconcile()
+
                 # Get and process current balance
                 balance = await self.external_api.get_balance(force_refresh=True)
                 if balance > 0:
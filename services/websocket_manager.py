@@ -1,8 +1,9 @@
 import asyncio
 import logging
 import json
+import time
 import websockets
-from typing import Optional, Set
+from typing import Any, Dict, List, NamedTuple, Optional, Set
 from asyncio import Lock, Event
 from fastapi.websockets import WebSocket
 from websockets.exceptions import (
@@ -16,12 +17,34 @@ from config import config
 
 logger = logging.getLogger(__name__)
 
+class _Frame(NamedTuple):
+    data: Dict[str, Any]
+    enqueued_at: float  # time.monotonic()
+
 class WebSocketManager:
+    """Reads HERD_WEBSOCKET frames and hands them to payment workers.
+
+    The reader only decodes and enqueues, so recv() never waits on
+    PaymentProcessor. Frames are sharded by wallet id over ingest_workers
+    bounded queues; one worker per queue keeps each wallet's frames in
+    order. When a queue is full, frames carrying a received payment wait
+    for room (backpressure on the socket), while balance-only frames are
+    dropped and counted, since the next frame or the balance reconcile
+    supersedes them.
+
+    Each (re)connect first queues the payments LNbits settled while no
+    connection was open, taken from the processor's checkpoint.
+    disconnect() stops the reconnect loop before the workers, so nothing
+    is read or queued once shutdown has begun.
+    """
+
     def __init__(
         self,
         uri: str,
         payment_processor,  # Add payment processor
-        logger: Optional[logging.Logger] = None
+        logger: Optional[logging.Logger] = None,
+        ingest_workers: Optional[int] = None,
+        ingest_queue_size: Optional[int] = None
     ):
         self.uri = uri
         self.payment_processor = payment_processor
@@ -30,22 +53,72 @@ class WebSocketManager:
         self.connected = False
         self.clients: Set[WebSocket] = set()
         self._connection_event = asyncio.Event()
+        self.ingest_workers = ingest_workers or config['WEBSOCKET_INGEST_WORKERS']
+        self.ingest_queue_size = ingest_queue_size or config['WEBSOCKET_INGEST_QUEUE_SIZE']
+        self._queues: List[asyncio.Queue] = []
+        self._workers: List[asyncio.Task] = []
+        self._reader: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._stats = {
+            "enqueued": 0, "processed": 0, "errors": 0, "decode_errors": 0,
+            "dropped": 0, "blocked": 0, "blocked_seconds_total": 0.0,
+            "caught_up": 0, "catch_up_errors": 0,
+            "lag_seconds_total": 0.0, "max_lag_seconds": 0.0, "last_lag_seconds": 0.0,
+        }
         self.logger.debug(f"WebSocketManager initialized with URI: {uri}")
 
+    @property
+    def stats(self) -> Dict[str, Any]:
+        depths = [queue.qsize() for queue in self._queues]
+        processed = self._stats["processed"]
+        return {
+            **self._stats,
+            "queue_depth": sum(depths),
+            "queue_depth_by_worker": depths,
+            "queue_capacity": self.ingest_queue_size * self.ingest_workers,
+            "avg_lag_seconds": self._stats["lag_seconds_total"] / processed if processed else 0.0,
+        }
+
+    def start_workers(self):
+        """Start the payment workers if they are not running."""
+        if self._workers and not all(worker.done() for worker in self._workers):
+            return
+        self._queues = [asyncio.Queue(maxsize=self.ingest_queue_size) for _ in range(self.ingest_workers)]
+        self._workers = [asyncio.create_task(self._worker(queue)) for queue in self._queues]
+
+    async def stop_workers(self, drain_timeout: float = 5.0):
+        """Give queued frames drain_timeout seconds to finish, then stop the workers."""
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in self._queues)), drain_timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Stopping with {self.stats['queue_depth']} unprocessed websocket frames")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queues = []
+
     async def connect(self) -> None:
-        """Connect to the WebSocket server."""
-        while True:
+        """Connect to the WebSocket server and reconnect until disconnect()."""
+        self._reader = asyncio.current_task()
+        self._stopping = False
+        self.start_workers()
+        while not self._stopping:
             try:
                 logger.info(f"Connecting to WebSocket server...")
                 self.connection = await websockets.connect(self.uri)
                 self.connected = True
                 self._connection_event.set()
                 logger.info("✅ WebSocket connection established")
+                # Subscribed first, so nothing settles unseen during catch-up
+                await self._catch_up()
                 
                 while True:
                     try:
                         message = await self.connection.recv()
-                        await self._handle_message(message)
+                        await self._enqueue(message)
                     except ConnectionClosed:
                         logger.warning("⚠️ WebSocket connection closed")
                         break
@@ -56,17 +129,27 @@ class WebSocketManager:
                 logger.error(f"❌ WebSocket connection error: {e}")
                 self.connected = False
                 self._connection_event.clear()
+                if self._stopping:
+                    break
                 
                 logger.info("Reconnecting in 5 seconds...")
                 await asyncio.sleep(5)
 
     async def disconnect(self) -> None:
         """Disconnect from the WebSocket server."""
+        self._stopping = True
+        # Stop the reader first: it may be reconnecting, catching up or
+        # waiting for room in a full queue
+        reader, self._reader = self._reader, None
+        if reader is not None and reader is not asyncio.current_task():
+            reader.cancel()
+            await asyncio.gather(reader, return_exceptions=True)
         if self.connection:
             self.logger.info("Disconnecting from WebSocket server")
             await self.connection.close()
             self.connected = False
             self._connection_event.clear()
+        await self.stop_workers()
 
     async def wait_for_connection(self, timeout: Optional[float] = None) -> bool:
         """Wait for the WebSocket connection to be established."""
@@ -76,21 +159,65 @@ class WebSocketManager:
         except asyncio.TimeoutError:
             return False
 
-    async def _handle_message(self, message: str) -> None:
-        """Handle incoming WebSocket messages."""
+    async def _catch_up(self) -> None:
+        """Queue payments missed while disconnected ahead of live frames."""
+        try:
+            frames = await self.payment_processor.missed_payments()
+        except Exception as e:
+            self._stats["catch_up_errors"] += 1
+            logger.error(f"Payment catch-up failed: {e}")
+            return
+        for data in frames:
+            await self._enqueue_frame(data)
+        self._stats["caught_up"] += len(frames)
+
+    async def _enqueue(self, message: str) -> None:
+        """Decode a frame and queue it for its wallet's worker."""
         try:
             data = json.loads(message)
-            # Only log debug info if explicitly enabled
-            if config['DEBUG_WEBSOCKET']:
-                logger.debug(f"Raw WebSocket message: {json.dumps(data, indent=2)}")
-            
-            # Process payment data
-            await self.payment_processor.process_payment(data)
-            
         except json.JSONDecodeError:
+            self._stats["decode_errors"] += 1
             logger.error(f"Failed to parse WebSocket message")
-        except Exception as e:
-            logger.error(f"Error handling WebSocket message: {e}")
+            return
+        # Only log debug info if explicitly enabled
+        if config['DEBUG_WEBSOCKET']:
+            logger.debug(f"Raw WebSocket message: {json.dumps(data, indent=2)}")
+        await self._enqueue_frame(data)
+
+    async def _enqueue_frame(self, data: Dict[str, Any]) -> None:
+        payment = data.get('payment') or {}
+        queue = self._queues[hash(payment.get('wallet_id', '')) % len(self._queues)]
+        frame = _Frame(data, time.monotonic())
+        try:
+            queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            if payment.get('amount', 0) < 1000:
+                self._stats["dropped"] += 1
+                logger.warning("Ingest queue full, dropped a balance-only websocket frame")
+                return
+            # Never drop a received payment; stop reading until there is room
+            self._stats["blocked"] += 1
+            start = time.monotonic()
+            await queue.put(frame)
+            self._stats["blocked_seconds_total"] += time.monotonic() - start
+        self._stats["enqueued"] += 1
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        """Process one shard's frames in arrival order."""
+        while True:
+            frame = await queue.get()
+            try:
+                await self.payment_processor.process_payment(frame.data)
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.error(f"Error handling WebSocket message: {e}")
+            finally:
+                lag = time.monotonic() - frame.enqueued_at
+                self._stats["processed"] += 1
+                self._stats["lag_seconds_total"] += lag
+                self._stats["last_lag_seconds"] = lag
+                self._stats["max_lag_seconds"] = max(self._stats["max_lag_seconds"], lag)
+                queue.task_done()
 
     async def broadcast(self, message: str) -> None:
         """Broadcast a message to all connected clients."""
@@ -0,0 +1,59 @@
+import asyncio
+from services.balance_service import BalanceService
+
+class FakeLNbits:
+    def __init__(self, balance_msat=0):
+        self.balance_msat = balance_msat
+        self.calls = 0
+
+    async def get_balance(self, force_refresh: bool = False):
+        self.calls += 1
+        return self.balance_msat
+
+def test_websocket_balance_is_served_without_upstream_calls():
+    async def run():
+        lnbits = FakeLNbits(balance_msat=5_000_000)
+        service = BalanceService(lnbits, reconcile_interval=60)
+        service.update_from_websocket(1234)
+        snapshots = [await service.snapshot() for _ in range(3)]
+        return lnbits.calls, snapshots
+
+    calls, snapshots = asyncio.run(run())
+    assert calls == 0
+    assert snapshots[-1]["balance"] == 1_234_000
+    assert snapshots[-1]["balance_sats"] == 1234
+    assert snapshots[-1]["source"] == "websocket"
+    assert snapshots[-1]["age_seconds"] >= 0
+
+def test_first_read_and_force_refresh_reconcile_with_lnbits():
+    async def run():
+        lnbits = FakeLNbits(balance_msat=2_000_000)
+        service = BalanceService(lnbits, reconcile_interval=60)
+        first = await service.get_balance()
+        service.update_from_websocket(1000)
+        lnbits.balance_msat = 3_000_000
+        forced = await service.get_balance(force_refresh=True)
+        return lnbits.calls, first, forced, service.stats
+
+    calls, first, forced, stats = asyncio.run(run())
+    assert calls == 2
+    assert first == 2_000_000
+    assert forced == 3_000_000
+    assert stats["drift_corrections"] == 1
+    assert stats["source"] == "lnbits"
+
+def test_run_reconciles_only_when_websocket_is_quiet():
+    async def run():
+        lnbits = FakeLNbits(balance_msat=7_000)
+        service = BalanceService(lnbits, reconcile_interval=0.05)
+        service.update_from_websocket(7)
+        task = asyncio.create_task(service.run())
+        await asyncio.sleep(0.01)
+        fresh_calls = lnbits.calls
+        await asyncio.sleep(0.1)
+        task.cancel()
+        return fresh_calls, lnbits.calls
+
+    fresh_calls, later_calls = asyncio.run(run())
+    assert fresh_calls == 0
+    assert later_calls >= 1
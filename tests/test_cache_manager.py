@@ -0,0 +1,177 @@
+import asyncio
+from services.database import DatabaseService
+from services.cache_manager import CacheManager
+
+def test_l1_serves_hot_keys(database_url):
+    async def run():
+        db = DatabaseService(database_url)
+        await db.connect()
+        cache = CacheManager(db, max_entries=10)
+        await cache.set("price", {"usd": 60000}, ttl=60)
+        first = await cache.get("price")
+        # Remove the L2 row; the L1 copy must still answer
+        await db.execute("DELETE FROM cache")
+        second = await cache.get("price")
+        await db.disconnect()
+        return first, second, cache.stats
+
+    first, second, stats = asyncio.run(run())
+    assert first == second == {"usd": 60000}
+    assert stats["l1_hits"] == 2
+    assert stats["l2_hits"] == 0
+
+def test_l2_fallthrough_and_eviction(database_url):
+    async def run():
+        db = DatabaseService(database_url)
+        await db.connect()
+        cache = CacheManager(db, max_entries=2)
+        for i in range(3):
+            await cache.set(f"k{i}", i, ttl=60)
+        # k0 was evicted from L1 but is still in the SQLite table
+        value = await cache.get("k0")
+        missing = await cache.get("absent", default="default")
+        await db.disconnect()
+        return value, missing, cache.stats
+
+    value, missing, stats = asyncio.run(run())
+    assert value == 0
+    assert missing == "default"
+    assert stats["evictions"] >= 1
+    assert stats["l2_hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["l1_size"] == 2
+
+def test_get_many_delete_and_expiry(database_url):
+    async def run():
+        db = DatabaseService(database_url)
+        await db.connect()
+        cache = CacheManager(db, max_entries=1)
+        await cache.set("a", 1, ttl=60)
+        await cache.set("b", 2, ttl=60)
+        await cache.set("expired", 3, ttl=-1)
+        many = await cache.get_many(["a", "b", "expired", "missing"])
+        await cache.delete("a")
+        after_delete = await cache.get("a")
+        await db.disconnect()
+        return many, after_delete
+
+    many, after_delete = asyncio.run(run())
+    assert many == {"a": 1, "b": 2}
+    assert after_delete is None
+
+def test_get_or_load_single_flight(database_url):
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return ["target"]
+
+    async def run():
+        db = DatabaseService(database_url)
+        await db.connect()
+        cache = CacheManager(db)
+        results = await asyncio.gather(*(cache.get_or_load("targets", loader, ttl=60) for _ in range(10)))
+        again = await cache.get_or_load("targets", loader, ttl=60)
+        await db.disconnect()
+        return results, again, cache.stats
+
+    results, again, stats = asyncio.run(run())
+    assert calls == 1
+    assert all(r == ["target"] for r in results)
+    assert again == ["target"]
+    assert stats["coalesced_loads"] == 9
+
+def test_invalidate_tag(database_url):
+    async def run():
+        db = DatabaseService(database_url)
+        await db.connect()
+        cache = CacheManager(db)
+        await cache.set("herd:a", 1, tags=["herd"])
+        await cache.set("herd:b", 2, tags=["herd", "other"])
+        await cache.set("price", 3)
+        await cache.invalidate_tag("herd")
+        # A fresh manager only has L2 to go on
+        fresh = CacheManager(db)
+        result = (
+            await cache.get_many(["herd:a", "herd:b", "price"]),
+            await fresh.get_many(["herd:a", "herd:b", "price"]),
+        )
+        await db.disconnect()
+        return result
+
+    l1_view, l2_view = asyncio.run(run())
+    assert l1_view == {"price": 3}
+    assert l2_view == {"price": 3}
+
+def test_stale_while_revalidate(database_url):
+    values = iter(["old", "new"])
+    release = None
+
+    async def loader():
+        if release is not None:
+            await release.wait()
+        return next(values)
+
+    async def run():
+        nonlocal release
+        db = DatabaseService(database_url)
+        await db.connect()
+        cache = CacheManager(db)
+        first = await cache.get_or_load("key", loader, ttl=0, stale_ttl=60)
+        release = asyncio.Event()
+        stale = await cache.get_or_load("key", loader, ttl=0, stale_ttl=60)
+        release.set()
+        await asyncio.sleep(0.05)
+        refreshed = cache._l1["key"].value
+        await db.disconnect()
+        return first, stale, refreshed, cache.stats
+
+    first, stale, refreshed, stats = asyncio.run(run())
+    assert (first, stale, refreshed) == ("old", "old", "new")
+    assert stats["stale_hits"] == 1
+
+def test_lazy_expiry_on_read(database_url):
+    async def run():
+        db = DatabaseService(database_url)
+        await db.connect()
+        cache = CacheManager(db, max_entries=1)
+        await cache.set("old", 1, ttl=-1, tags=["t"])
+        await cache.set("other", 2, ttl=60)  # pushes "old" out of L1
+        value = await cache.get("old")
+        rows = await db.fetch_all("SELECT key FROM cache")
+        tags = await db.fetch_all("SELECT key FROM cache_tags")
+        await db.disconnect()
+        return value, [r["key"] for r in rows], tags, cache.stats
+
+    value, keys, tags, stats = asyncio.run(run())
+    assert value is None
+    assert keys == ["other"]
+    assert tags == []
+    assert stats["lazy_expired"] == 1
+
+def test_sweep_removes_elapsed_buckets_in_batches(database_url):
+    async def run():
+        db = DatabaseService(database_url)
+        await db.connect()
+        cache = CacheManager(db)
+        cache.sweep_batch = 3
+        for i in range(5):
+            await cache.set(f"gone{i}", i, ttl=-120, tags=["t"])
+        await cache.set("live", "x", ttl=600, tags=["t"])
+        first = await cache.sweep_once()
+        second = await cache.sweep_once()
+        third = await cache.sweep_once()
+        rows = await db.fetch_all("SELECT key FROM cache")
+        tags = await db.fetch_all("SELECT key FROM cache_tags")
+        await db.disconnect()
+        return (first, second, third), rows, tags, cache.stats
+
+    swept, rows, tags, stats = asyncio.run(run())
+    assert swept == (3, 2, 0)
+    assert [r["key"] for r in rows] == ["live"]
+    assert [t["key"] for t in tags] == ["live"]
+    assert stats["swept_rows"] == 5
+    assert stats["sweep_ticks"] == 3
+    assert stats["l1_size"] == 1
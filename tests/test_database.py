@@ -0,0 +1,167 @@
+import asyncio
+from services.database import DatabaseService
+import dependencies
+
+def test_pragmas_applied_on_connect(database_url):
+    async def run():
+        db = DatabaseService(database_url)
+        await db.connect()
+        try:
+            journal = await db.fetch_one("PRAGMA journal_mode")
+            sync = await db.fetch_one("PRAGMA synchronous")
+            busy = await db.fetch_one("PRAGMA busy_timeout")
+            return journal, sync, busy
+        finally:
+            await db.disconnect()
+
+    journal, sync, busy = asyncio.run(run())
+    assert list(journal.values())[0] == "wal"
+    assert list(sync.values())[0] == 1  # NORMAL
+    assert list(busy.values())[0] > 0
+
+def test_connect_is_idempotent(database_url):
+    async def run():
+        db = DatabaseService(database_url)
+        await db.connect()
+        engine = db.engine
+        await db.connect()
+        await db.execute(
+            "INSERT INTO cache (key, value, expires_at) VALUES ('k', '1', 0)"
+        )
+        row = await db.fetch_one("SELECT COUNT(*) AS count FROM cache")
+        await db.disconnect()
+        return engine is db.engine, row["count"]
+
+    same_engine, count = asyncio.run(run())
+    assert same_engine
+    assert count == 1
+
+def test_get_db_does_not_dispose_engine(monkeypatch, database_url):
+    db = DatabaseService(database_url)
+    monkeypatch.setattr(dependencies, "_db", db)
+
+    async def run():
+        first = await dependencies.get_db()
+        engine = first.engine
+        second = await dependencies.get_db()
+        still_connected = second.connected
+        await db.disconnect()
+        return first is second and second.engine is engine and still_connected
+
+    assert asyncio.run(run())
+
+def _member(i):
+    return {
+        "pubkey": f"pubkey{i}",
+        "display_name": f"Goat {i}",
+        "event_id": f"event{i}",
+        "note": "note",
+        "kinds": [9734],
+        "nprofile": "nprofile1",
+        "lud16": f"goat{i}@example.com",
+        "payouts": 0.3,
+        "amount": 21,
+    }
+
+def test_transaction_commits_batch(database_url):
+    async def run():
+        db = DatabaseService(database_url)
+        await db.connect()
+        async with db.transaction():
+            for i in range(3):
+                await db.add_cyber_herd_member(_member(i))
+            await db.update_notified_field("pubkey0", "success")
+        members = await db.get_cyber_herd_members()
+        await db.disconnect()
+        return members
+
+    members = asyncio.run(run())
+    assert len(members) == 3
+    assert {m["pubkey"]: m["notified"] for m in members}["pubkey0"] == "success"
+    assert members[0]["kinds"] == "9734"
+
+def test_transaction_rolls_back_on_error(database_url):
+    async def run():
+        db = DatabaseService(database_url)
+        await db.connect()
+        try:
+            async with db.transaction():
+                await db.add_cyber_herd_member(_member(1))
+                raise RuntimeError("boom")
+        except RuntimeError:
+            pass
+        row = await db.fetch_one("SELECT COUNT(*) AS count FROM cyber_herd")
+        await db.disconnect()
+        return row["count"]
+
+    assert asyncio.run(run()) == 0
+
+def test_execute_many_upserts(database_url):
+    async def run():
+        db = DatabaseService(database_url)
+        await db.connect()
+        await db.add_cyber_herd_members([_member(i) for i in range(5)])
+        renamed = dict(_member(0), display_name="Renamed")
+        await db.add_cyber_herd_members([renamed])
+        rows = await db.fetch_all("SELECT pubkey, display_name FROM cyber_herd")
+        await db.disconnect()
+        return rows
+
+    rows = asyncio.run(run())
+    assert len(rows) == 5
+    assert {r["pubkey"]: r["display_name"] for r in rows}["pubkey0"] == "Renamed"
+
+def test_write_actor_group_commits(database_url):
+    async def run():
+        db = DatabaseService(database_url, write_actor=True)
+        await db.connect()
+        await asyncio.gather(*(db.add_cyber_herd_member(_member(i)) for i in range(20)))
+        row = await db.fetch_one("SELECT COUNT(*) AS count FROM cyber_herd")
+        stats = db.write_stats
+        await db.disconnect()
+        return row["count"], stats
+
+    count, stats = asyncio.run(run())
+    assert count == 20
+    assert stats["statements"] == 20
+    assert stats["batches"] < 20
+
+def test_write_actor_isolates_failed_statement(database_url):
+    async def run():
+        db = DatabaseService(database_url, write_actor=True)
+        await db.connect()
+        insert = "INSERT INTO cache (key, value, expires_at) VALUES (:key, '1', 0)"
+        results = await asyncio.gather(
+            db.execute(insert, {"key": "a"}),
+            db.execute(insert, {"key": "a"}),
+            db.execute(insert, {"key": "b"}),
+            return_exceptions=True
+        )
+        rows = await db.fetch_all("SELECT key FROM cache ORDER BY key")
+        await db.disconnect()
+        return results, [r["key"] for r in rows]
+
+    results, keys = asyncio.run(run())
+    assert isinstance(results[1], Exception)
+    assert keys == ["a", "b"]
+
+def test_write_actor_transaction_and_read_only_reads(database_url):
+    async def run():
+        db = DatabaseService(database_url, write_actor=True)
+        await db.connect()
+        async with db.transaction():
+            await db.add_cyber_herd_member(_member(1))
+            inside = await db.fetch_one("SELECT COUNT(*) AS count FROM cyber_herd")
+        try:
+            await db.fetch_one("DELETE FROM cyber_herd")
+            read_only = False
+        except Exception:
+            read_only = True
+        row = await db.fetch_one("SELECT COUNT(*) AS count FROM cyber_herd")
+        await db.disconnect()
+        return inside["count"], row["count"], read_only
+
+    inside, after, read_only = asyncio.run(run())
+    assert inside == 1
+    assert after == 1
+    assert read_only
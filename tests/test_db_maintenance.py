@@ -0,0 +1,78 @@
+import asyncio
+import sqlite3
+from services.database import DatabaseService
+from services.db_maintenance import DatabaseMaintenanceService
+
+def test_backup_produces_consistent_snapshot(database_url, tmp_path):
+    async def run():
+        db = DatabaseService(database_url)
+        await db.connect()
+        for i in range(50):
+            await db.execute(
+                "INSERT INTO cache (key, value, expires_at) VALUES (:key, 'v', 0)",
+                {"key": f"k{i}"}
+            )
+        maintenance = DatabaseMaintenanceService(db)
+        maintenance.backup_dir = tmp_path / "backups"
+        maintenance.pages_per_step = 1
+        maintenance.step_sleep = 0
+        result = await maintenance.backup()
+        await db.disconnect()
+        return result
+
+    result = asyncio.run(run())
+    assert result["steps"] >= 1
+    conn = sqlite3.connect(result["path"])
+    try:
+        assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+        assert conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] == 50
+    finally:
+        conn.close()
+
+def test_truncate_checkpoint_when_wal_too_large(database_url):
+    async def run():
+        db = DatabaseService(database_url)
+        await db.connect()
+        await db.execute("INSERT INTO cache (key, value, expires_at) VALUES ('k', 'v', 0)")
+        maintenance = DatabaseMaintenanceService(db)
+        maintenance.wal_max_bytes = 1
+        maintenance.backup_interval = 0
+        wal_before = maintenance.wal_size()
+        await maintenance.run_once()
+        stats = maintenance.stats
+        await db.disconnect()
+        return wal_before, stats
+
+    wal_before, stats = asyncio.run(run())
+    assert wal_before > 0
+    assert stats["last_checkpoint"]["mode"] == "TRUNCATE"
+    assert stats["last_checkpoint"]["wal_bytes_after"] == 0
+
+def test_failed_backup_leaves_no_partial_file(database_url, tmp_path):
+    class FailingSource:
+        def backup(self, target, **kwargs):
+            target.execute("CREATE TABLE half_written (x)")
+            raise sqlite3.OperationalError("disk I/O error")
+
+        def close(self):
+            pass
+
+    backups = tmp_path / "backups"
+    backups.mkdir()
+
+    async def run():
+        db = DatabaseService(database_url)
+        await db.connect()
+        maintenance = DatabaseMaintenanceService(db)
+        maintenance._connect = FailingSource
+        try:
+            await maintenance.backup(backups / "snapshot.db")
+        except sqlite3.OperationalError:
+            pass
+        stats = maintenance.stats
+        await db.disconnect()
+        return stats
+
+    stats = asyncio.run(run())
+    assert stats["backup_failures"] == 1
+    assert list(backups.iterdir()) == []
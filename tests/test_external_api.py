@@ -0,0 +1,109 @@
+import asyncio
+import httpx
+from services.external_api import ExternalAPIService
+
+def make_api(handler):
+    api = ExternalAPIService()
+    api.openhab_url = "http://openhab.test"
+    api._clients["openhab"] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return api
+
+def test_concurrent_reads_share_one_request():
+    requests = []
+
+    async def run():
+        async def slow_price():
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, text="60000.5")
+
+        def handler(request):
+            requests.append(request.url.path)
+            return slow_price()
+
+        api = make_api(handler)
+        prices = await asyncio.gather(*(api.fetch_btc_price() for _ in range(10)))
+        # Served from the micro-TTL without another request
+        again = await api.fetch_btc_price()
+        await api.close()
+        return prices, again, api.coalescing_stats["fetch_btc_price"]
+
+    prices, again, stats = asyncio.run(run())
+    assert prices == [60000.5] * 10
+    assert again == 60000.5
+    assert requests == ["/rest/items/BTC_Price_Output/state"]
+    assert stats == {"calls": 11, "upstream_calls": 1, "coalesced": 9, "micro_ttl_hits": 1}
+
+def test_force_refresh_skips_micro_ttl():
+    states = iter(["100", "250"])
+
+    async def run():
+        api = make_api(lambda request: httpx.Response(200, text=next(states)))
+        first = await api.get_goat_sats_sum_today()
+        cached = await api.get_goat_sats_sum_today()
+        fresh = await api.get_goat_sats_sum_today(force_refresh=True)
+        await api.close()
+        return first, cached, fresh, api.coalescing_stats["get_goat_sats_sum_today"]
+
+    first, cached, fresh, stats = asyncio.run(run())
+    assert first == cached == {"sum_goat_sats": 100}
+    assert fresh == {"sum_goat_sats": 250}
+    assert stats["upstream_calls"] == 2
+    assert stats["micro_ttl_hits"] == 1
+
+def test_upstream_failures_reach_the_breaker():
+    import pytest
+    from fastapi import HTTPException
+
+    async def run():
+        def lnbits_down(request):
+            raise httpx.ConnectError("down")
+
+        api = make_api(lambda request: httpx.Response(503))
+        api._clients["lnbits"] = httpx.AsyncClient(transport=httpx.MockTransport(lnbits_down))
+        for policy in api._policies.values():
+            policy.backoff_base = policy.backoff_max = 0.001
+        with pytest.raises(HTTPException) as balance_error:
+            await api.get_balance()
+        with pytest.raises(HTTPException) as goat_sats_error:
+            await api.get_goat_sats_sum_today()
+        await api.close()
+        return (
+            balance_error.value.status_code, goat_sats_error.value.status_code,
+            api._policies["lnbits"].stats, api._policies["openhab"].stats
+        )
+
+    balance_status, goat_sats_status, lnbits, openhab = asyncio.run(run())
+    assert balance_status == 502 and goat_sats_status == 502
+    assert lnbits["failures"] >= 1 and lnbits["retries"] >= 1
+    assert openhab["failures"] >= 1 and openhab["retries"] >= 1
+
+def test_reset_targets_checks_the_delete_and_retries_only_the_put():
+    import pytest
+
+    async def run():
+        sent = []
+        responses = {"DELETE": [httpx.Response(500), httpx.Response(204)],
+                     "PUT": [httpx.Response(503), httpx.Response(200, json={"targets": []})]}
+
+        def handler(request):
+            sent.append(request.method)
+            return responses[request.method].pop(0)
+
+        api = ExternalAPIService()
+        api.lnbits_url = "http://lnbits.test"
+        api._clients["lnbits"] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        policy = api._policies["lnbits"]
+        policy.backoff_base = policy.backoff_max = 0.001
+        policy.max_retries = 0
+        with pytest.raises(httpx.HTTPStatusError):
+            await api.reset_cyberherd_targets()
+        failed_delete = list(sent)
+        policy.max_retries = 2
+        result = await api.reset_cyberherd_targets()
+        await api.close()
+        return failed_delete, sent[len(failed_delete):], result
+
+    failed_delete, retried, result = asyncio.run(run())
+    assert failed_delete == ["DELETE"]
+    assert retried == ["DELETE", "PUT", "PUT"]
+    assert result == {"targets": []}
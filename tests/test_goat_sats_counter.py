@@ -0,0 +1,67 @@
+import asyncio
+from services.goat_sats_counter import GoatSatsCounter
+
+class FakeOpenHAB:
+    def __init__(self, state=0, put_delay=0.0):
+        self.state = state
+        self.put_delay = put_delay
+        self.puts = []
+
+    async def get_goat_sats_sum_today(self, force_refresh: bool = False):
+        return {"sum_goat_sats": self.state}
+
+    async def set_goat_sats(self, new_state: int):
+        await asyncio.sleep(self.put_delay)
+        self.puts.append(new_state)
+        self.state = new_state
+        return new_state
+
+def test_increments_are_local_and_flushed_in_one_put():
+    async def run():
+        openhab = FakeOpenHAB(state=1000)
+        counter = GoatSatsCounter(openhab, flush_interval=60)
+        await counter.reconcile()
+        values = [counter.increment(sats) for sats in (10, 20, 30)]
+        flushed = await counter.flush()
+        idle = await counter.flush()
+        return values, flushed, idle, openhab.puts, counter.stats
+
+    values, flushed, idle, puts, stats = asyncio.run(run())
+    assert values == [1010, 1030, 1060]
+    assert flushed and not idle
+    assert puts == [1060]
+    assert stats["pending"] == 0
+
+def test_increment_during_flush_stays_pending():
+    async def run():
+        openhab = FakeOpenHAB(state=0, put_delay=0.02)
+        counter = GoatSatsCounter(openhab, flush_interval=60)
+        await counter.reconcile()
+        counter.increment(5)
+        flush = asyncio.create_task(counter.flush())
+        await asyncio.sleep(0.01)
+        counter.increment(7)
+        await flush
+        pending = counter.stats["pending"]
+        await counter.close()
+        return pending, openhab.puts
+
+    pending, puts = asyncio.run(run())
+    assert pending == 7
+    assert puts == [5, 12]
+
+def test_reconcile_keeps_unflushed_increments():
+    async def run():
+        openhab = FakeOpenHAB(state=500)
+        counter = GoatSatsCounter(openhab, flush_interval=60)
+        await counter.reconcile()
+        counter.increment(25)
+        # OpenHAB was reset for the new day before the flush went out
+        openhab.state = 0
+        value = await counter.reconcile()
+        await counter.close()
+        return value, openhab.puts
+
+    value, puts = asyncio.run(run())
+    assert value == 25
+    assert puts == [25]
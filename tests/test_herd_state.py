@@ -0,0 +1,153 @@
+import asyncio
+from services.database import DatabaseService
+from services.herd_state import HerdState
+
+def _member(i, lud16=None):
+    return {
+        "pubkey": f"pubkey{i}",
+        "display_name": f"Goat {i}",
+        "event_id": f"event{i}",
+        "note": "note",
+        "kinds": "9734",
+        "nprofile": "nprofile1",
+        "lud16": lud16 or f"goat{i}@example.com",
+        "payouts": 0.3,
+        "amount": 21,
+    }
+
+def test_lookups_and_size(database_url):
+    async def run():
+        db = DatabaseService(database_url)
+        state = HerdState(db, max_size=5)
+        await state.load()
+        await state.add_members([_member(1), _member(2, lud16="shared@example.com")])
+        await state.add_member(_member(3, lud16="shared@example.com"))
+        result = (
+            state.size,
+            state.spots_remaining,
+            state.get_by_event_id("event2")["pubkey"],
+            sorted(m["pubkey"] for m in state.get_by_lud16("shared@example.com")),
+        )
+        await db.disconnect()
+        return result
+
+    size, spots, by_event, by_lud16 = asyncio.run(run())
+    assert size == 3
+    assert spots == 2
+    assert by_event == "pubkey2"
+    assert by_lud16 == ["pubkey2", "pubkey3"]
+
+def test_writes_go_through_to_database(database_url):
+    async def run():
+        db = DatabaseService(database_url)
+        state = HerdState(db)
+        await state.load()
+        await state.add_members([_member(1), _member(2)])
+        await state.update_member("pubkey1", {"payouts": 0.2, "amount": 100})
+        await state.set_notified("pubkey1", "success")
+        await state.remove_by_lud16("goat2@example.com")
+
+        reloaded = HerdState(db)
+        await reloaded.load()
+        result = (reloaded.size, reloaded.get("pubkey1"), state.get("pubkey1"))
+        await db.disconnect()
+        return result
+
+    size, from_db, in_memory = asyncio.run(run())
+    assert size == 1
+    assert from_db == in_memory
+    assert from_db["notified"] == "success"
+    assert abs(from_db["payouts"] - 0.5) < 1e-9
+
+def test_upsert_moves_indexes(database_url):
+    async def run():
+        db = DatabaseService(database_url)
+        state = HerdState(db)
+        await state.load()
+        await state.add_member(_member(1))
+        await state.add_member(dict(_member(1), event_id="new_event"))
+        result = (state.get_by_event_id("event1"), state.get_by_event_id("new_event"), state.size)
+        await state.clear()
+        result += (state.size,)
+        await db.disconnect()
+        return result
+
+    old, new, size, cleared = asyncio.run(run())
+    assert old is None
+    assert new["pubkey"] == "pubkey1"
+    assert size == 1
+    assert cleared == 0
+
+def test_staged_changes_wait_for_commit_without_blocking_other_writes(database_url):
+    async def run():
+        db = DatabaseService(database_url, write_actor=True)
+        state = HerdState(db)
+        await state.load()
+        await state.add_member(_member(1))
+        staged = []
+        async with db.transaction():
+            await state.add_member(_member(2), staged=staged)
+            await state.update_member("pubkey1", {"payouts": 0.2, "amount": 5}, staged=staged)
+            uncommitted = (state.size, state.get("pubkey1")["payouts"])
+            # Waits for the transaction's writer lease, but must not hold the herd lock meanwhile
+            notified = asyncio.create_task(state.set_notified("pubkey1", "success"))
+            await asyncio.sleep(0.05)
+        await state.apply(staged)
+        await asyncio.wait_for(notified, 5)
+        result = uncommitted, state.size, state.get("pubkey1")
+        await db.disconnect()
+        return result
+
+    uncommitted, size, member = asyncio.run(run())
+    assert uncommitted == (1, 0.3)
+    assert size == 2
+    assert abs(member["payouts"] - 0.5) < 1e-9
+    assert member["notified"] == "success"
+
+def test_concurrent_batches_cannot_overfill_the_herd(database_url, monkeypatch):
+    import services.cyberherd_manager as cyberherd_manager
+    import services.member_processor as member_processor
+    from services.cyberherd_manager import CyberHerdManager
+    from services.member_processor import MemberProcessor
+    monkeypatch.setattr(cyberherd_manager, "MAX_HERD_SIZE", 3)
+    monkeypatch.setattr(member_processor, "MAX_HERD_SIZE", 3)
+
+    class Notifier:
+        async def send_cyberherd_notification(self, member, difference, spots_remaining):
+            pass
+
+    async def run():
+        db = DatabaseService(database_url)
+        state = HerdState(db, max_size=3)
+        await state.load()
+        manager = CyberHerdManager(db, None, Notifier(), state)
+        processor = MemberProcessor(db, Notifier(), manager, state)
+        batches = [[_member(i) for i in range(start, start + 3)] for start in (0, 10)]
+        await asyncio.gather(*(processor.process_members(batch) for batch in batches))
+        rows = await db.get_cyber_herd_members()
+        result = state.size, len(rows)
+        await db.disconnect()
+        return result
+
+    assert asyncio.run(run()) == (3, 3)
+
+def test_clear_cannot_land_between_a_write_and_memory(database_url):
+    async def run():
+        db = DatabaseService(database_url)
+        state = HerdState(db)
+        await state.load()
+        insert = db.add_cyber_herd_member
+
+        async def slow_insert(member):
+            await insert(member)
+            await asyncio.sleep(0.02)  # room for clear() to run before memory changes
+
+        db.add_cyber_herd_member = slow_insert
+        await asyncio.gather(state.add_member(_member(1)), state.clear())
+        rows = await db.get_cyber_herd_members()
+        result = sorted(m["pubkey"] for m in state.members()), sorted(r["pubkey"] for r in rows)
+        await db.disconnect()
+        return result
+
+    in_memory, in_database = asyncio.run(run())
+    assert in_memory == in_database
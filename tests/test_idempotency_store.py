@@ -0,0 +1,86 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from services.idempotency_store import IdempotencyStore
+
+def counting_call(delay=0.0, fail=False):
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        if fail:
+            raise HTTPException(status_code=500, detail="upstream failed")
+        return {"payment_request": f"lnbc{len(calls)}"}
+
+    return fn, calls
+
+def test_retry_with_same_key_replays_response():
+    async def run():
+        store = IdempotencyStore(ttl=60, max_entries=10)
+        fn, calls = counting_call()
+        first = await store.run("POST /payment", "k1", (100, "memo"), fn)
+        retry = await store.run("POST /payment", "k1", (100, "memo"), fn)
+        other = await store.run("POST /payment", "k2", (100, "memo"), fn)
+        return first, retry, other, len(calls)
+
+    first, retry, other, calls = asyncio.run(run())
+    assert first == ({"payment_request": "lnbc1"}, False)
+    assert retry == ({"payment_request": "lnbc1"}, True)
+    assert other == ({"payment_request": "lnbc2"}, False)
+    assert calls == 2
+
+def test_concurrent_duplicates_wait_for_first_request():
+    async def run():
+        store = IdempotencyStore(ttl=60, max_entries=10)
+        fn, calls = counting_call(delay=0.02)
+        results = await asyncio.gather(*(store.run("POST /payment", "k", (1, "m"), fn) for _ in range(5)))
+        return results, len(calls), store.stats
+
+    results, calls, stats = asyncio.run(run())
+    assert calls == 1
+    assert {r[0]["payment_request"] for r in results} == {"lnbc1"}
+    assert [r[1] for r in results].count(False) == 1
+    assert stats["joined"] == 4
+
+def test_key_reuse_with_different_parameters_is_rejected():
+    async def run():
+        store = IdempotencyStore(ttl=60, max_entries=10)
+        fn, _ = counting_call()
+        await store.run("POST /payment", "k", (100, "memo"), fn)
+        await store.run("POST /payment", "k", (200, "memo"), fn)
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(run())
+    assert exc.value.status_code == 422
+
+def test_failures_are_not_stored_and_entries_expire():
+    async def run():
+        store = IdempotencyStore(ttl=0.01, max_entries=10)
+        failing, failed_calls = counting_call(fail=True)
+        with pytest.raises(HTTPException):
+            await store.run("POST /payment/reset", "k", (), failing)
+        fn, calls = counting_call()
+        await store.run("POST /payment/reset", "k", (), fn)
+        await asyncio.sleep(0.02)
+        _, replayed = await store.run("POST /payment/reset", "k", (), fn)
+        return len(failed_calls), len(calls), replayed
+
+    failed_calls, calls, replayed = asyncio.run(run())
+    assert failed_calls == 1
+    assert calls == 2
+    assert replayed is False
+
+def test_store_is_bounded():
+    async def run():
+        store = IdempotencyStore(ttl=60, max_entries=2)
+        fn, calls = counting_call()
+        for key in ("a", "b", "c"):
+            await store.run("POST /payment", key, (), fn)
+        _, replayed = await store.run("POST /payment", "a", (), fn)
+        return store.stats["entries"], replayed, len(calls)
+
+    entries, replayed, calls = asyncio.run(run())
+    assert entries == 2
+    assert replayed is False
+    assert calls == 4
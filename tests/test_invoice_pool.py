@@ -0,0 +1,100 @@
+import asyncio
+from services.invoice_pool import InvoicePool
+
+MEMO = "Lightning Goats Payment"
+
+class FakeLNbits:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.created = []
+
+    async def create_invoice(self, amount: int, memo: str, key: str, expiry=None):
+        await asyncio.sleep(self.delay)
+        self.created.append((amount, memo, expiry))
+        return f"lnbc{amount}n{len(self.created)}"
+
+def make_pool(lnbits, **kwargs):
+    options = dict(amounts=[1000], size=2, expiry=3600, retire_margin=600, refill_interval=60, memo=MEMO)
+    options.update(kwargs)
+    return InvoicePool(lnbits, **options)
+
+def test_pooled_amount_is_served_without_waiting():
+    async def run():
+        lnbits = FakeLNbits()
+        pool = make_pool(lnbits)
+        await pool.refill(1000)
+        before = len(lnbits.created)
+        first = await pool.get_invoice(1000, MEMO)
+        second = await pool.get_invoice(1000, MEMO)
+        calls_at_handout = len(lnbits.created)
+        await asyncio.sleep(0.01)  # background refill
+        return before, first, second, calls_at_handout, pool.stats, lnbits.created
+
+    before, first, second, calls_at_handout, stats, created = asyncio.run(run())
+    assert before == 2 and calls_at_handout == 2
+    assert first != second
+    assert stats["hits"] == 2
+    assert stats["ready"][1000] == 2
+    assert created[0] == (1000, MEMO, 3600)
+
+def test_other_amounts_and_memos_bypass_the_pool():
+    async def run():
+        lnbits = FakeLNbits()
+        pool = make_pool(lnbits)
+        await pool.refill(1000)
+        await pool.get_invoice(500, MEMO)
+        await pool.get_invoice(1000, "custom memo")
+        return pool.stats, lnbits.created[-2:]
+
+    stats, created = asyncio.run(run())
+    assert stats["hits"] == 0 and stats["misses"] == 0
+    assert created == [(500, MEMO, None), (1000, "custom memo", None)]
+
+def test_empty_pool_is_a_miss_that_creates_directly():
+    async def run():
+        lnbits = FakeLNbits()
+        pool = make_pool(lnbits)
+        payment_request = await pool.get_invoice(1000, MEMO)
+        await asyncio.sleep(0.01)
+        return payment_request, pool.stats
+
+    payment_request, stats = asyncio.run(run())
+    assert payment_request.startswith("lnbc1000")
+    assert stats["misses"] == 1
+    assert stats["ready"][1000] == 2
+
+def test_invoices_near_expiry_are_retired():
+    async def run():
+        lnbits = FakeLNbits()
+        pool = make_pool(lnbits, expiry=1, retire_margin=0.5)
+        await pool.refill(1000)
+        await asyncio.sleep(0.6)
+        taken = pool.take(1000, MEMO)
+        return taken, pool.stats
+
+    taken, stats = asyncio.run(run())
+    assert taken is None
+    assert stats["retired"] == 2
+
+def test_only_the_direct_miss_queues_as_a_payment():
+    from utils.resilience import Priority, effective_priority
+
+    class RecordingLNbits(FakeLNbits):
+        def __init__(self):
+            super().__init__()
+            self.priorities = []
+
+        async def create_invoice(self, amount, memo, key, expiry=None):
+            # What @resilient would queue create_invoice's PAYMENT default at
+            self.priorities.append(effective_priority(Priority.PAYMENT))
+            return await super().create_invoice(amount, memo, key, expiry)
+
+    async def run():
+        lnbits = RecordingLNbits()
+        pool = make_pool(lnbits)
+        await pool.get_invoice(1000, MEMO)  # miss: direct create, then a refill
+        await asyncio.sleep(0.01)
+        return lnbits.priorities
+
+    priorities = asyncio.run(run())
+    assert priorities == [Priority.PAYMENT, Priority.BACKGROUND, Priority.BACKGROUND]
@@ -0,0 +1,92 @@
+import asyncio
+from services.lnurl_cache import LnurlCache
+from utils.cyberherd_module import Verifier
+
+SCAN = {
+    "callback": "https://example.com/lnurlp/cb",
+    "minSendable": 1000,
+    "maxSendable": 100000000,
+    "description_hash": "abc",
+    "commentAllowed": 255,
+    "allowsNostr": True,
+    "nostrPubkey": "npub",
+    "metadata": "[[\"text/plain\", \"goat\"]]",
+}
+
+class FakeScanner:
+    def __init__(self):
+        self.scans = []
+
+    async def __call__(self, lud16: str):
+        self.scans.append(lud16)
+        await asyncio.sleep(0.01)
+        if lud16.startswith("bad"):
+            raise RuntimeError("404")
+        return SCAN
+
+def test_scans_are_cached_and_shared():
+    async def run():
+        scanner = FakeScanner()
+        cache = LnurlCache(scanner, ttl=60, negative_ttl=60, max_entries=10)
+        warmed = await cache.warm(["goat@example.com", "goat@example.com", "bad@example.com"])
+        params = await asyncio.gather(*(cache.get("goat@example.com") for _ in range(3)))
+        verified = await Verifier.verify_lud16("goat@example.com", cache)
+        rejected = await Verifier.verify_lud16("bad@example.com", cache)
+        return warmed, params, verified, rejected, scanner.scans, cache.stats
+
+    warmed, params, verified, rejected, scans, stats = asyncio.run(run())
+    assert warmed == 1
+    assert params[0]["callback"] == SCAN["callback"]
+    assert "metadata" not in params[0]
+    assert verified and not rejected
+    assert sorted(scans) == ["bad@example.com", "goat@example.com"]
+    assert stats["hits"] == 4
+    assert stats["negative_hits"] == 1
+
+def test_invalidate_and_expiry_rescan():
+    async def run():
+        scanner = FakeScanner()
+        cache = LnurlCache(scanner, ttl=60, negative_ttl=0.001, max_entries=10)
+        await cache.get("goat@example.com")
+        cache.invalidate("goat@example.com")
+        await cache.get("goat@example.com")
+        await cache.get("bad@example.com")
+        await asyncio.sleep(0.01)
+        await cache.get("bad@example.com")
+        return scanner.scans
+
+    assert asyncio.run(run()) == [
+        "goat@example.com", "goat@example.com", "bad@example.com", "bad@example.com"
+    ]
+
+def test_upstream_failures_are_not_negative_cached():
+    import httpx
+    import pytest
+
+    class FlakyScanner(FakeScanner):
+        def __init__(self):
+            super().__init__()
+            self.down = True
+
+        async def __call__(self, lud16: str):
+            self.scans.append(lud16)
+            if self.down:
+                raise httpx.ConnectError("LNbits down")
+            return SCAN
+
+    async def run():
+        scanner = FlakyScanner()
+        cache = LnurlCache(scanner, ttl=60, negative_ttl=60, max_entries=10)
+        warmed = await cache.warm(["goat@example.com"])
+        with pytest.raises(httpx.ConnectError):
+            await cache.get("goat@example.com")
+        scanner.down = False
+        params = await cache.get("goat@example.com")
+        return warmed, params, scanner.scans, cache.stats
+
+    warmed, params, scans, stats = asyncio.run(run())
+    assert warmed == 0
+    assert params["callback"] == SCAN["callback"]
+    assert len(scans) == 3
+    assert stats["upstream_errors"] == 2
+    assert stats["negative_hits"] == 0
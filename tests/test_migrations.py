@@ -0,0 +1,45 @@
+import asyncio
+import pytest
+from services.database import DatabaseService
+from services.migrations import LATEST_VERSION, apply_migrations, get_schema_version
+
+HOT_QUERIES = [
+    ("SELECT * FROM cyber_herd WHERE event_id = 'x'", "idx_cyber_herd_event_id"),
+    ("SELECT * FROM cyber_herd WHERE lud16 = 'a@b'", "idx_cyber_herd_lud16"),
+    ("DELETE FROM cyber_herd WHERE lud16 = 'a@b'", "idx_cyber_herd_lud16"),
+    ("SELECT rowid, key FROM cache WHERE bucket < 0 LIMIT 10", "idx_cache_bucket"),
+]
+
+def _query_plans(database_url):
+    async def run():
+        db = DatabaseService(database_url)
+        await db.connect()
+        try:
+            plans = {}
+            for query, _ in HOT_QUERIES:
+                rows = await db.fetch_all(f"EXPLAIN QUERY PLAN {query}")
+                plans[query] = " ".join(row["detail"] for row in rows)
+            return plans
+        finally:
+            await db.disconnect()
+
+    return asyncio.run(run())
+
+@pytest.mark.parametrize("query,index", HOT_QUERIES)
+def test_hot_queries_use_index(database_url, query, index):
+    plans = _query_plans(database_url)
+    assert f"USING INDEX {index}" in plans[query]
+
+def test_migrations_apply_once(database_url):
+    async def run():
+        db = DatabaseService(database_url)
+        await db.connect()
+        first = await get_schema_version(db.engine)
+        second = await apply_migrations(db.engine)
+        rows = await db.fetch_all("SELECT version FROM schema_version")
+        await db.disconnect()
+        return first, second, rows
+
+    first, second, rows = asyncio.run(run())
+    assert first == second == LATEST_VERSION
+    assert len(rows) == LATEST_VERSION
@@ -0,0 +1,132 @@
+import asyncio
+import json
+from services.external_api import ExternalAPIService
+from services.openhab_mirror import OpenHABMirror, parse_item_event
+from services.price_service import PriceService
+
+class FakeOpenHAB:
+    """Minimal OpenHAB: /rest/items as JSON and /rest/events as SSE."""
+
+    def __init__(self, states, stream=True):
+        self.states = dict(states)
+        self.stream = stream
+        self.streams = []
+        self.item_reads = 0
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                path = head.split(b" ")[1].decode()
+                if path.startswith("/rest/items"):
+                    self.item_reads += 1
+                    body = json.dumps([{"name": k, "state": v} for k, v in self.states.items()]).encode()
+                    writer.write(
+                        b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                        b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body
+                    )
+                    await writer.drain()
+                elif path.startswith("/rest/events") and self.stream:
+                    writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nConnection: close\r\n\r\n")
+                    await writer.drain()
+                    queue = asyncio.Queue()
+                    self.streams.append(queue)
+                    while (event := await queue.get()) is not None:
+                        writer.write(f"event: message\ndata: {json.dumps(event)}\n\n".encode())
+                        await writer.drain()
+                    break
+                else:
+                    writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n")
+                    await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    async def push(self, item, value):
+        self.states[item] = value
+        payload = json.dumps({"type": "Decimal", "value": value, "oldType": "Decimal", "oldValue": "0"})
+        await self.streams[-1].put({
+            "topic": f"openhab/items/{item}/statechanged",
+            "payload": payload,
+            "type": "ItemStateChangedEvent",
+        })
+
+async def wait_for(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not met"
+        await asyncio.sleep(0.01)
+
+async def start(fake):
+    server = await asyncio.start_server(fake.handle, "127.0.0.1", 0)
+    api = ExternalAPIService()
+    api.openhab_url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+    return server, api
+
+def test_parse_item_event():
+    data = json.dumps({
+        "topic": "openhab/items/GoatSats/statechanged",
+        "payload": json.dumps({"type": "Decimal", "value": "1234"}),
+        "type": "ItemStateChangedEvent",
+    })
+    assert parse_item_event(data) == ("GoatSats", "1234")
+    assert parse_item_event(json.dumps({"type": "ItemAddedEvent"})) is None
+    assert parse_item_event("not json") is None
+
+def test_stream_mirrors_items_and_resyncs_on_reconnect():
+    async def run():
+        fake = FakeOpenHAB({"FeederOverride": "OFF", "GoatSats": "100", "BTC_Price_Output": "60000"})
+        server, api = await start(fake)
+        mirror = OpenHABMirror(api, poll_interval=0.05, stream_retry=0.2)
+        mirror.reconnect_delay = 0.01
+        prices = PriceService(api, mirror=mirror)
+        mirror.start()
+        await wait_for(lambda: mirror.live)
+        initial = (await mirror.feeder_override(), mirror.get("GoatSats"))
+
+        await fake.push("BTC_Price_Output", "61000")
+        await fake.push("FeederOverride", "ON")
+        await wait_for(lambda: mirror.get("FeederOverride") == "ON")
+        quote = await prices.quote()
+
+        # Server drops the stream; the mirror reconnects and resyncs
+        fake.states["GoatSats"] = "250"
+        await fake.streams[-1].put(None)
+        await wait_for(lambda: len(fake.streams) == 2 and mirror.live)
+        await wait_for(lambda: mirror.get("GoatSats") == "250")
+
+        await mirror.stop()
+        for queue in fake.streams:
+            await queue.put(None)
+        await api.close()
+        server.close()
+        return initial, quote, mirror.stats, fake.item_reads
+
+    initial, quote, stats, item_reads = asyncio.run(run())
+    assert initial == (False, "100")
+    assert quote["price"] == 61000.0
+    assert quote["age_seconds"] == 0.0
+    assert stats["events"] == 2
+    assert stats["stream_connects"] == 2
+    assert item_reads == 2
+
+def test_falls_back_to_polling_without_stream():
+    async def run():
+        fake = FakeOpenHAB({"FeederOverride": "ON", "GoatSats": "5", "BTC_Price_Output": "NULL"}, stream=False)
+        server, api = await start(fake)
+        mirror = OpenHABMirror(api, poll_interval=0.05, stream_retry=10)
+        mirror.start()
+        await wait_for(lambda: mirror.stats["polls"] >= 2)
+        override = await mirror.feeder_override()
+        price = mirror.get("BTC_Price_Output")
+        await mirror.stop()
+        await api.close()
+        server.close()
+        return override, price, mirror.stats
+
+    override, price, stats = asyncio.run(run())
+    assert override is True
+    assert price is None  # NULL items are reported as unknown
+    assert stats["stream_errors"] == 1
+    assert not stats["live"]
@@ -0,0 +1,79 @@
+import asyncio
+from services.database import DatabaseService
+from services.payment_processor import CHECKPOINT_WALLET, PaymentProcessor
+
+def payment(hash_, time_, amount=2000_000, **extra):
+    return {"payment_hash": hash_, "time": time_, "amount": amount, "pending": False, **extra}
+
+class FakeLNbits:
+    def __init__(self, payments):
+        self.payments = payments  # newest first, like LNbits
+        self.pages = []
+
+    async def get_payments(self, key, limit, offset=0):
+        self.pages.append(offset)
+        return self.payments[offset:offset + limit]
+
+class FakeBalance:
+    async def get_balance(self, force_refresh=False):
+        return 9_000_000
+
+def make_processor(db, lnbits):
+    return PaymentProcessor(lnbits, None, db, None, None, FakeBalance(), None)
+
+def test_checkpoint_only_moves_forward(database_url):
+    async def run():
+        db = DatabaseService(database_url)
+        await db.connect()
+        try:
+            await db.set_payment_checkpoint(CHECKPOINT_WALLET, 200, "b")
+            await db.set_payment_checkpoint(CHECKPOINT_WALLET, 100, "a")
+            return await db.get_payment_checkpoint(CHECKPOINT_WALLET)
+        finally:
+            await db.disconnect()
+
+    checkpoint = asyncio.run(run())
+    assert checkpoint == {"payment_time": 200, "payment_hash": "b"}
+
+def test_missed_payments_pages_back_to_checkpoint(database_url, monkeypatch):
+    from config import config
+    monkeypatch.setitem(config, "PAYMENT_CATCHUP_PAGE_SIZE", 2)
+
+    async def run():
+        db = DatabaseService(database_url)
+        await db.connect()
+        try:
+            await db.set_payment_checkpoint(CHECKPOINT_WALLET, 100, "seen")
+            lnbits = FakeLNbits([
+                payment("new2", 130),
+                payment("new1", "1970-01-01T00:02:00"),
+                payment("pending", 115, pending=True),
+                payment("outgoing", 110, amount=-5000),
+                payment("same-second", 100),
+                payment("seen", 100),
+                payment("old", 90),
+            ])
+            frames = await make_processor(db, lnbits).missed_payments()
+            return frames, lnbits.pages
+        finally:
+            await db.disconnect()
+
+    frames, pages = asyncio.run(run())
+    assert [f["payment"]["payment_hash"] for f in frames] == ["same-second", "new1", "new2"]
+    assert "wallet_balance" not in frames[0]
+    assert frames[-1]["wallet_balance"] == 9000
+    assert pages == [0, 2, 4, 6]
+
+def test_no_checkpoint_means_no_catch_up(database_url):
+    async def run():
+        db = DatabaseService(database_url)
+        await db.connect()
+        try:
+            lnbits = FakeLNbits([payment("a", 1)])
+            frames = await make_processor(db, lnbits).missed_payments()
+            return frames, lnbits.pages
+        finally:
+            await db.disconnect()
+
+    frames, pages = asyncio.run(run())
+    assert frames == [] and pages == []
@@ -0,0 +1,178 @@
+import asyncio
+from services.database import DatabaseService
+from services.payment_dedup import PaymentDeduplicator
+from services.payment_processor import PaymentProcessor
+
+def test_repeat_hashes_are_suppressed(database_url):
+    async def run():
+        db = DatabaseService(database_url)
+        await db.connect()
+        try:
+            dedup = PaymentDeduplicator(db, max_entries=10)
+            results = [await dedup.first_seen(h) for h in ("a", "b", "a", "a")]
+            return results, dedup.stats
+        finally:
+            await db.disconnect()
+
+    results, stats = asyncio.run(run())
+    assert results == [True, True, False, False]
+    assert stats["accepted"] == 2
+    assert stats["suppressed"] == 2
+
+def test_concurrent_duplicates_accept_exactly_one(database_url):
+    async def run():
+        db = DatabaseService(database_url)
+        await db.connect()
+        try:
+            dedup = PaymentDeduplicator(db, max_entries=10)
+            return await asyncio.gather(*(dedup.first_seen("h") for _ in range(5)))
+        finally:
+            await db.disconnect()
+
+    assert sorted(asyncio.run(run())) == [False] * 4 + [True]
+
+def test_table_catches_hashes_evicted_or_from_before_restart(database_url):
+    async def run():
+        db = DatabaseService(database_url)
+        await db.connect()
+        try:
+            first = PaymentDeduplicator(db, max_entries=1)
+            await first.first_seen("a")
+            await first.first_seen("b")  # evicts "a" from the LRU
+            evicted = await first.first_seen("a")
+            restarted = PaymentDeduplicator(db, max_entries=10)
+            await restarted.load()
+            after_restart = await restarted.first_seen("b")
+            return evicted, after_restart, first.stats["persisted_hits"]
+        finally:
+            await db.disconnect()
+
+    evicted, after_restart, persisted_hits = asyncio.run(run())
+    assert evicted is False and after_restart is False
+    assert persisted_hits == 1
+
+def test_earlier_days_are_pruned(database_url):
+    async def run():
+        db = DatabaseService(database_url)
+        await db.connect()
+        try:
+            await db.execute(
+                "INSERT INTO seen_payments (payment_hash, day, seen_at) VALUES ('old', '2000-01-01', 0)"
+            )
+            dedup = PaymentDeduplicator(db, max_entries=10)
+            await dedup.load()
+            return await dedup.first_seen("old")
+        finally:
+            await db.disconnect()
+
+    assert asyncio.run(run()) is True
+
+def test_processor_drops_repeat_delivery():
+    class SeenOnce:
+        def __init__(self):
+            self.seen = set()
+
+        async def first_seen(self, payment_hash):
+            if payment_hash in self.seen:
+                return False
+            self.seen.add(payment_hash)
+            return True
+
+    class Balance:
+        def __init__(self):
+            self.updates = []
+
+        def update_from_websocket(self, balance):
+            self.updates.append(balance)
+
+    async def run():
+        balance = Balance()
+        processor = PaymentProcessor(None, None, None, None, None, balance, SeenOnce())
+        handled = []
+
+        async def handle(sats, payment):
+            handled.append(sats)
+
+        async def save_checkpoint(payment):
+            pass
+
+        processor._handle_received_payment = handle
+        processor._save_checkpoint = save_checkpoint
+        frame = {"wallet_balance": 5, "payment": {"payment_hash": "h", "amount": 5000}}
+        await processor.process_payment(frame)
+        await processor.process_payment(frame)
+        return handled, balance.updates
+
+    handled, updates = asyncio.run(run())
+    assert handled == [5]
+    # The balance on a repeat frame is still applied
+    assert updates == [5, 5]
+
+class CountingProcessor(PaymentProcessor):
+    def __init__(self, dedup):
+        class Balance:
+            def update_from_websocket(self, balance):
+                pass
+
+        super().__init__(None, None, None, None, None, Balance(), dedup)
+        self.handled = []
+        self.failures = 0
+
+    async def _handle_received_payment(self, sats, payment):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("feeder override unavailable")
+        self.handled.append(sats)
+
+    async def _save_checkpoint(self, payment):
+        pass
+
+def test_webhook_then_websocket_delivery_is_processed_once(database_url):
+    import json
+    from routes.webhooks import payment_webhook
+    from services.websocket_manager import WebSocketManager
+
+    async def run():
+        db = DatabaseService(database_url)
+        await db.connect()
+        try:
+            processor = CountingProcessor(PaymentDeduplicator(db, max_entries=10))
+            frame = {"wallet_balance": 5, "payment": {"payment_hash": "h", "amount": 5000}}
+            response = await payment_webhook(dict(frame), processor)
+            manager = WebSocketManager("ws://unused", processor, ingest_workers=1, ingest_queue_size=10)
+            manager.start_workers()
+            await manager._enqueue(json.dumps({**frame, "wallet_balance": 7}))
+            await manager.stop_workers()
+            return response, processor.handled, processor.balance
+        finally:
+            await db.disconnect()
+
+    response, handled, balance = asyncio.run(run())
+    assert response == {"status": "success"}
+    assert handled == [5]
+    # The duplicate is dropped, but its newer balance still applies
+    assert balance == 7
+
+def test_failed_payment_is_retried_on_redelivery(database_url):
+    async def run():
+        db = DatabaseService(database_url)
+        await db.connect()
+        try:
+            dedup = PaymentDeduplicator(db, max_entries=10)
+            processor = CountingProcessor(dedup)
+            processor.failures = 1
+            frame = {"payment": {"payment_hash": "h", "amount": 5000}}
+            try:
+                await processor.process_payment(frame)
+            except RuntimeError:
+                pass
+            await processor.process_payment(frame)
+            await processor.process_payment(frame)
+            return processor.handled, dedup.stats
+        finally:
+            await db.disconnect()
+
+    handled, stats = asyncio.run(run())
+    assert handled == [5]
+    assert stats["released"] == 1
+    assert stats["suppressed"] == 1
@@ -0,0 +1,119 @@
+import asyncio
+from config import config, TRIGGER_AMOUNT_SATS
+from services.payment_processor import PaymentProcessor
+
+class FakeLNbits:
+    def __init__(self, trigger_delay=0.0):
+        self.trigger_delay = trigger_delay
+        self.triggers = 0
+        self.resets = []
+
+    async def trigger_feeder(self):
+        self.triggers += 1
+        await asyncio.sleep(self.trigger_delay)
+        return True
+
+    async def create_invoice(self, amount, memo, key):
+        return f"lnbc{amount}"
+
+    async def pay_invoice(self, payment_request, key):
+        self.resets.append(payment_request)
+        return {"payment_hash": "reset"}
+
+class FakeMirror:
+    def __init__(self, override=False):
+        self.override = override
+
+    async def feeder_override(self):
+        return self.override
+
+class FakeCounter:
+    def __init__(self):
+        self.total = 0
+
+    def increment(self, sats):
+        self.total += sats
+
+class FakeMessaging:
+    async def make_messages(self, nos_sec, sats, difference, event):
+        return event, None
+
+class FakeNotifier:
+    def __init__(self):
+        self.messages = []
+
+    async def broadcast(self, message):
+        self.messages.append(message)
+
+class FakeBalance:
+    def update_from_websocket(self, balance):
+        pass
+
+class AcceptAll:
+    async def first_seen(self, payment_hash):
+        return True
+
+def make_processor(lnbits, override=False):
+    processor = PaymentProcessor(
+        lnbits, FakeNotifier(), None, FakeCounter(), FakeMirror(override), FakeBalance(), AcceptAll()
+    )
+    processor.messaging = FakeMessaging()
+
+    async def save_checkpoint(payment):
+        pass
+
+    processor._save_checkpoint = save_checkpoint
+    return processor
+
+def frame(sats, balance, payment_hash):
+    return {"wallet_balance": balance, "payment": {"amount": sats * 1000, "payment_hash": payment_hash}}
+
+def test_payments_during_feeding_are_counted_without_a_second_trigger(monkeypatch):
+    monkeypatch.setitem(config, "DEBUG", False)
+
+    async def run():
+        lnbits = FakeLNbits(trigger_delay=0.05)
+        processor = make_processor(lnbits)
+        await processor.process_payment(frame(TRIGGER_AMOUNT_SATS, TRIGGER_AMOUNT_SATS, "a"))
+        state_after_trigger = processor.state
+        # Not blocked behind the feeding, and does not start another one
+        await asyncio.wait_for(processor.process_payment(frame(50, TRIGGER_AMOUNT_SATS + 50, "b")), 0.02)
+        await processor.wait_for_feeding()
+        return lnbits, processor, state_after_trigger
+
+    lnbits, processor, state_after_trigger = asyncio.run(run())
+    assert state_after_trigger == PaymentProcessor.TRIGGERING
+    assert lnbits.triggers == 1
+    assert lnbits.resets == [f"lnbc{TRIGGER_AMOUNT_SATS + 50}"]
+    assert processor.state == PaymentProcessor.ACCUMULATING
+    assert processor.goat_sats.total == TRIGGER_AMOUNT_SATS + 50
+    assert processor.notifier.messages == ["sats_received", "feeder_triggered"]
+    assert processor.stats["payments_while_feeding"] == 1
+
+def test_below_trigger_only_notifies(monkeypatch):
+    monkeypatch.setitem(config, "DEBUG", False)
+
+    async def run():
+        lnbits = FakeLNbits()
+        processor = make_processor(lnbits)
+        await processor.process_payment(frame(20, 20, "a"))
+        return lnbits, processor
+
+    lnbits, processor = asyncio.run(run())
+    assert lnbits.triggers == 0
+    assert processor.notifier.messages == ["sats_received"]
+    assert processor.state == PaymentProcessor.ACCUMULATING
+
+def test_override_skips_feeding(monkeypatch):
+    monkeypatch.setitem(config, "DEBUG", False)
+
+    async def run():
+        lnbits = FakeLNbits()
+        processor = make_processor(lnbits, override=True)
+        await processor.process_payment(frame(TRIGGER_AMOUNT_SATS, TRIGGER_AMOUNT_SATS, "a"))
+        await processor.wait_for_feeding()
+        return lnbits, processor
+
+    lnbits, processor = asyncio.run(run())
+    assert lnbits.triggers == 0
+    assert processor.stats["overridden"] == 1
@@ -0,0 +1,58 @@
+import asyncio
+from services.price_service import PriceService
+
+class FakePriceAPI:
+    def __init__(self, prices, delay=0.0):
+        self.prices = iter(prices)
+        self.delay = delay
+        self.calls = 0
+
+    async def fetch_btc_price(self, force_refresh: bool = False) -> float:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        price = next(self.prices)
+        if isinstance(price, Exception):
+            raise price
+        return price
+
+def test_first_read_waits_then_serves_from_memory():
+    async def run():
+        api = FakePriceAPI([50_000.0])
+        prices = PriceService(api, refresh_interval=60, max_age=600)
+        sats = await asyncio.gather(*(prices.convert_to_sats(1.0) for _ in range(5)))
+        return sats, api.calls, prices.stats
+
+    sats, calls, stats = asyncio.run(run())
+    assert sats == [2000] * 5
+    assert calls == 1
+    assert stats["price"] == 50_000.0
+
+def test_stale_price_served_while_refreshing():
+    async def run():
+        api = FakePriceAPI([50_000.0, 100_000.0], delay=0.01)
+        prices = PriceService(api, refresh_interval=60, max_age=600)
+        await prices.refresh()
+        prices._fetched_at -= 120  # older than refresh_interval, younger than max_age
+        stale = await prices.get_price()
+        await asyncio.sleep(0.05)
+        fresh = await prices.get_price()
+        return stale, fresh, prices.stats
+
+    stale, fresh, stats = asyncio.run(run())
+    assert stale == 50_000.0
+    assert fresh == 100_000.0
+    assert stats["stale_reads"] == 1
+    assert stats["age_seconds"] < 1
+
+def test_failed_refresh_past_max_age_keeps_last_price():
+    async def run():
+        api = FakePriceAPI([50_000.0, RuntimeError("openhab down")])
+        prices = PriceService(api, refresh_interval=60, max_age=600)
+        await prices.refresh()
+        prices._fetched_at -= 900
+        price = await prices.get_price()
+        return price, prices.stats
+
+    price, stats = asyncio.run(run())
+    assert price == 50_000.0
+    assert stats["refresh_errors"] == 1
@@ -0,0 +1,44 @@
+import asyncio
+from services.database import DatabaseService
+from services.query_profiler import QueryProfiler, normalize_sql
+
+def test_normalize_sql():
+    assert normalize_sql(
+        "SELECT *   FROM cyber_herd\n WHERE lud16 = :lud16 AND amount > 10"
+    ) == "SELECT * FROM cyber_herd WHERE lud16 = ? AND amount > ?"
+    assert normalize_sql("SELECT * FROM cache WHERE key IN (:k0, :k1, :k2)") == (
+        "SELECT * FROM cache WHERE key IN (?, ...)"
+    )
+    assert normalize_sql("SELECT * FROM t WHERE name = 'it''s'") == "SELECT * FROM t WHERE name = ?"
+
+def test_histogram_summary():
+    profiler = QueryProfiler(slow_query_ms=50)
+    for elapsed in (0.5, 3, 4, 80):
+        profiler.record("SELECT 1 FROM cache WHERE key = :key", elapsed)
+    profiler.record("DELETE FROM cache", 1)
+
+    summary = profiler.summary()
+    top = summary["queries"][0]
+    assert top["query"] == "SELECT ? FROM cache WHERE key = ?"
+    assert top["count"] == 4
+    assert top["max_ms"] == 80
+    assert top["p50_ms"] == 5
+    assert top["histogram"]["le_1ms"] == 1
+    assert top["histogram"]["le_100ms"] == 1
+    assert len(summary["queries"]) == 2
+
+def test_slow_queries_are_explained(database_url):
+    async def run():
+        db = DatabaseService(database_url)
+        await db.connect()
+        db.profiler.slow_query_ms = 0
+        await db.fetch_one("SELECT * FROM cyber_herd WHERE lud16 = :lud16", {"lud16": "a@b"})
+        await asyncio.gather(*db._explain_tasks)
+        summary = db.profiler.summary()
+        await db.disconnect()
+        return summary
+
+    summary = asyncio.run(run())
+    slow = [s for s in summary["slow_queries"] if "lud16" in s["query"]]
+    assert slow
+    assert any("idx_cyber_herd_lud16" in line for line in slow[0]["plan"])
@@ -0,0 +1,186 @@
+import asyncio
+import httpx
+import pytest
+from utils.resilience import (
+    AdaptiveLimiter, CircuitBreaker, CircuitOpenError, Priority, RetryBudget, UpstreamPolicy,
+    call_priority, effective_priority
+)
+
+def make_policy(budget=None, **overrides):
+    settings = dict(
+        failure_threshold=2, reset_timeout=0.05, max_retries=2,
+        backoff_base=0.001, backoff_max=0.001, hedge_delay=0.0,
+    )
+    settings.update(overrides)
+    return UpstreamPolicy("openhab", budget or RetryBudget(ratio=0.1, max_tokens=10), **settings)
+
+def failing(counter, error=None):
+    async def call():
+        counter.append(1)
+        raise error or httpx.ConnectError("down")
+    return call
+
+def test_idempotent_calls_retry_and_others_do_not():
+    async def run():
+        policy = make_policy(failure_threshold=10)
+        reads, writes = [], []
+        with pytest.raises(httpx.ConnectError):
+            await policy.call(failing(reads), idempotent=True)
+        with pytest.raises(httpx.ConnectError):
+            await policy.call(failing(writes), idempotent=False)
+        return len(reads), len(writes), policy.stats
+
+    reads, writes, stats = asyncio.run(run())
+    assert reads == 3
+    assert writes == 1
+    assert stats["retries"] == 2
+
+def test_client_errors_are_not_retried_or_counted():
+    async def run():
+        policy = make_policy()
+        request = httpx.Request("GET", "http://openhab.test")
+        error = httpx.HTTPStatusError("nope", request=request, response=httpx.Response(404, request=request))
+        calls = []
+        for _ in range(3):
+            with pytest.raises(httpx.HTTPStatusError):
+                await policy.call(failing(calls, error), idempotent=True)
+        return len(calls), policy.breaker.state
+
+    calls, state = asyncio.run(run())
+    assert calls == 3
+    assert state == CircuitBreaker.CLOSED
+
+def test_breaker_opens_then_half_open_probe_closes_it():
+    async def run():
+        policy = make_policy(max_retries=0)
+        calls = []
+        for _ in range(2):
+            with pytest.raises(httpx.ConnectError):
+                await policy.call(failing(calls), idempotent=True)
+        with pytest.raises(CircuitOpenError):
+            await policy.call(failing(calls), idempotent=True)
+        opened_calls = len(calls)
+        await asyncio.sleep(0.06)
+
+        async def ok():
+            return "ON"
+
+        result = await policy.call(ok, idempotent=True)
+        return opened_calls, result, policy.breaker.stats
+
+    opened_calls, result, stats = asyncio.run(run())
+    assert opened_calls == 2
+    assert result == "ON"
+    assert stats["state"] == CircuitBreaker.CLOSED
+    assert stats["opened"] == 1
+    assert stats["short_circuited"] == 1
+
+def test_retry_budget_caps_retries():
+    async def run():
+        budget = RetryBudget(ratio=0.0, max_tokens=1)
+        policy = make_policy(failure_threshold=100, budget=budget)
+        calls = []
+        for _ in range(3):
+            with pytest.raises(httpx.ConnectError):
+                await policy.call(failing(calls), idempotent=True)
+        return len(calls), budget.stats
+
+    calls, stats = asyncio.run(run())
+    # One retry from the single token, then first attempts only
+    assert calls == 4
+    assert stats["granted"] == 1
+
+def test_hedged_read_takes_the_faster_copy():
+    async def run():
+        policy = make_policy(hedge_delay=0.01)
+        delays = iter([0.2, 0.0])
+
+        async def read():
+            await asyncio.sleep(next(delays))
+            return "60000"
+
+        start = asyncio.get_running_loop().time()
+        result = await policy.call(read, idempotent=True, hedge=True)
+        elapsed = asyncio.get_running_loop().time() - start
+        return result, elapsed, policy.stats
+
+    result, elapsed, stats = asyncio.run(run())
+    assert result == "60000"
+    assert elapsed < 0.15
+    assert stats["hedges"] == 1
+    assert stats["hedge_wins"] == 1
+
+def test_limiter_serves_waiters_by_priority():
+    async def run():
+        limiter = AdaptiveLimiter("lnbits", max_limit=1, latency_target=10)
+        order = []
+        release = asyncio.Event()
+
+        async def hold():
+            await release.wait()
+
+        async def call(name, priority):
+            async def record():
+                order.append(name)
+
+            await limiter.run(record, priority)
+
+        holder = asyncio.create_task(limiter.run(hold, Priority.DASHBOARD))
+        await asyncio.sleep(0)
+        waiters = [
+            asyncio.create_task(call("dashboard", Priority.DASHBOARD)),
+            asyncio.create_task(call("background", Priority.BACKGROUND)),
+            asyncio.create_task(call("payment", Priority.PAYMENT)),
+        ]
+        await asyncio.sleep(0.01)
+        depth = limiter.stats["queue_depth"]
+        release.set()
+        await asyncio.gather(holder, *waiters)
+        return order, depth, limiter.stats
+
+    order, depth, stats = asyncio.run(run())
+    assert order == ["payment", "background", "dashboard"]
+    assert depth == 3
+    assert stats["queued"] == 3
+    assert stats["in_flight"] == 0
+
+def test_limiter_backs_off_and_recovers():
+    limiter = AdaptiveLimiter("openhab", max_limit=8, latency_target=0.5, cooldown=0)
+    limiter.record(None)  # 5xx / timeout
+    assert limiter.capacity == 4
+    limiter.record(2.0)  # slower than the target
+    assert limiter.capacity == 2
+    for _ in range(20):
+        limiter.record(0.01)
+    assert limiter.capacity > 2
+    assert limiter.limit <= 8
+
+def test_slow_non_idempotent_calls_leave_the_limit_alone():
+    async def run():
+        limiter = AdaptiveLimiter("lnbits", max_limit=8, latency_target=0.01, cooldown=0)
+        policy = make_policy(limiter=limiter)
+
+        async def slow_payment():
+            await asyncio.sleep(0.03)
+
+        for _ in range(3):
+            await policy.call(slow_payment, idempotent=False)
+        after_payments = limiter.capacity
+        await policy.call(slow_payment, idempotent=True)
+        return after_payments, limiter.capacity, limiter.stats
+
+    after_payments, after_read, stats = asyncio.run(run())
+    assert after_payments == 8
+    assert after_read == 4
+    assert stats["acquired"] == 4
+
+def test_call_priority_raises_method_default():
+    assert effective_priority(Priority.DASHBOARD) == Priority.DASHBOARD
+    with call_priority(Priority.PAYMENT):
+        assert effective_priority(Priority.DASHBOARD) == Priority.PAYMENT
+        assert effective_priority(Priority.BACKGROUND) == Priority.PAYMENT
+
+def test_call_priority_can_lower_method_default():
+    with call_priority(Priority.BACKGROUND):
+        assert effective_priority(Priority.PAYMENT) == Priority.BACKGROUND
+    assert effective_priority(Priority.PAYMENT) == Priority.PAYMENT
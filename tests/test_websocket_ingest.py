@@ -0,0 +1,142 @@
+import asyncio
+import json
+from services.websocket_manager import WebSocketManager
+
+class FakeProcessor:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.processed = []
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def process_payment(self, data):
+        await self.release.wait()
+        await asyncio.sleep(self.delay)
+        self.processed.append(data)
+
+def frame(wallet="w1", amount=1000_000, balance=1000):
+    return json.dumps({"wallet_balance": balance, "payment": {"wallet_id": wallet, "amount": amount}})
+
+def test_reader_enqueues_without_waiting_for_processing():
+    async def run():
+        processor = FakeProcessor(delay=0.05)
+        manager = WebSocketManager("ws://unused", processor, ingest_workers=1, ingest_queue_size=10)
+        manager.start_workers()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for balance in range(5):
+            await manager._enqueue(frame(balance=balance))
+        enqueue_time = loop.time() - start
+        await manager.stop_workers()
+        return enqueue_time, processor.processed, manager.stats
+
+    enqueue_time, processed, stats = asyncio.run(run())
+    assert enqueue_time < 0.05
+    assert [data["wallet_balance"] for data in processed] == [0, 1, 2, 3, 4]
+    assert stats["processed"] == 5
+    assert stats["max_lag_seconds"] > 0
+
+def test_each_wallet_stays_in_order_across_workers():
+    async def run():
+        processor = FakeProcessor(delay=0.001)
+        manager = WebSocketManager("ws://unused", processor, ingest_workers=3, ingest_queue_size=50)
+        manager.start_workers()
+        for balance in range(10):
+            for wallet in ("a", "b", "c", "d"):
+                await manager._enqueue(frame(wallet=wallet, balance=balance))
+        await manager.stop_workers()
+        return processor.processed
+
+    processed = asyncio.run(run())
+    for wallet in ("a", "b", "c", "d"):
+        balances = [d["wallet_balance"] for d in processed if d["payment"]["wallet_id"] == wallet]
+        assert balances == list(range(10))
+
+def test_full_queue_drops_balance_frames_and_blocks_payments():
+    async def run():
+        processor = FakeProcessor()
+        processor.release.clear()
+        manager = WebSocketManager("ws://unused", processor, ingest_workers=1, ingest_queue_size=1)
+        manager.start_workers()
+        await manager._enqueue(frame(balance=1))  # taken by the stalled worker
+        await asyncio.sleep(0)
+        await manager._enqueue(frame(balance=2))  # fills the queue
+        await manager._enqueue(frame(amount=0, balance=3))  # balance-only: dropped
+        blocked = asyncio.create_task(manager._enqueue(frame(balance=4)))
+        await asyncio.sleep(0.01)
+        waiting = not blocked.done()
+        processor.release.set()
+        await blocked
+        await manager.stop_workers()
+        return waiting, processor.processed, manager.stats
+
+    waiting, processed, stats = asyncio.run(run())
+    assert waiting
+    assert [data["wallet_balance"] for data in processed] == [1, 2, 4]
+    assert stats["dropped"] == 1
+    assert stats["blocked"] == 1
+
+def test_undecodable_frames_are_counted():
+    async def run():
+        manager = WebSocketManager("ws://unused", FakeProcessor(), ingest_workers=1, ingest_queue_size=1)
+        manager.start_workers()
+        await manager._enqueue("not json")
+        await manager.stop_workers()
+        return manager.stats
+
+    stats = asyncio.run(run())
+    assert stats["decode_errors"] == 1
+    assert stats["enqueued"] == 0
+
+def test_catch_up_frames_are_queued_before_live_frames():
+    class CatchUpProcessor(FakeProcessor):
+        async def missed_payments(self):
+            return [json.loads(frame(balance=b)) for b in (1, 2)]
+
+    async def run():
+        processor = CatchUpProcessor()
+        manager = WebSocketManager("ws://unused", processor, ingest_workers=1, ingest_queue_size=10)
+        manager.start_workers()
+        await manager._catch_up()
+        await manager._enqueue(frame(balance=3))
+        await manager.stop_workers()
+        return processor.processed, manager.stats
+
+    processed, stats = asyncio.run(run())
+    assert [data["wallet_balance"] for data in processed] == [1, 2, 3]
+    assert stats["caught_up"] == 2
+
+def test_disconnect_stops_the_reader_instead_of_reconnecting():
+    import websockets
+
+    class CountingProcessor(FakeProcessor):
+        catch_ups = 0
+
+        async def missed_payments(self):
+            self.catch_ups += 1
+            return []
+
+    async def run():
+        async def lnbits(socket, *args):
+            for balance in (1, 2, 3):
+                await socket.send(frame(balance=balance))
+            await socket.wait_closed()
+
+        async with websockets.serve(lnbits, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            processor = CountingProcessor()
+            processor.release.clear()
+            manager = WebSocketManager(f"ws://127.0.0.1:{port}", processor, ingest_workers=1, ingest_queue_size=1)
+            reader = asyncio.create_task(manager.connect())
+            # Frame 1 stalls the worker, 2 fills the queue, 3 blocks the reader
+            while manager.stats["blocked"] == 0:
+                await asyncio.sleep(0.01)
+            processor.release.set()
+            await asyncio.wait_for(manager.disconnect(), 5)
+            await asyncio.sleep(0.05)
+            return reader.done(), processor.catch_ups, manager
+
+    reader_done, catch_ups, manager = asyncio.run(run())
+    assert reader_done
+    assert catch_ups == 1  # no reconnect after shutdown
+    assert manager._queues == [] and manager._workers == []
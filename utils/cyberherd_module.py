@@ -2,11 +2,11 @@ import json
 import logging
 import asyncio
 from typing import List, Dict, Optional
-import httpx
 
 from config import config, DEFAULT_RELAYS
 from utils.nostr_signing import sign_event, compute_event_hash  # Changed from get_event_hash
 from utils.relay_manager import RelayManager
+from services.lnurl_cache import LnurlCache
 
 logger = logging.getLogger(__name__)
 
@@ -81,16 +81,13 @@ class MetadataFetcher:
 
 class Verifier:
     @staticmethod
-    async def verify_lud16(lud16: str) -> bool:
+    async def verify_lud16(lud16: str, lnurl_cache: LnurlCache) -> bool:
         """Verify if a lud16 address is valid."""
         if not lud16 or '@' not in lud16:
             return False
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{config['LNBITS_URL']}/api/v1/lnurlscan/{lud16}"
-                )
-                return response.status_code == 200
+            # Shares scans (and their cached results) with payouts
+            return await lnurl_cache.get(lud16) is not None
         except Exception as e:
             logger.error(f"Error verifying lud16 {lud16}: {e}")
             return False
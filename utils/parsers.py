@@ -1,4 +1,5 @@
-from typing import List, Set, Union
+from typing import Any, Dict, List, Optional, Set, Union
+from datetime import datetime, timezone
 import logging
 
 logger = logging.getLogger(__name__)
@@ -36,5 +37,25 @@ def extract_id_from_stdout(stdout: str) -> str:
         logger.error(f"Error parsing JSON from stdout: {e}. Data: {stdout}")
         return None
 
+def parse_payment_time(payment: Dict[str, Any]) -> Optional[int]:
+    """Unix time of an LNbits payment; LNbits sends an int or an ISO string."""
+    value = payment.get('time')
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        try:
+            return int(float(value))
+        except ValueError:
+            pass
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            logger.warning(f"Unparseable payment time: {value}")
+            return None
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return int(parsed.timestamp())
+    return None
+
 # Add imports at the top
 import json
@@ -0,0 +1,392 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import httpx
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+# Gateway errors that ExternalAPIService raises after catching httpx errors
+GATEWAY_STATUS_CODES = (502, 503, 504)
+
+def gateway_status(upstream_status: int) -> int:
+    """Status to report for an upstream error response.
+
+    429 and 5xx become 502 so is_upstream_failure still sees an unhealthy
+    upstream once the error is an HTTPException; other 4xx pass through.
+    """
+    return 502 if upstream_status == 429 or upstream_status >= 500 else upstream_status
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose breaker is open."""
+
+    def __init__(self, upstream: str, retry_in: float):
+        super().__init__(f"{upstream} circuit open, retry in {retry_in:.1f}s")
+        self.upstream = upstream
+        self.retry_in = retry_in
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """True for errors that mean the upstream is unhealthy and may recover.
+
+    Transport errors, timeouts, 429 and 5xx responses count; other 4xx
+    responses and local errors are the caller's problem and are neither
+    retried nor held against the breaker.
+    """
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    if isinstance(error, HTTPException):
+        return error.status_code in GATEWAY_STATUS_CODES
+    return False
+
+class CircuitBreaker:
+    """Closed -> open after failure_threshold consecutive failures.
+
+    While open, calls fail fast. After reset_timeout one probe call is let
+    through (half-open); its success closes the breaker, its failure opens
+    it for another reset_timeout.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._stats = {"opened": 0, "short_circuited": 0}
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "state": self.state, "consecutive_failures": self.failures}
+
+    def allow(self):
+        """Raise CircuitOpenError unless a call may go through now."""
+        if self.state == self.CLOSED:
+            return
+        retry_in = self.opened_at + self.reset_timeout - time.monotonic()
+        if self.state == self.OPEN and retry_in <= 0:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return
+        self._stats["short_circuited"] += 1
+        raise CircuitOpenError(self.name, max(retry_in, 0.0))
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            logger.info(f"{self.name} circuit closed")
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(f"{self.name} circuit opened after {self.failures} failures")
+                self._stats["opened"] += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """Give the probe slot back when a probe call was cancelled."""
+        self._probing = False
+
+class RetryBudget:
+    """Token bucket that caps retries to a fraction of overall traffic.
+
+    Every first attempt deposits ratio tokens and every retry or hedge
+    withdraws one, so during an outage retries stop once the bucket
+    (max_tokens, which is also the burst allowance) is empty.
+    """
+
+    def __init__(self, ratio: float, max_tokens: float):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._stats = {"granted": 0, "denied": 0}
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "tokens": round(self.tokens, 2)}
+
+    def deposit(self):
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self._stats["granted"] += 1
+            return True
+        self._stats["denied"] += 1
+        return False
+
+class Priority(IntEnum):
+    """Queueing class for upstream calls; lower values are served first."""
+    PAYMENT = 0
+    BACKGROUND = 1
+    DASHBOARD = 2
+
+_call_priority: ContextVar[Optional[Priority]] = ContextVar("call_priority", default=None)
+
+@contextmanager
+def call_priority(priority: Priority):
+    """Set the priority of every upstream call made inside the block,
+    in place of each method's default."""
+    token = _call_priority.set(priority)
+    try:
+        yield
+    finally:
+        _call_priority.reset(token)
+
+def effective_priority(default: Priority) -> Priority:
+    override = _call_priority.get()
+    return default if override is None else override
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit for one upstream with a priority queue.
+
+    The limit grows by about one slot per limit's worth of healthy calls
+    and halves (at most once per cooldown) on a 429/5xx/transport failure
+    or a call slower than latency_target. Callers over the limit wait in
+    priority order.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_limit: int,
+        latency_target: float,
+        min_limit: int = 1,
+        backoff: float = 0.5,
+        cooldown: Optional[float] = None
+    ):
+        self.name = name
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.cooldown = latency_target if cooldown is None else cooldown
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._last_decrease = 0.0
+        self._stats = {
+            "acquired": 0, "queued": 0, "decreases": 0,
+            "wait_seconds_total": 0.0, "max_wait_seconds": 0.0,
+        }
+
+    @property
+    def capacity(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        depth: Dict[str, int] = {p.name.lower(): 0 for p in Priority}
+        for priority, _, future in self._waiters:
+            if not future.done():
+                depth[Priority(priority).name.lower()] += 1
+        return {
+            **self._stats,
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queue_depth": sum(depth.values()),
+            "queue_depth_by_priority": depth,
+        }
+
+    async def acquire(self, priority: Priority = Priority.DASHBOARD):
+        self._stats["acquired"] += 1
+        # Serve earlier waiters first; afterwards any free slot is ours
+        self._wake()
+        if self.in_flight < self.capacity:
+            self.in_flight += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._seq), future))
+        self._stats["queued"] += 1
+        start = time.monotonic()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # Granted just as we were cancelled
+            raise
+        finally:
+            waited = time.monotonic() - start
+            self._stats["wait_seconds_total"] += waited
+            self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.in_flight < self.capacity:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self.in_flight += 1
+            future.set_result(None)
+
+    def _decrease(self):
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(float(self.min_limit), self.limit * self.backoff)
+        self._stats["decreases"] += 1
+        logger.warning(f"{self.name} concurrency limit lowered to {self.capacity}")
+
+    def record(self, latency: Optional[float]):
+        """Feed one outcome back: latency in seconds, or None for an overload."""
+        if latency is None or latency > self.latency_target:
+            self._decrease()
+        else:
+            self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            self._wake()
+
+    async def run(
+        self,
+        fn: Callable[[], Awaitable[Any]],
+        priority: Priority,
+        measure_latency: bool = True
+    ) -> Any:
+        """Run fn in a slot. Without measure_latency only an overload is fed
+        back, so a call that is slow by nature does not shrink the limit."""
+        await self.acquire(priority)
+        start = time.monotonic()
+        try:
+            result = await fn()
+        except Exception as e:
+            if is_upstream_failure(e):
+                self.record(None)
+            elif measure_latency:
+                self.record(time.monotonic() - start)
+            raise
+        finally:
+            self.release()
+        if measure_latency:
+            self.record(time.monotonic() - start)
+        return result
+
+class UpstreamPolicy:
+    """Breaker, retries and hedging for every call to one upstream."""
+
+    def __init__(
+        self,
+        name: str,
+        budget: RetryBudget,
+        failure_threshold: int,
+        reset_timeout: float,
+        max_retries: int,
+        backoff_base: float,
+        backoff_max: float,
+        hedge_delay: float = 0.0,
+        limiter: Optional[AdaptiveLimiter] = None
+    ):
+        self.name = name
+        self.budget = budget
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_delay = hedge_delay
+        self.limiter = limiter
+        self._stats = {"calls": 0, "failures": 0, "retries": 0, "hedges": 0, "hedge_wins": 0}
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        stats = {**self._stats, "breaker": self.breaker.stats}
+        if self.limiter is not None:
+            stats["limiter"] = self.limiter.stats
+        return stats
+
+    async def call(
+        self,
+        fn: Callable[[], Awaitable[Any]],
+        idempotent: bool,
+        hedge: bool = False,
+        priority: Priority = Priority.DASHBOARD
+    ) -> Any:
+        """Run fn under the breaker; retry and hedge only if idempotent.
+
+        With a limiter every attempt, including a hedge, waits for a slot.
+        Only idempotent calls feed their latency back into the limit; a
+        payment can legitimately take longer than the latency target.
+        """
+        self._stats["calls"] += 1
+        if self.limiter is not None:
+            unlimited, limiter = fn, self.limiter
+
+            def fn():
+                return limiter.run(unlimited, priority, measure_latency=idempotent)
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            self.breaker.allow()
+            try:
+                if idempotent and hedge and self.hedge_delay > 0:
+                    result = await self._hedged(fn)
+                else:
+                    result = await fn()
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception as e:
+                if not is_upstream_failure(e):
+                    # The upstream answered; the request itself was bad
+                    self.breaker.record_success()
+                    raise
+                self._stats["failures"] += 1
+                self.breaker.record_failure()
+                if not idempotent or attempt >= self.max_retries or not self.budget.withdraw():
+                    raise
+                attempt += 1
+                self._stats["retries"] += 1
+                delay = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+                logger.warning(f"{self.name} call failed ({e}), retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def _hedged(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Send a second copy of a slow read and take whichever answers first."""
+        first = asyncio.ensure_future(fn())
+        done, _ = await asyncio.wait({first}, timeout=self.hedge_delay)
+        if done or not self.budget.withdraw():
+            return await first
+        self._stats["hedges"] += 1
+        second = asyncio.ensure_future(fn())
+        pending = {first, second}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self._stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
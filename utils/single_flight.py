@@ -0,0 +1,45 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one in-flight call.
+
+    The first caller for a key starts the call in its own task; everyone
+    else awaits that task. Cancelling any single waiter (including the
+    first) does not cancel the shared call.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.shared = 0
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    def start(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """Return the in-flight task for key, starting fn if there is none."""
+        task = self._inflight.get(key)
+        if task is not None:
+            self.shared += 1
+            return task
+        self.calls += 1
+        task = asyncio.ensure_future(fn())
+        self._inflight[key] = task
+
+        def _finished(done: asyncio.Task):
+            if self._inflight.get(key) is done:
+                del self._inflight[key]
+            # Mark the exception retrieved for background refreshes nobody awaits
+            if not done.cancelled():
+                done.exception()
+
+        task.add_done_callback(_finished)
+        return task
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn for key, or wait for the call already in flight."""
+        return await asyncio.shield(self.start(key, fn))